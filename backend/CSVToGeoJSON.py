@@ -1,14 +1,23 @@
 import pandas as pd
 import traceback
-import time
-from Geocode import geocode_address
-from FileUtil import are_equal
+from Geocode import geocode_addresses_with_mode
+from Config import GEOCODE_MODE, GEOCODE_BATCH_SIZE, GEOCODE_MAX_WORKERS
+
+
+def value_text(value):
+    """
+    Formats a CSV value as text. Integral floats are formatted as integers, so a column
+    read as float (e.g. a zipcode column with missing values) gives "12345", not "12345.0".
+    """
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
 
 
 def safely_get_value(row, column, default=''):
     """Safely extract a value from a DataFrame row."""
     value = row.get(column, default)
-    return str(value) if pd.notna(value) else default
+    return value_text(value) if pd.notna(value) else default
 
 
 def create_geojson_feature(feature_type, coordinates, properties):
@@ -23,40 +32,206 @@ def create_geojson_feature(feature_type, coordinates, properties):
     }
 
 
-def find_matching_feature(features, id_field, id_value):
-    """Find a matching feature in existing GeoJSON based on ID field."""
-    for feature in features:
-        if feature['properties'].get(id_field) == id_value:
-            return feature
-    return None
+# Address columns compared to decide whether a stored location can be reused
+ADDRESS_COLUMNS = ['address_one', 'address_two',
+                   'city', 'state', 'zipcode', 'country']
+
+# Row classifications produced by classify_location_rows
+ROW_UNCHANGED = 'unchanged'  # stored id, same address and a stored feature to reuse
+ROW_MOVED = 'moved'  # stored id with a new address
+ROW_NEW = 'new'  # id not stored (or no stored feature to reuse)
+
+
+def build_feature_index(geojson, id_field):
+    """Build an id -> feature dictionary for a GeoJSON FeatureCollection (first feature wins)."""
+    feature_index = {}
+    if not geojson:
+        return feature_index
+    for feature in geojson.get('features', []):
+        feature_index.setdefault(
+            feature.get('properties', {}).get(id_field), feature)
+    return feature_index
+
+
+def address_frame(df):
+    """
+    Returns the address columns of rows as the text stored in the features (see
+    safely_get_value); missing values and columns are empty strings.
+    """
+    return pd.DataFrame({
+        column: df[column].map(lambda value: value_text(value) if pd.notna(value) else '')
+        if column in df.columns else ''
+        for column in ADDRESS_COLUMNS
+    }, index=df.index)
+
+
+def index_previous_addresses(old_df, id_field):
+    """
+    Indexes the addresses of the previous upload by id (first row of an id wins), once per
+    upload however many chunks are classified against it.
+
+    Returns:
+        pd.DataFrame: The address text of each previous id, or None without previous rows.
+    """
+    if old_df is None or id_field not in old_df.columns:
+        return None
+    old_unique = old_df.drop_duplicates(subset=id_field, keep='first')
+    return address_frame(old_unique).set_axis(old_unique[id_field])
+
+
+def classify_location_rows(new_df, old_df, feature_index, id_field, old_addresses=None):
+    """
+    Classify every row of new_df as unchanged, moved or new compared to the previous upload.
 
+    The previous rows are indexed by id once and the address columns of all rows are
+    compared in a single vectorized pass (two missing values count as equal).
 
-def convert_csv_to_geojson_base(new_df, old_df, old_geojson, id_field, process_row_func):
-    """Base function to convert CSV data to GeoJSON with customizable row processing."""
+    Args:
+        new_df (pd.DataFrame): The uploaded rows, de-duplicated by id_field.
+        old_df (pd.DataFrame): The previously uploaded rows, or None.
+        feature_index (dict): id -> feature index of the previous GeoJSON.
+        id_field (str): The column identifying a row.
+        old_addresses (pd.DataFrame): The previous rows already indexed with
+            index_previous_addresses (old_df is then ignored).
+
+    Returns:
+        list: ROW_UNCHANGED, ROW_MOVED or ROW_NEW for each row of new_df, in order.
+    """
+    if old_addresses is None:
+        old_addresses = index_previous_addresses(old_df, id_field)
+    if old_addresses is None or new_df.empty:
+        return [ROW_NEW] * len(new_df)
+
+    new_ids = new_df[id_field]
+    # Align the previous addresses to the uploaded rows by id
+    aligned = old_addresses.reindex(new_ids.values)
+    new_addresses = address_frame(new_df)
+
+    same_address = pd.Series(True, index=new_df.index)
+    for column in ADDRESS_COLUMNS:
+        new_values = new_addresses[column]
+        old_values = pd.Series(aligned[column].values, index=new_df.index)
+        same_address &= new_values == old_values
+
+    stored = new_ids.isin(old_addresses.index)
+    has_feature = new_ids.map(lambda id_value: id_value in feature_index)
+
+    statuses = pd.Series(ROW_NEW, index=new_df.index)
+    statuses[stored & ~same_address] = ROW_MOVED
+    statuses[stored & same_address & has_feature] = ROW_UNCHANGED
+    return statuses.tolist()
+
+
+def geocode_chunk_size(geocode_mode=None):
+    """Number of addresses geocoded between two progress reports, enough to keep every worker busy."""
+    if (geocode_mode or GEOCODE_MODE) == 'batch':
+        return GEOCODE_BATCH_SIZE * GEOCODE_MAX_WORKERS
+    return GEOCODE_MAX_WORKERS * 4
+
+
+def convert_csv_to_geojson_base(new_df, old_df, old_geojson, id_field, process_row_func, geocode_mode=None, progress=None,
+                                rows_total=None):
+    """
+    Base function to convert CSV data to GeoJSON with customizable row processing.
+
+    new_df is either a DataFrame or an iterable of DataFrame chunks (e.g. read from a large
+    upload), processed one at a time so only the current chunk's rows are held besides the
+    features built so far. The previous upload is indexed by id once; the rows of each
+    chunk are then classified as unchanged, moved or new against it. process_row_func
+    resolves each row into its properties and, for unchanged rows, its previous
+    coordinates. Every row that still needs coordinates is geocoded concurrently and rate
+    limited, using the geocoding backend selected by geocode_mode ('single' or 'batch',
+    defaults to Config.GEOCODE_MODE). Features are returned in input order; rows whose id
+    already appeared (in any earlier chunk) are skipped.
+
+    If progress (an UploadJob) is given, the rows are geocoded in chunks; progress is
+    reported and cancellation checked after every chunk. rows_total is the number of rows
+    reported as total (defaults to the length of new_df, when it is a DataFrame).
+    """
+    if isinstance(new_df, pd.DataFrame):
+        chunks = [new_df]
+        rows_total = len(new_df) if rows_total is None else rows_total
+    else:
+        chunks = new_df
+
+    if progress:
+        progress.update(stage='classifying', rows_total=rows_total or 0)
+
+    feature_index = build_feature_index(old_geojson, id_field)
+    old_addresses = index_previous_addresses(old_df, id_field)
+    seen_ids = set()
+    rows_read = reused = skipped = geocoded = failed = 0
     geojson_features = []
-    iterated_ids = set()
-    for index, row in new_df.iterrows():
-        try:
-            # Process the row using the provided function
-            id_value = row.get(id_field, None)
-            if id_value is None:
-                print(f"Skipping row {index} because id_field is missing")
-                continue
-            elif id_value in iterated_ids:
-                print(f"Skipping row {index} because id_field is duplicate")
-                continue
-            iterated_ids.add(id_value)
-            # This will return feature data or None if the row should be skipped
-            feature_data = process_row_func(
-                row, index, old_df, old_geojson, id_field)
-
-            if feature_data:
-                geojson_features.append(feature_data)
-
-        except Exception as e:
-            print(f"Error processing row {index}; error: {e}")
-            traceback.print_exc()
-            continue  # Skip the current row and continue with the next one
+
+    def report(stage):
+        progress.update(stage=stage, rows_total=max(rows_total or 0, rows_read),
+                        rows_processed=reused + skipped + geocoded + failed,
+                        reused=reused, geocoded=geocoded, failed=skipped + failed)
+
+    for chunk in chunks:
+        if id_field not in chunk.columns:
+            print(f"Skipping all rows because id_field {id_field} is missing")
+            return {"type": "FeatureCollection", "features": []}
+        rows_read += len(chunk)
+
+        # Skip duplicate ids, keeping the first occurrence across every chunk
+        duplicated = chunk[id_field].duplicated(keep='first') | chunk[id_field].isin(seen_ids)
+        for index in chunk.index[duplicated]:
+            print(f"Skipping row {index} because id_field is duplicate")
+        unique_df = chunk[~duplicated]
+        seen_ids.update(unique_df[id_field])
+
+        statuses = classify_location_rows(
+            unique_df, None, feature_index, id_field, old_addresses=old_addresses)
+        print(f"Rows unchanged: {statuses.count(ROW_UNCHANGED)}, moved: {statuses.count(ROW_MOVED)}, new: {statuses.count(ROW_NEW)}")
+
+        located_rows = []
+        for index, row, status in zip(unique_df.index, unique_df.to_dict('records'), statuses):
+            try:
+                # This will return the located row or None if the row should be skipped
+                located_row = process_row_func(
+                    row, index, id_field, status, feature_index)
+
+                if located_row:
+                    located_rows.append(located_row)
+
+            except Exception as e:
+                print(f"Error processing row {index}; error: {e}")
+                traceback.print_exc()
+                continue  # Skip the current row and continue with the next one
+
+        # Geocode every row whose coordinates could not be reused
+        pending_rows = [
+            located_row for located_row in located_rows if not located_row["coordinates"]]
+        reused += len(located_rows) - len(pending_rows)
+        skipped += len(unique_df) - len(located_rows) + int(duplicated.sum())
+        chunk_size = geocode_chunk_size(geocode_mode) if progress else max(len(pending_rows), 1)
+        for start in range(0, len(pending_rows), chunk_size):
+            if progress:
+                report('geocoding')
+                progress.check_cancelled()
+            geocode_rows = pending_rows[start:start + chunk_size]
+            locations = geocode_addresses_with_mode(
+                [located_row["address"] for located_row in geocode_rows], geocode_mode)
+            for located_row, location in zip(geocode_rows, locations):
+                if location:
+                    lat, lon = location
+                    located_row["coordinates"] = [lon, lat]
+                    geocoded += 1
+                else:
+                    failed += 1
+
+        for located_row in located_rows:
+            if located_row["coordinates"]:
+                geojson_features.append(create_geojson_feature(
+                    "Point", located_row["coordinates"], located_row["properties"]))
+            else:
+                print(f"Could not geocode {located_row['address']}")
+
+    if progress:
+        rows_total = rows_read
+        report('writing')
+        progress.check_cancelled()
 
     # Create GeoJSON object
     geojson = {
@@ -67,16 +242,25 @@ def convert_csv_to_geojson_base(new_df, old_df, old_geojson, id_field, process_r
     return geojson
 
 
-def process_location_row(row, index, old_df, old_geojson, id_field):
-    """Process a row for location data."""
+def process_location_row(row, index, id_field, status, feature_index):
+    """
+    Process a row for location data.
+
+    Args:
+        row (dict): The row's values.
+        index: The row's index in the uploaded data.
+        id_field (str): The column identifying the row.
+        status (str): The row's classification (ROW_UNCHANGED, ROW_MOVED or ROW_NEW).
+        feature_index (dict): id -> feature index of the previous GeoJSON.
+
+    Returns:
+        dict: The row's 'properties', its full 'address' and its 'coordinates' ([lon, lat])
+              if they can be reused from the old GeoJSON, otherwise None (the row needs geocoding).
+              Returns None if the row should be skipped.
+    """
     # Safe extraction of address fields to handle missing columns
     new_address_parts = {
-        'address_one': safely_get_value(row, 'address_one'),
-        'address_two': safely_get_value(row, 'address_two'),
-        'city': safely_get_value(row, 'city'),
-        'state': safely_get_value(row, 'state'),
-        'zipcode': safely_get_value(row, 'zipcode'),
-        'country': safely_get_value(row, 'country')
+        column: safely_get_value(row, column) for column in ADDRESS_COLUMNS
     }
 
     full_address = f"{new_address_parts['address_one']} {new_address_parts['address_two']} {new_address_parts['city']} {new_address_parts['state']} {new_address_parts['zipcode']} {new_address_parts['country']}".strip()
@@ -87,79 +271,47 @@ def process_location_row(row, index, old_df, old_geojson, id_field):
         print(f"Skipping row {index} because id_field is missing")
         return None
 
-    lat, lon = None, None
-
-    if not old_df[old_df.get(id_field, None) == id_value].empty:
-        matching_feature = None
-        old_entry = old_df[old_df.get(id_field, None) == id_value].iloc[0]
-        repeated_address = False
-        # print(old_df[old_df.get(id_field, None) == id_value].iloc[0])
-        if not old_entry.empty:
-            # Compare if all addresses are equal safely
-            repeated_address = (
-                are_equal(old_entry.get('address_one', ''), row.get('address_one', '')) and
-                are_equal(old_entry.get('address_two', ''), row.get('address_two', '')) and
-                are_equal(old_entry.get('city', ''), row.get('city', '')) and
-                are_equal(old_entry.get('state', ''), row.get('state', '')) and
-                are_equal(old_entry.get('zipcode', ''), row.get('zipcode', '')) and
-                are_equal(old_entry.get('country', ''), row.get('country', ''))
-            )
-
-        if repeated_address:
-            matching_feature = find_matching_feature(
-                old_geojson['features'], id_field, id_value)
-
-            if matching_feature:
-                lat, lon = matching_feature['geometry']['coordinates'][1], matching_feature['geometry']['coordinates'][0]
-                print("not geocoding: stored id and new address matches old address")
-            else:
-                print("geocoding reason: stored id, geojson matching feature not found")
-                lat, lon = geocode_address(full_address)
-                time.sleep(0.25)  # Avoid too many requests
-        else:
-            print("geocoding reason: stored id, new address")
-            lat, lon = geocode_address(full_address)
-            time.sleep(0.25)  # Avoid too many requests
-    else:
-        print("geocoding reason: not stored id")
-        lat, lon = geocode_address(full_address)
-        time.sleep(0.25)  # Avoid too many requests
-
-    if lat and lon:
-        properties = {
-            id_field: id_value,
-            "name": row.get('name', ''),
-            "address_one": new_address_parts['address_one'],
-            "address_two": new_address_parts['address_two'],
-            "city": new_address_parts['city'],
-            "state": new_address_parts['state'],
-            "zipcode": new_address_parts['zipcode'],
-            "country": new_address_parts['country'],
-        }
-
-        return create_geojson_feature("Point", [lon, lat], properties)
-    else:
-        print(f"Could not geocode {full_address}")
-        return None
+    coordinates = None
+    if status == ROW_UNCHANGED:
+        # Stored id and new address matches old address, reuse the stored coordinates
+        coordinates = feature_index[id_value]['geometry']['coordinates'][:2]
+
+    properties = {
+        id_field: id_value,
+        "name": row.get('name', ''),
+        **new_address_parts,
+    }
+
+    return {
+        "properties": properties,
+        "address": full_address,
+        "coordinates": coordinates
+    }
 
 
-def convert_csv_to_geojson_customers(new_df, old_df, old_geojson):
-    """Convert location CSV data to GeoJSON."""
+def convert_csv_to_geojson_customers(new_df, old_df, old_geojson, geocode_mode=None, progress=None, rows_total=None):
+    """Convert location CSV data (a DataFrame or chunks of it) to GeoJSON."""
     return convert_csv_to_geojson_base(
         new_df,
         old_df,
         old_geojson,
         'cnum',
-        process_location_row
+        process_location_row,
+        geocode_mode,
+        progress,
+        rows_total
     )
 
 
-def convert_csv_to_geojson_technicians(new_df, old_df, old_geojson):
-    """Convert technician CSV data to GeoJSON."""
+def convert_csv_to_geojson_technicians(new_df, old_df, old_geojson, geocode_mode=None, progress=None, rows_total=None):
+    """Convert technician CSV data (a DataFrame or chunks of it) to GeoJSON."""
     return convert_csv_to_geojson_base(
         new_df,
         old_df,
         old_geojson,
         'id',
-        process_location_row
+        process_location_row,
+        geocode_mode,
+        progress,
+        rows_total
     )
@@ -0,0 +1,290 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class PersistentCache:
+    """
+    A small key/value cache persisted to a SQLite database.
+
+    Values are stored as JSON. Entries can optionally expire after a TTL and the
+    table can be bounded to a maximum number of entries, in which case the least
+    recently used entries are evicted first. Several caches can share the same
+    database file by using different table names.
+
+    Access times only matter for eviction, so they are not tracked for unbounded
+    caches. Otherwise hits record them in memory and they are written in batches,
+    before any eviction and every access_flush_interval hits.
+    """
+
+    def __init__(self, db_path, table, ttl_seconds=0, max_entries=0, access_flush_interval=100):
+        """
+        Args:
+            db_path (str): Path to the SQLite database file.
+            table (str): Name of the table holding this cache's entries.
+            ttl_seconds (int): Time to live of an entry in seconds (0 disables expiry).
+            max_entries (int): Maximum number of entries kept (0 disables eviction).
+            access_flush_interval (int): Number of hits after which pending access times are written.
+        """
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table}")
+
+        self.db_path = db_path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.access_flush_interval = access_flush_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        # Key -> access time not yet written to the database
+        self._pending_access = {}
+
+    def _connection(self):
+        """Lazily opens the database so importing this module never touches the disk."""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_accessed_at "
+                f"ON {self.table} (accessed_at)")
+            self._conn.commit()
+        return self._conn
+
+    def _write_access_times(self, conn):
+        """Writes the pending access times, the caller commits."""
+        if self._pending_access:
+            conn.executemany(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._pending_access.items()])
+            self._pending_access.clear()
+
+    def flush(self):
+        """Writes the pending access times to the database."""
+        with self._lock:
+            if self._pending_access:
+                conn = self._connection()
+                self._write_access_times(conn)
+                conn.commit()
+
+    def _is_expired(self, created_at, now):
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def get(self, key, default=None):
+        """
+        Looks up a key in the cache.
+
+        Args:
+            key (str): The cache key.
+            default: Value returned when the key is missing or expired.
+
+        Returns:
+            The cached value, or default on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+
+            if row is None or self._is_expired(row[1], now):
+                if row is not None:
+                    self._pending_access.pop(key, None)
+                    conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                    conn.commit()
+                    self.evictions += 1
+                self.misses += 1
+                return default
+
+            if self.max_entries > 0:
+                self._pending_access[key] = now
+                if len(self._pending_access) >= self.access_flush_interval:
+                    self._write_access_times(conn)
+                    conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key, value):
+        """
+        Stores a value in the cache, evicting the least recently used entries if the
+        cache is over its size limit.
+
+        Args:
+            key (str): The cache key.
+            value: Any JSON serializable value.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)", (key, json.dumps(value), now, now))
+            self._pending_access.pop(key, None)
+
+            if self.max_entries > 0:
+                # Evict based on up to date access times
+                self._write_access_times(conn)
+                count = conn.execute(
+                    f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+                overflow = count - self.max_entries
+                if overflow > 0:
+                    conn.execute(
+                        f"DELETE FROM {self.table} WHERE key IN ("
+                        f"SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)", (overflow,))
+                    self.evictions += overflow
+            conn.commit()
+
+    def purge_expired(self):
+        """Removes every expired entry. Returns the number of entries removed."""
+        if self.ttl_seconds <= 0:
+            return 0
+        with self._lock:
+            conn = self._connection()
+            self._write_access_times(conn)
+            cursor = conn.execute(
+                f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            conn.commit()
+            self.evictions += cursor.rowcount
+            return cursor.rowcount
+
+    def clear(self):
+        """Removes every entry and resets the counters."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute(f"DELETE FROM {self.table}")
+            conn.commit()
+            self._pending_access.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit/miss/eviction counters and the number of stored entries.
+        """
+        with self._lock:
+            conn = self._connection()
+            if self._pending_access:
+                self._write_access_times(conn)
+                conn.commit()
+            size = conn.execute(
+                f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0,
+            "entries": size,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+        }
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache with an optional TTL.
+
+    If a PersistentCache is given, entries are written through to it and looked up
+    in it on a memory miss, so they survive restarts.
+    """
+
+    def __init__(self, max_entries=0, ttl_seconds=0, persistent=None):
+        """
+        Args:
+            max_entries (int): Maximum number of entries kept in memory (0 disables eviction).
+            ttl_seconds (int): Time to live of an entry in seconds (0 disables expiry).
+            persistent (PersistentCache): Optional on-disk cache backing this cache.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Looks up a key, marking it as most recently used.
+
+        Returns:
+            The cached value, or default on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if self.ttl_seconds > 0 and now - created_at > self.ttl_seconds:
+                    del self._entries[key]
+                    self.evictions += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+
+        if self.persistent is not None:
+            value = self.persistent.get(str(key))
+            if value is not None:
+                with self._lock:
+                    self._store(key, value, now)
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def _store(self, key, value, now):
+        self._entries[key] = (now, value)
+        self._entries.move_to_end(key)
+        while self.max_entries > 0 and len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def set(self, key, value):
+        """Stores a value, evicting the least recently used entries if the cache is full."""
+        with self._lock:
+            self._store(key, value, time.time())
+        if self.persistent is not None:
+            self.persistent.set(str(key), value)
+
+    def clear(self):
+        """Removes every in-memory entry and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit/miss/eviction counters and the number of in-memory entries
+                  (plus the persistent cache's stats, if any).
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0,
+                "entries": len(self._entries),
+                "ttl_seconds": self.ttl_seconds,
+                "max_entries": self.max_entries,
+            }
+        if self.persistent is not None:
+            stats["persistent"] = self.persistent.stats()
+        return stats
@@ -0,0 +1,212 @@
+import numpy as np
+from DatasetStore import coordinate_arrays, LON_COLUMN, LAT_COLUMN
+
+# Highest zoom level that is clustered, points are returned individually above it
+MAX_CLUSTER_ZOOM = 16
+# Cells are 2^-CELL_ZOOM_OFFSET of a tile wide (64px cells on 256px tiles)
+CELL_ZOOM_OFFSET = 2
+# Cluster ids encode the cluster's cell key and zoom: id = key * ZOOM_FACTOR + zoom
+ZOOM_FACTOR = 32
+
+
+def lon_to_x(lon):
+    """Longitude to normalized Web Mercator x in [0, 1]."""
+    return (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0
+
+
+def lat_to_y(lat):
+    """Latitude to normalized Web Mercator y in [0, 1] (0 at the north edge)."""
+    sin = np.sin(np.radians(np.clip(lat, -85.05112878, 85.05112878)))
+    return 0.5 - np.log((1 + sin) / (1 - sin)) / (4 * np.pi)
+
+
+def x_to_lon(x):
+    """Normalized Web Mercator x to longitude."""
+    return np.asarray(x) * 360.0 - 180.0
+
+
+def y_to_lat(y):
+    """Normalized Web Mercator y to latitude."""
+    return np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * np.asarray(y)))))
+
+
+def cells_per_axis(zoom):
+    return 2 ** (zoom + CELL_ZOOM_OFFSET)
+
+
+def bbox_mask(lon, lat, bbox):
+    """
+    Vectorized test of which points fall inside a (west, south, east, north) box.
+    Boxes crossing the antimeridian (west > east) are supported.
+    """
+    west, south, east, north = bbox
+    in_lat = (lat >= south) & (lat <= north)
+    if west <= east:
+        return in_lat & (lon >= west) & (lon <= east)
+    return in_lat & ((lon >= west) | (lon <= east))
+
+
+class ClusterLevel:
+    """The clusters of one zoom level, sorted by cell key."""
+
+    def __init__(self, keys, counts, lon, lat, first_point):
+        self.keys = keys
+        self.counts = counts
+        self.lon = lon
+        self.lat = lat
+        # Index of a point of each cluster (the only point of single point clusters)
+        self.first_point = first_point
+
+    def find(self, keys):
+        """Returns the positions of the given cell keys in this level (-1 where missing)."""
+        keys = np.asarray(keys, dtype=np.int64)
+        if len(self.keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(
+            self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[positions] == keys, positions, -1)
+
+
+class ClusterIndex:
+    """
+    Hierarchical grid clustering of a point dataset, similar to supercluster.
+
+    Points are projected to Web Mercator and binned into square cells at every zoom
+    level from 0 to MAX_CLUSTER_ZOOM. Cells halve in size from one zoom to the next,
+    so every cluster's children are the (up to four) non-empty cells it splits into at
+    the next zoom. Every level is built with vectorized NumPy operations.
+    """
+
+    def __init__(self, table):
+        """
+        Args:
+            table (pa.Table): The dataset table (see DatasetStore).
+        """
+        self.table = table
+        self.lon, self.lat = coordinate_arrays(table)
+        x = np.clip(lon_to_x(self.lon), 0, 1 - 1e-12)
+        y = np.clip(lat_to_y(self.lat), 0, 1 - 1e-12)
+
+        self.levels = []
+        for zoom in range(MAX_CLUSTER_ZOOM + 1):
+            size = cells_per_axis(zoom)
+            keys = np.floor(x * size).astype(np.int64) * size + \
+                np.floor(y * size).astype(np.int64)
+            order = np.argsort(keys, kind='stable')
+            unique_keys, starts, counts = np.unique(
+                keys[order], return_index=True, return_counts=True)
+            if len(order):
+                lon_sums = np.add.reduceat(self.lon[order], starts)
+                lat_sums = np.add.reduceat(self.lat[order], starts)
+            else:
+                lon_sums = lat_sums = np.empty(0)
+            self.levels.append(ClusterLevel(
+                unique_keys, counts, lon_sums / np.maximum(counts, 1), lat_sums / np.maximum(counts, 1), order[starts]))
+
+            if zoom == MAX_CLUSTER_ZOOM:
+                # Points of each cluster of the last level, used to expand it into its points
+                self.max_zoom_order = order
+                self.max_zoom_starts = starts
+
+    def point_features(self, indices):
+        """Builds GeoJSON features for the given points, with all of their properties."""
+        properties = self.table.take(np.asarray(indices, dtype=np.int64)).drop_columns(
+            [LON_COLUMN, LAT_COLUMN]).to_pylist()
+        return [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [float(self.lon[i]), float(self.lat[i])]},
+                "properties": point_properties
+            }
+            for i, point_properties in zip(indices, properties)
+        ]
+
+    def level_features(self, zoom, positions):
+        """Builds GeoJSON features for clusters of a level; single point clusters are returned as their point."""
+        level = self.levels[zoom]
+        positions = np.asarray(positions, dtype=np.int64)
+        single = level.counts[positions] == 1
+
+        features = self.point_features(level.first_point[positions[single]])
+        for position in positions[~single]:
+            cluster_id = int(level.keys[position]) * ZOOM_FACTOR + zoom
+            features.append({
+                "type": "Feature",
+                "id": cluster_id,
+                "geometry": {"type": "Point", "coordinates": [float(level.lon[position]), float(level.lat[position])]},
+                "properties": {
+                    "cluster": True,
+                    "cluster_id": cluster_id,
+                    "point_count": int(level.counts[position])
+                }
+            })
+        return features
+
+    def get_clusters(self, bbox, zoom):
+        """
+        Returns the clusters and individual points visible in a bounding box at a zoom level.
+
+        Args:
+            bbox (tuple): (west, south, east, north) in degrees.
+            zoom (float): The map zoom level.
+
+        Returns:
+            list: GeoJSON features (clusters have 'cluster', 'cluster_id' and 'point_count' properties).
+        """
+        zoom = max(int(np.floor(zoom)), 0)
+        if zoom > MAX_CLUSTER_ZOOM:
+            return self.point_features(np.flatnonzero(bbox_mask(self.lon, self.lat, bbox)))
+
+        level = self.levels[zoom]
+        return self.level_features(zoom, np.flatnonzero(bbox_mask(level.lon, level.lat, bbox)))
+
+    def _decode(self, cluster_id):
+        zoom, key = cluster_id % ZOOM_FACTOR, cluster_id // ZOOM_FACTOR
+        if zoom > MAX_CLUSTER_ZOOM:
+            raise ValueError(f"Invalid cluster id: {cluster_id}")
+        position = self.levels[zoom].find(np.array([key]))[0]
+        if position < 0:
+            raise ValueError(f"Cluster not found: {cluster_id}")
+        return zoom, key, position
+
+    def _child_positions(self, zoom, key):
+        size = cells_per_axis(zoom)
+        cell_x, cell_y = key // size, key % size
+        child_keys = np.array([(2 * cell_x + i) * (2 * size) + 2 * cell_y + j
+                               for i in (0, 1) for j in (0, 1)], dtype=np.int64)
+        positions = self.levels[zoom + 1].find(child_keys)
+        return positions[positions >= 0]
+
+    def get_children(self, cluster_id):
+        """
+        Expands a cluster into its children at the next zoom level (or into its points
+        for clusters of the last level).
+
+        Args:
+            cluster_id (int): The cluster id.
+
+        Returns:
+            dict: 'features' (the children) and 'expansion_zoom' (the zoom at which the cluster splits).
+        """
+        zoom, key, position = self._decode(cluster_id)
+        if zoom == MAX_CLUSTER_ZOOM:
+            start = self.max_zoom_starts[position]
+            count = self.levels[zoom].counts[position]
+            return {
+                "features": self.point_features(self.max_zoom_order[start:start + count]),
+                "expansion_zoom": MAX_CLUSTER_ZOOM + 1
+            }
+        return {
+            "features": self.level_features(zoom + 1, self._child_positions(zoom, key)),
+            "expansion_zoom": self.get_expansion_zoom(cluster_id)
+        }
+
+    def get_expansion_zoom(self, cluster_id):
+        """Returns the first zoom level at which the cluster splits into more than one child."""
+        zoom, key, _ = self._decode(cluster_id)
+        while zoom < MAX_CLUSTER_ZOOM:
+            children = self._child_positions(zoom, key)
+            if len(children) != 1:
+                return zoom + 1
+            zoom, key = zoom + 1, int(self.levels[zoom + 1].keys[children[0]])
+        return MAX_CLUSTER_ZOOM + 1
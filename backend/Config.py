@@ -16,6 +16,24 @@ load_dotenv(os.path.join(base_dir, 'env', '.env'))
 ACCESS_TOKEN = os.getenv('ACCESS_TOKEN', 'access-token')
 TOM_TOM_API_KEY = os.getenv('TOM_TOM_API_KEY', 'tom-tom-api-key')
 
+# Base URL of the TomTom APIs (can be pointed at a local stub server for testing)
+TOM_TOM_API_BASE_URL = os.getenv('TOM_TOM_API_BASE_URL', 'https://api.tomtom.com')
+
+# Shared TomTom client: requests per second across all threads and API transactions per day (0 disables
+# either limit), pooled connections, retries with jittered exponential backoff, timeouts in seconds and
+# the circuit breaker (consecutive failures suspending an endpoint, and for how long)
+TOM_TOM_QPS = float(os.getenv('TOM_TOM_QPS', 10))
+TOM_TOM_DAILY_QUOTA = int(os.getenv('TOM_TOM_DAILY_QUOTA', 0))
+TOM_TOM_POOL_SIZE = int(os.getenv('TOM_TOM_POOL_SIZE', 16))
+TOM_TOM_MAX_RETRIES = int(os.getenv('TOM_TOM_MAX_RETRIES', 3))
+TOM_TOM_BACKOFF_SECONDS = float(os.getenv('TOM_TOM_BACKOFF_SECONDS', 0.5))
+TOM_TOM_BACKOFF_MAX_SECONDS = float(os.getenv('TOM_TOM_BACKOFF_MAX_SECONDS', 8))
+TOM_TOM_CONNECT_TIMEOUT_SECONDS = float(os.getenv('TOM_TOM_CONNECT_TIMEOUT_SECONDS', 5))
+TOM_TOM_TIMEOUT_SECONDS = float(os.getenv('TOM_TOM_TIMEOUT_SECONDS', 15))
+TOM_TOM_BATCH_TIMEOUT_SECONDS = float(os.getenv('TOM_TOM_BATCH_TIMEOUT_SECONDS', 60))
+TOM_TOM_CIRCUIT_FAILURES = int(os.getenv('TOM_TOM_CIRCUIT_FAILURES', 5))
+TOM_TOM_CIRCUIT_RESET_SECONDS = float(os.getenv('TOM_TOM_CIRCUIT_RESET_SECONDS', 30))
+
 # Path to map legend config
 MAP_LEGEND_CONFIG = os.path.join(base_dir, 'data', 'map_legend_config.json')
 
@@ -25,6 +43,20 @@ CURR_TECHNICIANS_DATA_FILE_GEOJSON = os.path.join(
 CURR_CUSTOMERS_DATA_FILE_GEOJSON = os.path.join(
     base_dir, 'data', 'customers_data.json')
 
+# Directories of the versioned (Arrow IPC segments and manifests) technicians and customers datasets
+TECHNICIANS_DATA_DIR = os.path.join(base_dir, 'data', 'technicians_versions')
+CUSTOMERS_DATA_DIR = os.path.join(base_dir, 'data', 'customers_versions')
+# Number of dataset versions kept for rollback, and number of segments after which a version is compacted
+DATASET_VERSION_RETENTION = int(os.getenv('DATASET_VERSION_RETENTION', 10))
+DATASET_MAX_SEGMENTS = int(os.getenv('DATASET_MAX_SEGMENTS', 8))
+
+# Pre-versioning columnar datasets; these (or else the GeoJSON files above) are imported as the
+# first version of a dataset that has no version yet
+TECHNICIANS_DATA_FILE_ARROW = os.path.join(
+    base_dir, 'data', 'technicians_data.arrow')
+CUSTOMERS_DATA_FILE_ARROW = os.path.join(
+    base_dir, 'data', 'customers_data.arrow')
+
 CURR_CUSTOMERS_DATA_FILE_CSV = os.path.join(
     base_dir, 'data', 'customers_curr.csv')
 PREVIOUS_CUSTOMERS_DATA_CSV = os.path.join(
@@ -35,6 +67,72 @@ CURR_TECHNICIANS_DATA_FILE_CSV = os.path.join(
 PREVIOUS_TECHNICIANS_DATA_CSV = os.path.join(
     base_dir, 'data', 'technicians_prev.csv')
 
+# SQLite database holding the persistent caches (geocoded addresses, etc.)
+CACHE_DB_FILE = os.path.join(base_dir, 'data', 'cache.sqlite3')
+
+# Geocode cache settings (0 disables the TTL / size limit)
+GEOCODE_CACHE_TTL_SECONDS = int(os.getenv('GEOCODE_CACHE_TTL_SECONDS', 0))
+GEOCODE_CACHE_MAX_ENTRIES = int(os.getenv('GEOCODE_CACHE_MAX_ENTRIES', 0))
+
+# Geocoding concurrency (worker threads) and TomTom search QPS quota
+GEOCODE_MAX_WORKERS = int(os.getenv('GEOCODE_MAX_WORKERS', 8))
+GEOCODE_QPS = float(os.getenv('GEOCODE_QPS', 5))
+
+# Geocoding backend: 'single' (one request per address) or 'batch' (TomTom batch search)
+GEOCODE_MODE = os.getenv('GEOCODE_MODE', 'single')
+# Addresses sent per batch search request (TomTom's synchronous batch API accepts up to 100)
+GEOCODE_BATCH_SIZE = int(os.getenv('GEOCODE_BATCH_SIZE', 100))
+
+# Nearest technician routing: 'route' (one calculateRoute request per technician, sent concurrently)
+# or 'matrix' (one Matrix Routing request for all technicians, falling back to per-route requests)
+ROUTING_MODE = os.getenv('ROUTING_MODE', 'route')
+# Maximum concurrent calculateRoute requests
+ROUTING_MAX_WORKERS = int(os.getenv('ROUTING_MAX_WORKERS', 8))
+# Origins sent per Matrix Routing request
+ROUTING_MATRIX_BATCH_SIZE = int(os.getenv('ROUTING_MATRIX_BATCH_SIZE', 100))
+# Candidates routed per wave when a nearest technicians request sets a limit
+ROUTING_WAVE_SIZE = int(os.getenv('ROUTING_WAVE_SIZE', 4))
+
+# Route summary cache: destinations are rounded to a grid (in degrees) and departure times to a
+# time bucket (in seconds) so that traffic sensitive results expire
+ROUTE_CACHE_GRID_DEGREES = float(os.getenv('ROUTE_CACHE_GRID_DEGREES', 0.001))
+ROUTE_CACHE_TIME_BUCKET_SECONDS = int(os.getenv('ROUTE_CACHE_TIME_BUCKET_SECONDS', 900))
+ROUTE_CACHE_TTL_SECONDS = int(os.getenv('ROUTE_CACHE_TTL_SECONDS', 900))
+ROUTE_CACHE_MAX_ENTRIES = int(os.getenv('ROUTE_CACHE_MAX_ENTRIES', 10000))
+# Set to 'true' to also persist route summaries to the cache database
+ROUTE_CACHE_PERSIST = os.getenv('ROUTE_CACHE_PERSIST', 'false').lower() == 'true'
+
+# Reachable range (isochrone) polygon cache: origins are rounded to a grid (in degrees) and the
+# request time to a time-of-week bucket (in seconds), so polygons are reused for the same origin,
+# budget and time of week until they expire
+ISOCHRONE_CACHE_GRID_DEGREES = float(os.getenv('ISOCHRONE_CACHE_GRID_DEGREES', 0.001))
+ISOCHRONE_CACHE_TIME_BUCKET_SECONDS = int(os.getenv('ISOCHRONE_CACHE_TIME_BUCKET_SECONDS', 3600))
+ISOCHRONE_CACHE_TTL_SECONDS = int(os.getenv('ISOCHRONE_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+ISOCHRONE_CACHE_MAX_ENTRIES = int(os.getenv('ISOCHRONE_CACHE_MAX_ENTRIES', 5000))
+
+# Vector tile cache: encoded tiles kept in memory (LRU) and on disk, per dataset version
+TILE_CACHE_DIR = os.path.join(base_dir, 'data', 'tiles')
+TILE_CACHE_MAX_ENTRIES = int(os.getenv('TILE_CACHE_MAX_ENTRIES', 2000))
+
+# Uploads processed concurrently in the background (uploads to the same dataset always run one at a time)
+# and number of finished upload jobs kept for status queries
+UPLOAD_JOB_MAX_WORKERS = int(os.getenv('UPLOAD_JOB_MAX_WORKERS', 2))
+UPLOAD_JOB_HISTORY = int(os.getenv('UPLOAD_JOB_HISTORY', 100))
+
+# Rows parsed at a time when reading uploaded CSV files
+CSV_CHUNK_ROWS = int(os.getenv('CSV_CHUNK_ROWS', 50000))
+
+# Largest number of polygons accepted by one batch geofence request, and the equal-area projection
+# geofence areas are computed in
+GEOFENCE_BATCH_MAX_POLYGONS = int(os.getenv('GEOFENCE_BATCH_MAX_POLYGONS', 1000))
+GEOFENCE_AREA_CRS = os.getenv('GEOFENCE_AREA_CRS', 'EPSG:6933')
+
+# Bulk nearest technician assignment: largest k accepted, customers processed at a time and worker
+# threads (0 uses every CPU)
+NEAREST_BULK_MAX_K = int(os.getenv('NEAREST_BULK_MAX_K', 20))
+NEAREST_BULK_CHUNK_ROWS = int(os.getenv('NEAREST_BULK_CHUNK_ROWS', 2048))
+NEAREST_BULK_MAX_WORKERS = int(os.getenv('NEAREST_BULK_MAX_WORKERS', 0))
+
 config_bp = Blueprint('config', __name__)
 
 # Function to read the configuration file
@@ -0,0 +1,171 @@
+import os
+import numpy as np
+import pyarrow as pa
+
+# Coordinate columns of a stored dataset, every other column is a feature property
+LON_COLUMN = 'lon'
+LAT_COLUMN = 'lat'
+
+
+def property_array(values):
+    """Builds an Arrow array for a property column, falling back to strings for mixed value types."""
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+
+def geojson_to_table(geojson):
+    """
+    Converts a GeoJSON FeatureCollection of Point features to a columnar Arrow table.
+
+    Args:
+        geojson (dict): The GeoJSON FeatureCollection.
+
+    Returns:
+        pa.Table: A table with 'lon' and 'lat' float64 columns and one column per feature property.
+    """
+    lon, lat, properties = [], [], []
+    for feature in geojson.get("features", []):
+        geometry = feature.get("geometry") or {}
+        coordinates = geometry.get("coordinates")
+        if geometry.get("type") != "Point" or not coordinates or len(coordinates) < 2:
+            continue
+        lon.append(coordinates[0])
+        lat.append(coordinates[1])
+        properties.append(feature.get("properties") or {})
+
+    columns = {
+        LON_COLUMN: pa.array(lon, type=pa.float64()),
+        LAT_COLUMN: pa.array(lat, type=pa.float64()),
+    }
+    # Keep the property order of the features
+    names = list(dict.fromkeys(
+        key for feature_properties in properties for key in feature_properties))
+    for name in names:
+        if name in columns:
+            continue
+        columns[name] = property_array(
+            [feature_properties.get(name) for feature_properties in properties])
+    return pa.table(columns)
+
+
+def table_to_geojson(table):
+    """
+    Converts a stored dataset table back to a GeoJSON FeatureCollection.
+
+    Args:
+        table (pa.Table): The dataset table.
+
+    Returns:
+        dict: The GeoJSON FeatureCollection.
+    """
+    lon = table.column(LON_COLUMN).to_pylist()
+    lat = table.column(LAT_COLUMN).to_pylist()
+    properties = table.drop_columns([LON_COLUMN, LAT_COLUMN]).to_pylist()
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [x, y]
+                },
+                "properties": feature_properties
+            }
+            for x, y, feature_properties in zip(lon, lat, properties)
+        ]
+    }
+
+
+def concat_tables(table, other):
+    """
+    Appends the rows of a table to another. Columns missing from either table are filled
+    with nulls and columns whose types differ are stored as strings.
+
+    Args:
+        table (pa.Table): The existing rows.
+        other (pa.Table): The rows to append.
+
+    Returns:
+        pa.Table: The rows of both tables, in order.
+    """
+    names = list(dict.fromkeys(table.column_names + other.column_names))
+    columns = {}
+    for name in names:
+        parts = []
+        for part in (table, other):
+            if name in part.column_names:
+                parts.append(part.column(name).combine_chunks())
+            else:
+                parts.append(None)
+        types = {part.type for part in parts if part is not None and part.type != pa.null()}
+        if len(types) > 1:
+            # Mixed value types, fall back to strings like property_array
+            parts = [None if part is None else property_array(
+                [None if value is None else str(value) for value in part.to_pylist()]) for part in parts]
+            column_type = pa.string()
+        else:
+            column_type = types.pop() if types else pa.null()
+        columns[name] = pa.concat_arrays([
+            pa.nulls(len(part_table), type=column_type) if part is None else part.cast(column_type)
+            for part, part_table in zip(parts, (table, other))
+        ])
+    return pa.table(columns)
+
+
+def write_table(path, table):
+    """
+    Atomically writes a table to an uncompressed Arrow IPC file, so it can be memory mapped
+    and read without copying.
+
+    Args:
+        path (str): The destination file path.
+        table (pa.Table): The table to write.
+    """
+    temp_path = f"{path}.tmp"
+    with pa.OSFile(temp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            # A single record batch keeps every column in one contiguous chunk
+            writer.write_table(table.combine_chunks())
+    os.replace(temp_path, path)
+
+
+def read_table(path):
+    """
+    Reads an Arrow IPC file through a memory map. The returned columns reference the
+    mapped file instead of being copied into memory.
+
+    Args:
+        path (str): The file path.
+
+    Returns:
+        pa.Table: The stored table.
+    """
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def coordinate_arrays(table):
+    """
+    Returns the table's coordinate columns as NumPy arrays (zero-copy for a table read with read_table).
+
+    Returns:
+        tuple: (lon, lat) float64 NumPy arrays.
+    """
+    def to_numpy(column):
+        column = table.column(column)
+        if column.num_chunks == 1:
+            return column.chunk(0).to_numpy(zero_copy_only=False)
+        return np.asarray(column.combine_chunks().to_numpy(zero_copy_only=False))
+
+    return to_numpy(LON_COLUMN), to_numpy(LAT_COLUMN)
+
+
+def property_values(table, column):
+    """Returns a property column as a NumPy object array (None for missing columns or values)."""
+    if column not in table.column_names:
+        return np.full(table.num_rows, None, dtype=object)
+    return np.asarray(table.column(column).to_pylist(), dtype=object)
+
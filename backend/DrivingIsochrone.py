@@ -1,12 +1,43 @@
 import requests
+import time
 from flask import Flask, request, jsonify, Blueprint
 import json
-from Config import TOM_TOM_API_KEY
-import requests
+from Cache import LRUCache, PersistentCache
+from TomTomClient import tomtom_client, REACHABLE_RANGE
+from Config import CACHE_DB_FILE
+from Config import ISOCHRONE_CACHE_GRID_DEGREES, ISOCHRONE_CACHE_TIME_BUCKET_SECONDS, ISOCHRONE_CACHE_TTL_SECONDS, ISOCHRONE_CACHE_MAX_ENTRIES
 
 # Blueprint for the driving isochrone feature
 driving_isochrone_bp = Blueprint('driving-isochrone', __name__)
 
+SECONDS_PER_WEEK = 7 * 24 * 3600
+
+# Reachable range responses, kept in memory and persisted to the cache database
+reachable_range_cache = LRUCache(
+    ISOCHRONE_CACHE_MAX_ENTRIES,
+    ISOCHRONE_CACHE_TTL_SECONDS,
+    PersistentCache(CACHE_DB_FILE, 'reachable_ranges',
+                    ISOCHRONE_CACHE_TTL_SECONDS, ISOCHRONE_CACHE_MAX_ENTRIES)
+)
+
+
+def reachable_range_cache_key(latitude, longitude, bottleneck, budget, request_time=None):
+    """
+    Builds the reachable range cache key from the origin rounded to ISOCHRONE_CACHE_GRID_DEGREES,
+    the bottleneck type, the budget and the time-of-week bucket of the request.
+    """
+    request_time = time.time() if request_time is None else request_time
+    time_bucket = int((request_time % SECONDS_PER_WEEK) //
+                      ISOCHRONE_CACHE_TIME_BUCKET_SECONDS)
+    grid = ISOCHRONE_CACHE_GRID_DEGREES
+    return "|".join([
+        f"{round(latitude / grid) * grid:.6f},{round(longitude / grid) * grid:.6f}",
+        bottleneck,
+        str(budget),
+        str(time_bucket),
+    ])
+
+
 # Route for calculating reachable range isochrone
 @driving_isochrone_bp.route("/reachable-range", methods=['POST'])
 def calculate_reachable_range():
@@ -63,18 +94,22 @@ def calculate_reachable_range():
         except ValueError as e:
             return jsonify({"error": "Invalid parameter type"}), 400
 
-        # Base URL for TomTom API
-        base_url = "https://api.tomtom.com/routing/1/calculateReachableRange/"
+        # Reuse a cached polygon for the same origin cell, budget and time bucket
+        bottleneck_type = 'distance' if bottleneck == 'distance' else 'time'
+        cache_key = reachable_range_cache_key(
+            latitude, longitude, bottleneck_type, max_miles if bottleneck_type == 'distance' else time_budget)
+        cached = reachable_range_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(cached), 200
 
-        # Construct the full URL with the provided parameters
-        url = f"{base_url}{latitude},{longitude}/json"
+        # Construct the API path with the provided parameters
+        path = f"/routing/1/calculateReachableRange/{latitude},{longitude}/json"
         if bottleneck == 'distance':
             params = {
                 'report': 'effectiveSettings',
                 'distanceBudgetInMeters': max_miles * 1609.344,
                 'traffic': 'true',
-                'travelMode': 'car',
-                'key': TOM_TOM_API_KEY
+                'travelMode': 'car'
             }
         else:
             print(time_budget)
@@ -82,16 +117,17 @@ def calculate_reachable_range():
                 'report': 'effectiveSettings',
                 'timeBudgetInSec': time_budget,
                 'traffic': 'true',
-                'travelMode': 'car',
-                'key': TOM_TOM_API_KEY
+                'travelMode': 'car'
             }
 
-        # Make the API request
-        response = requests.get(url, params=params)
+        # Make the API request (through the shared client: pooled, retried and rate limited)
+        response = tomtom_client.get(REACHABLE_RANGE, path, params=params)
 
         # Check if the response is successful
         if response.status_code == 200:
-            return jsonify(response.json()), 200  # Return the response as a JSON object
+            reachable_range = response.json()
+            reachable_range_cache.set(cache_key, reachable_range)
+            return jsonify(reachable_range), 200  # Return the response as a JSON object
         else:
             return jsonify({
                 "error": f"TomTom API error",
@@ -99,6 +135,19 @@ def calculate_reachable_range():
                 "message": response.text
             }), response.status_code
 
+    except requests.exceptions.RequestException as e:
+        # TomTom unreachable, suspended by the circuit breaker or out of quota
+        return jsonify({"error": f"TomTom API unavailable: {str(e)}"}), 503
+
     except Exception as e:
         # Handle unexpected server errors
         return jsonify({"error": str(e)}), 500
+
+
+# Route for inspecting the reachable range cache (hit/miss counts for tuning the quantization)
+@driving_isochrone_bp.route("/cache-stats", methods=['GET'])
+def get_reachable_range_cache_stats():
+    try:
+        return jsonify(reachable_range_cache.stats()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,131 @@
+import base64
+import numpy as np
+import pandas as pd
+from DatasetStore import coordinate_arrays, property_values, LON_COLUMN, LAT_COLUMN
+
+# Page size used when the request does not set one, and the largest page returned
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+
+def sort_ranks(values):
+    """
+    Ranks the features of a dataset by a property, so that any subset of the dataset can
+    be put in order (and paged through) by comparing integer ranks.
+
+    Numeric properties are sorted numerically, other properties case-insensitively as
+    text. Missing values are sorted last and ties keep the dataset order.
+
+    Args:
+        values (np.ndarray): The property value of each feature.
+
+    Returns:
+        np.ndarray: The rank of each feature.
+    """
+    series = pd.Series(values, dtype=object)
+    missing = series.isna().to_numpy()
+    try:
+        keys = pd.to_numeric(series, errors='raise').to_numpy(dtype=np.float64)
+        order = np.lexsort((np.arange(len(keys)), np.nan_to_num(keys), missing))
+    except (ValueError, TypeError):
+        keys = series.fillna('').astype(str).str.lower().to_numpy()
+        order = sorted(range(len(keys)), key=lambda i: (missing[i], keys[i], i))
+
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[np.asarray(order, dtype=np.int64)] = np.arange(len(values))
+    return ranks
+
+
+def encode_cursor(version, sort_field, rank):
+    """Encodes the position after which the next page starts as an opaque cursor."""
+    return base64.urlsafe_b64encode(f"{version}:{sort_field}:{rank}".encode()).decode()
+
+
+def decode_cursor(cursor, version, sort_field):
+    """
+    Decodes a cursor returned by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed, was issued for another sort order, or the
+                    dataset changed since it was issued (pagination must restart).
+    """
+    try:
+        cursor_version, cursor_sort, rank = base64.urlsafe_b64decode(
+            cursor.encode()).decode().split(':')
+        cursor_version, rank = int(cursor_version), int(rank)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort_field:
+        raise ValueError("The cursor was issued for another sort order")
+    if cursor_version != version:
+        raise ValueError("The dataset changed, restart pagination without a cursor")
+    return rank
+
+
+def query_features(table, positions, ranks, version, sort_field, fields=None, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    Returns one page of features, in sort order, out of the given dataset positions.
+
+    Args:
+        table (pa.Table): The dataset table.
+        positions (np.ndarray): Positions of the features matching the query (e.g. inside a viewport).
+        ranks (np.ndarray): The rank of every feature of the dataset (see sort_ranks).
+        version (int): The dataset version, cursors are only valid for the version they were issued for.
+        sort_field (str): The property the ranks were computed from.
+        fields (list): Properties included in the features, or None for every property.
+        limit (int): Maximum number of features returned.
+        cursor (str): The 'next_cursor' of the previous page, or None for the first page.
+
+    Returns:
+        dict: 'total' (features matching the query), 'features' and 'next_cursor' (None on the last page).
+
+    Raises:
+        ValueError: For unknown fields, an invalid limit or an invalid cursor.
+    """
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    property_columns = [name for name in table.column_names if name not in (LON_COLUMN, LAT_COLUMN)]
+    if fields is None:
+        fields = property_columns
+    unknown = [field for field in fields if field not in property_columns]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    positions = np.asarray(positions, dtype=np.int64)
+    total = len(positions)
+    position_ranks = ranks[positions]
+    if cursor:
+        after = position_ranks > decode_cursor(cursor, version, sort_field)
+        positions, position_ranks = positions[after], position_ranks[after]
+
+    # Only the page itself needs to be sorted
+    if len(positions) > limit:
+        smallest = np.argpartition(position_ranks, limit - 1)[:limit]
+        positions, position_ranks = positions[smallest], position_ranks[smallest]
+        has_more = True
+    else:
+        has_more = False
+    order = np.argsort(position_ranks)
+    positions, position_ranks = positions[order], position_ranks[order]
+
+    lon, lat = coordinate_arrays(table)
+    properties = table.take(positions).select(fields).to_pylist()
+    return {
+        "total": total,
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [float(lon[i]), float(lat[i])]},
+                "properties": feature_properties
+            }
+            for i, feature_properties in zip(positions, properties)
+        ],
+        "next_cursor": encode_cursor(version, sort_field, int(position_ranks[-1])) if has_more else None
+    }
+
+
+def build_sort_ranks(sort_field):
+    """Returns a FeatureStore builder computing the ranks of a dataset's features by a property."""
+    def builder(table):
+        return sort_ranks(property_values(table, sort_field))
+    return builder
@@ -0,0 +1,289 @@
+import json
+import os
+import threading
+import time
+import pyarrow as pa
+from Config import CURR_TECHNICIANS_DATA_FILE_GEOJSON, CURR_CUSTOMERS_DATA_FILE_GEOJSON, CUSTOMERS_DATA_FILE_ARROW, TECHNICIANS_DATA_FILE_ARROW, CUSTOMERS_DATA_DIR, TECHNICIANS_DATA_DIR, DATASET_VERSION_RETENTION, DATASET_MAX_SEGMENTS
+from DatasetStore import read_table, geojson_to_table, table_to_geojson, coordinate_arrays, property_values, LON_COLUMN, LAT_COLUMN
+from SpatialIndex import PointIndex
+from VersionedDataset import VersionedDataset
+
+# Dataset names and the property identifying each feature
+CUSTOMERS = 'customers'
+TECHNICIANS = 'technicians'
+DATASET_ID_FIELDS = {
+    CUSTOMERS: 'cnum',
+    TECHNICIANS: 'id',
+}
+
+
+def empty_geojson():
+    """Returns an empty GeoJSON FeatureCollection."""
+    return {"type": "FeatureCollection", "features": []}
+
+
+def empty_table():
+    """Returns an empty dataset table."""
+    return pa.table({LON_COLUMN: pa.array([], type=pa.float64()), LAT_COLUMN: pa.array([], type=pa.float64())})
+
+
+class FeatureStore:
+    """
+    Process-wide store of the customer and technician datasets.
+
+    Each dataset is a VersionedDataset: immutable columnar Arrow segments which are memory
+    mapped, so loading is near-instant and the coordinate columns are read without
+    copying. A dataset is only reloaded when its HEAD version changes (after an upload
+    commits or a rollback, possibly from another process). Callers can use the version
+    number to key derived data. Data derived from a dataset (e.g. its GeoJSON or spatial
+    index) is built once per version with get_derived(). The returned data is shared
+    between requests and must not be modified.
+    """
+
+    def __init__(self, paths, legacy_paths=None, retention=10, max_segments=8):
+        """
+        Args:
+            paths (dict): Dataset name -> directory of the versioned dataset.
+            legacy_paths (dict): Dataset name -> (Arrow file, GeoJSON file) imported as the first version
+                                 if the dataset has no version yet.
+            retention (int): Number of versions kept per dataset for rollback.
+            max_segments (int): Versions made of more segments are compacted into a single segment.
+        """
+        self.paths = dict(paths)
+        self.stores = {name: VersionedDataset(path, retention, max_segments)
+                       for name, path in self.paths.items()}
+        self.legacy_paths = dict(legacy_paths or {})
+        self._datasets = {}
+        self._lock = threading.Lock()
+        # Reentrant so that builders can use other derived data of the same dataset
+        self._derived_lock = threading.RLock()
+        self.reloads = 0
+        self.parse_time_seconds = 0.0
+
+    def _import_legacy(self, name):
+        """Imports the dataset from its pre-versioning Arrow or GeoJSON file."""
+        store = self.stores[name]
+        for legacy_path in self.legacy_paths.get(name, ()):
+            if os.path.exists(legacy_path):
+                print(f"Importing {legacy_path} to {store.directory}")
+                if legacy_path.endswith('.arrow'):
+                    table = read_table(legacy_path)
+                else:
+                    with open(legacy_path) as file:
+                        table = geojson_to_table(json.load(file))
+                return store.commit_table(table, kind='import')
+        return None
+
+    def _load(self, name, head):
+        start = time.perf_counter()
+        store = self.stores[name]
+        try:
+            if head is None:
+                head = self._import_legacy(name)
+            table = store.read(head) if head is not None else empty_table()
+        except Exception as e:
+            # Never serve (or diff uploads against) a broken version as an empty dataset,
+            # nothing is cached so the next access retries
+            print(f"Error loading {name} data: {e}")
+            raise
+        elapsed = time.perf_counter() - start
+
+        self._datasets[name] = {
+            "table": table,
+            "signature": head,
+            "version": head or 0,
+            "fingerprint": store.fingerprint(head) if head is not None else "empty",
+            "parse_time_seconds": elapsed,
+            "derived": {},
+        }
+        self.reloads += 1
+        self.parse_time_seconds += elapsed
+        return self._datasets[name]
+
+    def _dataset(self, name):
+        if name not in self.paths:
+            raise KeyError(f"Unknown dataset: {name}")
+        head = self.stores[name].head()
+        with self._lock:
+            dataset = self._datasets.get(name)
+            if dataset is None or dataset["signature"] != head:
+                dataset = self._load(name, head)
+            return dataset
+
+    def get_table(self, name):
+        """
+        Returns the columnar table of a dataset, reloading it if the file changed.
+
+        Args:
+            name (str): The dataset name (CUSTOMERS or TECHNICIANS).
+
+        Returns:
+            pa.Table: The dataset's 'lon'/'lat' columns and one column per feature property.
+        """
+        return self._dataset(name)["table"]
+
+    def get(self, name):
+        """
+        Returns a dataset as a GeoJSON FeatureCollection, generated once per dataset version.
+
+        Args:
+            name (str): The dataset name (CUSTOMERS or TECHNICIANS).
+
+        Returns:
+            dict: The GeoJSON FeatureCollection (shared, do not modify).
+        """
+        return self.get_derived(name, "geojson", table_to_geojson)
+
+    def get_version(self, name):
+        """Returns the dataset's committed version number (0 if the dataset is empty)."""
+        return self._dataset(name)["version"]
+
+    def get_fingerprint(self, name):
+        """
+        Returns an identifier of the dataset's contents (see VersionedDataset.fingerprint),
+        which can key data persisted across restarts.
+        """
+        return self._dataset(name)["fingerprint"]
+
+    def get_retained_fingerprints(self, name):
+        """Returns the fingerprints of the dataset's retained versions, current one included."""
+        store = self.stores[name]
+        fingerprints = {self.get_fingerprint(name)}
+        for version in store.versions():
+            try:
+                fingerprints.add(store.fingerprint(version))
+            except FileNotFoundError:
+                # Removed by a concurrent commit's retention
+                continue
+        return fingerprints
+
+    def get_derived(self, name, key, builder):
+        """
+        Returns data derived from a dataset, building it once per dataset version.
+
+        Args:
+            name (str): The dataset name.
+            key (str): Identifies the derived data.
+            builder (callable): Called with the dataset's table to build the derived data.
+
+        Returns:
+            The derived data for the current version of the dataset (shared, do not modify).
+        """
+        dataset = self._dataset(name)
+        derived = dataset["derived"]
+        if key not in derived:
+            with self._derived_lock:
+                if key not in derived:
+                    derived[key] = builder(dataset["table"])
+        return derived[key]
+
+    def get_point_index(self, name):
+        """Returns the PointIndex (coordinate arrays and STRtree) of a dataset."""
+        def build_point_index(table):
+            lon, lat = coordinate_arrays(table)
+            id_field = DATASET_ID_FIELDS[name]
+            return PointIndex(lon, lat, property_values(table, id_field), property_values(table, "name"), id_field)
+
+        return self.get_derived(name, "point_index", build_point_index)
+
+    def save(self, name, geojson):
+        """
+        Commits the features of a GeoJSON FeatureCollection as a new version of a dataset.
+        Only the features that changed are stored; readers pick the version up atomically.
+
+        Args:
+            name (str): The dataset name.
+            geojson (dict): The new GeoJSON FeatureCollection.
+
+        Returns:
+            str: The path of the new version's manifest.
+        """
+        version = self.stores[name].commit_replace(geojson_to_table(geojson))
+        return self.stores[name].manifest_path(version)
+
+    def append(self, name, geojson):
+        """
+        Commits a new version of a dataset with the features of a GeoJSON FeatureCollection
+        appended. Only the new features are stored.
+
+        Args:
+            name (str): The dataset name.
+            geojson (dict): The GeoJSON FeatureCollection of the new features.
+
+        Returns:
+            str: The path of the new version's manifest.
+        """
+        # Make sure the legacy data was imported before building on top of it
+        self._dataset(name)
+        version = self.stores[name].commit_append(geojson_to_table(geojson))
+        return self.stores[name].manifest_path(version)
+
+    def versions(self, name):
+        """
+        Returns:
+            list: The manifests of the dataset's retained versions, oldest first, with a 'head' flag.
+        """
+        store = self.stores[name]
+        head = store.head()
+        return [{**store.manifest(version), "head": version == head} for version in store.versions()]
+
+    def rollback(self, name, version):
+        """
+        Makes a retained version of a dataset current again, in constant time.
+
+        Raises:
+            ValueError: If the version is not retained.
+        """
+        self.stores[name].rollback(version)
+
+    def get_ids(self, name):
+        """Returns the ids of a dataset's features as a set of strings."""
+        def build_ids(table):
+            return frozenset(str(value) for value in property_values(table, DATASET_ID_FIELDS[name]) if value is not None)
+
+        return self.get_derived(name, "ids", build_ids)
+
+    def invalidate(self, name=None):
+        """
+        Forces a dataset (or every dataset) to be reloaded on next access.
+
+        Args:
+            name (str): The dataset name, or None for every dataset.
+        """
+        with self._lock:
+            for dataset_name in ([name] if name else list(self._datasets)):
+                self._datasets.pop(dataset_name, None)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Reload count and total load time, plus per dataset version, feature count and last load time.
+        """
+        with self._lock:
+            return {
+                "reloads": self.reloads,
+                "parse_time_seconds": self.parse_time_seconds,
+                "datasets": {
+                    name: {
+                        "version": dataset["version"],
+                        "features": dataset["table"].num_rows,
+                        "parse_time_seconds": dataset["parse_time_seconds"],
+                    }
+                    for name, dataset in self._datasets.items()
+                }
+            }
+
+
+# Shared store used by every blueprint
+feature_store = FeatureStore(
+    {
+        CUSTOMERS: CUSTOMERS_DATA_DIR,
+        TECHNICIANS: TECHNICIANS_DATA_DIR,
+    },
+    {
+        CUSTOMERS: (CUSTOMERS_DATA_FILE_ARROW, CURR_CUSTOMERS_DATA_FILE_GEOJSON),
+        TECHNICIANS: (TECHNICIANS_DATA_FILE_ARROW, CURR_TECHNICIANS_DATA_FILE_GEOJSON),
+    },
+    DATASET_VERSION_RETENTION,
+    DATASET_MAX_SEGMENTS
+)
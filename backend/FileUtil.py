@@ -1,9 +1,8 @@
 import csv
 import io
-import json
 from datetime import datetime
-import pandas as pd
 import os
+import shutil
 
 
 def parse_csv_data(csv_data):
@@ -21,27 +20,6 @@ def parse_csv_data(csv_data):
     return headers, reader
 
 
-def save_file_copy(source_path, destination_path):
-    try:
-        with open(source_path, 'rb') as src_file:
-            with open(destination_path, 'wb') as dest_file:
-                dest_file.write(src_file.read())
-
-        print(f"File successfully copied to: {destination_path}")
-    except Exception as e:
-        print(f"Error while copying the file: {e}")
-
-
-def load_geojson_from_file(file_path):
-    """Helper function to load GeoJSON data from a file"""
-    try:
-        with open(file_path, 'r') as f:
-            geojson_data = json.load(f)
-        return geojson_data
-    except Exception as e:
-        return {'error': f"Failed to load GeoJSON data from file: {str(e)}"}
-
-
 def validate_required_fields(headers, required_fields):
     """Helper function to validate required fields in CSV headers"""
     missing_fields = [
@@ -81,71 +59,56 @@ def save_to_csv(rows, headers, filepath):
     return output_file
 
 
-def are_equal(value1, value2):
-    """
-    Checks if two values are equal, accounting for NaN equivalence.
+def count_csv_rows(file_path):
+    """Counts the rows of a CSV file (header and blank lines excluded) without loading it."""
+    with open(file_path, newline='', encoding='utf-8') as file:
+        return max(sum(1 for row in csv.reader(file) if row) - 1, 0)
 
-    Args:
-        value1: First value to compare.
-        value2: Second value to compare.
 
-    Returns:
-        bool: True if values are equal, False otherwise.
-    """
-    if pd.isna(value1) and pd.isna(value2):
-        return True
-    return value1 == value2
+def ends_with_newline(file_path):
+    """Returns True if a non-empty file ends with a line break."""
+    with open(file_path, 'rb') as file:
+        file.seek(-1, os.SEEK_END)
+        return file.read(1) in (b'\n', b'\r')
 
 
-def load_old_data(old_file_path):
+def append_rows_to_csv(file_path, new_data):
     """
-    Loads old data from a CSV file.
-
-    Args:
-        old_file_path (str): The path to the old CSV file.
-
-    Returns:
-        pd.DataFrame: Dataframe containing the old data.
-    """
-    try:
-        old_data = pd.read_csv(old_file_path)
-        return old_data
-    except Exception as e:
-        print(f"Error loading old data: {e}")
-        return None
-
-
-def append_to_csv(file_path, new_data):
-    """
-    Appends new data (Pandas DataFrame) to an existing CSV file or creates a new file if it doesn't exist.
-    Returns the updated DataFrame.
+    Appends rows to a CSV file (creating it with a header if it doesn't exist) without
+    reading the existing rows back.
 
     Args:
         file_path (str): Path to the CSV file.
         new_data (pd.DataFrame): DataFrame where columns match the CSV headers.
-
-    Returns:
-        pd.DataFrame: Updated DataFrame with appended data.
     """
-    try:
-        file_exists = os.path.exists(file_path)
-
-        # Ensure new_data is a DataFrame
-        if not isinstance(new_data, pd.DataFrame):
-            raise TypeError("new_data must be a Pandas DataFrame.")
-
-        if new_data.empty:
-            raise ValueError("No data provided to append.")
+    if new_data.empty:
+        return
+    file_exists = os.path.exists(file_path) and os.path.getsize(file_path) > 0
+    needs_newline = file_exists and not ends_with_newline(file_path)
 
-        # Append data, writing headers only if the file doesn't exist
-        new_data.to_csv(file_path, mode='a',
-                        header=not file_exists, index=False, encoding='utf-8')
+    # Written with a single call so a partial write can't interleave with the header/newline
+    rows = new_data.to_csv(header=not file_exists, index=False)
+    with open(file_path, 'a', encoding='utf-8', newline='') as file:
+        file.write(('\n' if needs_newline else '') + rows)
 
-        print("Data successfully appended.")
 
-        # Return the updated DataFrame
-        return pd.read_csv(file_path)
+def append_csv_file(file_path, rows_path):
+    """
+    Appends the rows of a CSV file to another one (creating it if it doesn't exist),
+    streaming them instead of loading either file.
 
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return None
+    Args:
+        file_path (str): Path to the CSV file appended to.
+        rows_path (str): Path to a CSV file with a header line and the rows to append,
+            whose columns match the headers of file_path.
+    """
+    if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+        shutil.copyfile(rows_path, file_path)
+        return
+    needs_newline = not ends_with_newline(file_path)
+    with open(rows_path, 'rb') as rows_file, open(file_path, 'ab') as file:
+        # Skip the header line, the rows are appended under the existing header
+        rows_file.readline()
+        if needs_newline:
+            file.write(b'\n')
+        shutil.copyfileobj(rows_file, file)
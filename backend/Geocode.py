@@ -1,43 +1,242 @@
 # geocode.py
+import re
+import traceback
 import requests
-from Config import TOM_TOM_API_KEY
+from concurrent.futures import ThreadPoolExecutor
+from Cache import PersistentCache
+from RateLimiter import TokenBucket
+from TomTomClient import tomtom_client, GEOCODE, BATCH_SEARCH, TomTomCircuitOpen, TomTomQuotaExceeded
+from Config import CACHE_DB_FILE, GEOCODE_CACHE_TTL_SECONDS, GEOCODE_CACHE_MAX_ENTRIES, GEOCODE_MAX_WORKERS, GEOCODE_QPS, GEOCODE_MODE, GEOCODE_BATCH_SIZE
 import pandas as pd
 
+# Address -> coordinates cache shared by the customer and technician pipelines
+geocode_cache = PersistentCache(
+    CACHE_DB_FILE, 'geocode', GEOCODE_CACHE_TTL_SECONDS, GEOCODE_CACHE_MAX_ENTRIES)
+
+# Limits TomTom geocoding requests to our QPS quota across all worker threads
+# (cache hits are not throttled)
+geocode_rate_limiter = TokenBucket(GEOCODE_QPS)
+
+
+def normalize_address(address):
+    """
+    Normalizes an address so that trivially different spellings share a cache entry.
+
+    Args:
+        address (str): The address to normalize.
+
+    Returns:
+        str: The lowercased address with punctuation removed and whitespace collapsed.
+    """
+    address = re.sub(r"[^\w\s]", " ", str(address).lower())
+    return " ".join(address.split())
+
+
+def parse_geocode_response(data):
+    """
+    Extracts the coordinates of the most relevant result of a TomTom geocode response.
+
+    Args:
+        data (dict): The parsed JSON response.
+
+    Returns:
+        tuple: A tuple with 'latitude' and 'longitude', or None if there are no results.
+    """
+    if data.get("results"):
+        result = data["results"][0]
+        return result["position"]["lat"], result["position"]["lon"]
+    return None
+
 
 def geocode_address(address):
     """
     Geocodes an address to latitude and longitude using TomTom's Geocoding API.
+    Results are looked up in and stored to the persistent geocode cache.
 
     Args:
         address (str): The address to geocode.
 
     Returns:
         tuple: A tuple with 'latitude' and 'longitude' if successful, None otherwise.
+
+    Raises:
+        TomTomCircuitOpen: If geocoding is suspended after repeated failures.
+        TomTomQuotaExceeded: If the daily quota is used up.
     """
-    base_url = "https://api.tomtom.com/search/2/geocode/"
+    cache_key = normalize_address(address)
+    cached = geocode_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        return tuple(cached)
+
     params = {
-        "key": TOM_TOM_API_KEY,
         "limit": 1,  # Limit results to the most relevant one
     }
 
     try:
         # URL encode the address
-        url = f"{base_url}{requests.utils.quote(address)}.json"
+        path = f"/search/2/geocode/{requests.utils.quote(address)}.json"
 
-        # Make the request
-        response = requests.get(url, params=params)
+        # Make the request (waiting for the rate limiter to avoid too many requests)
+        geocode_rate_limiter.acquire()
+        response = tomtom_client.get(GEOCODE, path, params=params)
         response.raise_for_status()  # Raise HTTPError for bad responses
 
         # Parse the response
-        data = response.json()
-        if data.get("results"):
-            result = data["results"][0]
-            lat = result["position"]["lat"]
-            lon = result["position"]["lon"]
-            return lat, lon
+        location = parse_geocode_response(response.json())
+        if location:
+            if cache_key:
+                geocode_cache.set(cache_key, list(location))
+            return location
         else:
             print(f"No results found for address: {address}")
             return None
+    except (TomTomCircuitOpen, TomTomQuotaExceeded):
+        # Not a problem with this address, the caller must not treat it as ungeocodable
+        raise
     except requests.exceptions.RequestException as e:
         print(f"Error during API request: {e}")
         return None
+
+
+def geocode_batch(addresses):
+    """
+    Geocodes a batch of addresses with a single request to TomTom's synchronous batch search API.
+    Addresses whose batch item failed are geocoded again one at a time.
+
+    Args:
+        addresses (list): The addresses to geocode (at most the batch API's item limit).
+
+    Returns:
+        list: (latitude, longitude) tuples or None for each address, in input order.
+
+    Raises:
+        TomTomQuotaExceeded: If the daily quota is used up.
+    """
+    body = {
+        "batchItems": [
+            {"query": f"/geocode/{requests.utils.quote(address)}.json?limit=1"}
+            for address in addresses
+        ]
+    }
+
+    try:
+        geocode_rate_limiter.acquire()
+        # Every batch item counts as a transaction against the daily quota
+        response = tomtom_client.post(BATCH_SEARCH, "/search/2/batch/sync.json", json=body,
+                                      transactions=len(addresses))
+        response.raise_for_status()
+        batch_items = response.json().get("batchItems", [])
+    except TomTomQuotaExceeded:
+        raise
+    except requests.exceptions.RequestException as e:
+        # Includes a suspended batch endpoint: single requests have their own circuit breaker
+        print(f"Error during batch API request, falling back to single requests: {e}")
+        batch_items = []
+
+    locations = []
+    for i, address in enumerate(addresses):
+        item = batch_items[i] if i < len(batch_items) else None
+        if item is None or item.get("statusCode") != 200:
+            # Failed batch item, retry with a single request
+            locations.append(geocode_address(address))
+            continue
+
+        location = parse_geocode_response(item.get("response", {}))
+        if location:
+            cache_key = normalize_address(address)
+            if cache_key:
+                geocode_cache.set(cache_key, list(location))
+        else:
+            print(f"No results found for address: {address}")
+        locations.append(location)
+    return locations
+
+
+def geocode_addresses_batch(addresses, batch_size=GEOCODE_BATCH_SIZE, max_workers=GEOCODE_MAX_WORKERS):
+    """
+    Geocodes many addresses using TomTom's batch search API. Cached addresses are not
+    sent, and each distinct address is only geocoded once.
+
+    Args:
+        addresses (list): The addresses to geocode.
+        batch_size (int): Maximum number of addresses per batch request.
+        max_workers (int): Maximum number of concurrent batch requests.
+
+    Returns:
+        list: (latitude, longitude) tuples or None for each address, in input order.
+    """
+    locations = {}
+    uncached = []
+    for address in addresses:
+        cache_key = normalize_address(address)
+        if cache_key in locations or not cache_key:
+            continue
+        cached = geocode_cache.get(cache_key)
+        if cached is not None:
+            locations[cache_key] = tuple(cached)
+        else:
+            locations[cache_key] = None
+            uncached.append(address)
+
+    batches = [uncached[i:i + batch_size]
+               for i in range(0, len(uncached), batch_size)]
+    for batch, batch_locations in zip(batches, geocode_addresses(batches, geocode_batch, max_workers)):
+        for address, location in zip(batch, batch_locations or [None] * len(batch)):
+            locations[normalize_address(address)] = location
+
+    return [locations.get(normalize_address(address)) for address in addresses]
+
+
+def geocode_addresses(addresses, geocode_func=geocode_address, max_workers=GEOCODE_MAX_WORKERS):
+    """
+    Geocodes many addresses concurrently with a bounded pool of worker threads.
+    Requests sent to TomTom are rate limited by the shared token bucket.
+
+    Args:
+        addresses (list): The addresses to geocode.
+        geocode_func (callable): Function geocoding a single address (e.g. a stub geocoder for testing).
+        max_workers (int): Maximum number of concurrent geocoding requests.
+
+    Returns:
+        list: (latitude, longitude) tuples or None for each address, in input order.
+
+    Raises:
+        TomTomCircuitOpen: If geocoding is suspended after repeated failures.
+        TomTomQuotaExceeded: If the daily quota is used up.
+    """
+    def safe_geocode(address):
+        try:
+            return geocode_func(address)
+        except (TomTomCircuitOpen, TomTomQuotaExceeded):
+            # TomTom is unavailable: fail the whole run rather than dropping every remaining address
+            raise
+        except Exception as e:
+            print(f"Error geocoding address {address}; error: {e}")
+            traceback.print_exc()
+            return None
+
+    if not addresses:
+        return []
+    if max_workers <= 1 or len(addresses) == 1:
+        return [safe_geocode(address) for address in addresses]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(addresses))) as executor:
+        # executor.map yields results in input order
+        return list(executor.map(safe_geocode, addresses))
+
+
+def geocode_addresses_with_mode(addresses, mode=None):
+    """
+    Geocodes many addresses with the configured geocoding backend.
+
+    Args:
+        addresses (list): The addresses to geocode.
+        mode (str): 'batch' to use TomTom's batch search API, 'single' for one request per address.
+                    Defaults to GEOCODE_MODE.
+
+    Returns:
+        list: (latitude, longitude) tuples or None for each address, in input order.
+    """
+    if (mode or GEOCODE_MODE) == 'batch':
+        return geocode_addresses_batch(addresses)
+    return geocode_addresses(addresses)
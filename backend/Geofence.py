@@ -1,33 +1,109 @@
-import json
+from functools import lru_cache
+import numpy as np
+import shapely
+from pyproj import Transformer
 from shapely.geometry import shape
 from flask import request, jsonify, Blueprint
-from Config import CURR_TECHNICIANS_DATA_FILE_GEOJSON, CURR_CUSTOMERS_DATA_FILE_GEOJSON
+from FeatureStore import feature_store, CUSTOMERS, TECHNICIANS
+from Config import GEOFENCE_BATCH_MAX_POLYGONS, GEOFENCE_AREA_CRS
 
 # Initialize the geofence blueprint
 geofence_bp = Blueprint('geofence', __name__)
 
+SQUARE_METERS_PER_SQUARE_MILE = 2_589_988.110336
+# Densities are reported per this many square miles
+DENSITY_AREA_MILE2 = 100
 
-def load_geojson_data():
+
+@lru_cache(maxsize=None)
+def equal_area_transformer(crs=GEOFENCE_AREA_CRS):
+    """Returns the (cached) transformer from lon/lat to an equal-area projection in meters."""
+    return Transformer.from_crs('EPSG:4326', crs, always_xy=True)
+
+
+def geofence_areas_mile2(polygons):
     """
-    Load the latest GeoJSON data from files.
-    This ensures we always have the most up-to-date data.
+    Computes the areas of lon/lat polygons in square miles, in an equal-area projection so
+    that the areas do not depend on latitude.
+
+    Args:
+        polygons (np.ndarray): Polygons and MultiPolygons in lon/lat coordinates.
 
     Returns:
-        tuple: (technicians_geojson, customers_geojson)
+        np.ndarray: The area of each polygon in square miles.
     """
-    try:
-        with open(CURR_TECHNICIANS_DATA_FILE_GEOJSON) as file:
-            technicians_geojson = json.load(file)
+    transformer = equal_area_transformer()
 
-        with open(CURR_CUSTOMERS_DATA_FILE_GEOJSON) as file:
-            customers_geojson = json.load(file)
+    def project(coordinates):
+        x, y = transformer.transform(coordinates[:, 0], coordinates[:, 1])
+        return np.column_stack([x, y])
+
+    return shapely.area(shapely.transform(polygons, project)) / SQUARE_METERS_PER_SQUARE_MILE
+
+
+def parse_geofence(geofence):
+    """
+    Builds a geofence polygon from a GeoJSON Polygon or MultiPolygon (holes included), a
+    GeoJSON Feature holding one, or a list of coordinates defining a single ring.
+
+    Raises:
+        ValueError: If the geofence is not a polygon.
+    """
+    if isinstance(geofence, list):
+        geofence = {"type": "Polygon", "coordinates": [geofence]}
+    if isinstance(geofence, dict) and geofence.get("type") == "Feature":
+        geofence = geofence.get("geometry")
+    if not isinstance(geofence, dict) or geofence.get("type") not in ("Polygon", "MultiPolygon"):
+        raise ValueError("A geofence must be a Polygon or MultiPolygon")
+    return shape(geofence)
+
+
+def geofence_id(geofence, position):
+    """Returns the id of a geofence in a batch request (its Feature id, or its position)."""
+    if isinstance(geofence, dict) and geofence.get("type") == "Feature":
+        feature_id = geofence.get("id", (geofence.get("properties") or {}).get("id"))
+        if feature_id is not None:
+            return feature_id
+    return position
+
+
+def density(count, area_mile2):
+    """Number of points per DENSITY_AREA_MILE2 square miles."""
+    return float(count / area_mile2 * DENSITY_AREA_MILE2) if area_mile2 > 0 else 0
+
+
+def count_within_geofences(polygons, include_ids=False):
+    """
+    Counts the customers and technicians inside each geofence, with one vectorized pass
+    over each dataset's points for all of the geofences.
+
+    Args:
+        polygons (list): The geofence polygons.
+        include_ids (bool): If true, the ids of the matching features are included.
+
+    Returns:
+        list: One dict per geofence with its area in square miles and the count, density
+              (per DENSITY_AREA_MILE2 square miles) and optionally the ids of the
+              customers and technicians inside it.
+    """
+    polygons = np.asarray(polygons, dtype=object)
+    areas = geofence_areas_mile2(polygons)
+    results = [{"area_mile2": float(area)} for area in areas]
+
+    for dataset, prefix in ((CUSTOMERS, 'customer'), (TECHNICIANS, 'technician')):
+        index = feature_store.get_point_index(dataset)
+        polygon_indices, positions = index.within_polygons(polygons)
+        counts = np.bincount(polygon_indices, minlength=len(polygons))
+        if include_ids:
+            # Pairs are sorted by polygon, split them into one array per polygon
+            ids = np.split(index.ids[positions], np.cumsum(counts)[:-1])
+        for i, result in enumerate(results):
+            result[f"{prefix}_count"] = int(counts[i])
+            result[f"{prefix}_density_per_100_mile2"] = density(counts[i], areas[i])
+            if include_ids:
+                result[f"{prefix}_ids"] = ids[i].tolist()
+    return results
 
-        return technicians_geojson, customers_geojson
-    except Exception as e:
-        print(f"Error loading GeoJSON data: {e}")
-        # Return empty GeoJSON structures if loading fails
-        empty_geojson = {"type": "FeatureCollection", "features": []}
-        return empty_geojson, empty_geojson
 
 # Endpoint to calculate technician and customer density within a geofence
 
@@ -39,17 +115,17 @@ def getGeofenceData():
 
     Request Body:
     - 'coordinates': List of coordinates defining the geofence polygon.
+    - 'include_ids' (optional): If true, the ids of the matching customers and technicians are returned.
 
     Response:
     - 'customer_count': The total number of customers within the geofence.
     - 'technician_count': The total number of technicians within the geofence.
-    - 'customer_density_per_10_mile2': Customer density (per 100 mi²) within the geofence.
-    - 'technician_density_per_10_mile2': Technician density (per 100 mi²) within the geofence.
+    - 'customer_ids' / 'technician_ids': Ids of the matching features (only if 'include_ids' is true).
+    - 'area_mile2': The area of the geofence in square miles.
+    - 'customer_density_per_100_mile2': Customers per 100 mi² within the geofence.
+    - 'technician_density_per_100_mile2': Technicians per 100 mi² within the geofence.
     """
     try:
-        # Load the latest GeoJSON data
-        technicians_geojson, customers_geojson = load_geojson_data()
-
         # Parse request data
         data = request.get_json()
         geofence_coordinates = data.get("coordinates")
@@ -59,47 +135,68 @@ def getGeofenceData():
             return jsonify({"error": "Missing required parameters"}), 400
 
         # Create a geofence polygon using the provided coordinates
-        geofence_polygon = shape({
-            "type": "Polygon",
-            "coordinates": [geofence_coordinates]
-        })
-
-        # Helper function to count the number of people (technicians/customers) inside the geofence polygon
-        def count_people_in_geojson(geojson_data):
-            count = 0
-            for feature in geojson_data.get("features", []):
-                point = shape(feature["geometry"])
-                # Check if the point is within the geofence polygon
-                if point.within(geofence_polygon):
-                    count += 1
-            return count
-
-        # Count the number of technicians and customers inside the geofence
-        technician_count = count_people_in_geojson(technicians_geojson)
-        customer_count = count_people_in_geojson(customers_geojson)
-
-        # Calculate the area of the geofence polygon in square meters
-        geofence_area_m2 = geofence_polygon.area  # Area in square meters
-        # Convert the area from square meters to square miles
-        square_meters_to_square_miles_conversion = 2_589_988.1103
-        geofence_area_miles = geofence_area_m2 / \
-            square_meters_to_square_miles_conversion
-
-        # Calculate customer and technician density per 100 square miles
-        customer_density_per_100_mile2 = (
-            customer_count / (geofence_area_miles * 10000)) if geofence_area_miles > 0 else 0
-        technician_density_per_100_mile2 = (
-            technician_count / (geofence_area_miles * 10000)) if geofence_area_miles > 0 else 0
+        geofence_polygon = parse_geofence(geofence_coordinates)
+        result = count_within_geofences(
+            [geofence_polygon], include_ids=data.get("include_ids"))[0]
 
         # Prepare and return the response
         response = {
-            "customer_count": customer_count,
-            "technician_count": technician_count,
-            "customer_density_per_10_mile2": customer_density_per_100_mile2,
-            "technician_density_per_10_mile2": technician_density_per_100_mile2,
+            "customer_count": result["customer_count"],
+            "technician_count": result["technician_count"],
+            "area_mile2": result["area_mile2"],
+            "customer_density_per_100_mile2": result["customer_density_per_100_mile2"],
+            "technician_density_per_100_mile2": result["technician_density_per_100_mile2"],
         }
+        if data.get("include_ids"):
+            response["customer_ids"] = result["customer_ids"]
+            response["technician_ids"] = result["technician_ids"]
         return jsonify(response)
 
     except Exception as e:
         # Handle any unexpected errors with proper error message
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
+# Endpoint to calculate technician and customer density within many geofences at once
+
+
+@geofence_bp.route('/batch-geofence-data', methods=['POST'])
+def getBatchGeofenceData():
+    """
+    Endpoint to calculate technician and customer density within many geofences at once.
+
+    Request Body:
+    - 'geofences': List of geofences, each a GeoJSON Polygon or MultiPolygon (holes are
+      supported), a GeoJSON Feature holding one (its id is returned) or a list of
+      coordinates defining a single ring. A GeoJSON FeatureCollection is also accepted.
+    - 'include_ids' (optional): If true, the ids of the matching customers and technicians are returned.
+
+    Response:
+    - 'geofences': One entry per geofence, in request order, with its 'id', 'area_mile2',
+      'customer_count', 'technician_count', 'customer_density_per_100_mile2',
+      'technician_density_per_100_mile2' and optionally 'customer_ids' / 'technician_ids'.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        geofences = data.get("geofences")
+        if geofences is None and data.get("type") == "FeatureCollection":
+            geofences = data.get("features")
+        if not isinstance(geofences, list) or not geofences:
+            return jsonify({"error": "Missing required parameters"}), 400
+        if len(geofences) > GEOFENCE_BATCH_MAX_POLYGONS:
+            return jsonify({"error": f"At most {GEOFENCE_BATCH_MAX_POLYGONS} geofences per request"}), 400
+
+        polygons = []
+        for position, geofence in enumerate(geofences):
+            try:
+                polygons.append(parse_geofence(geofence))
+            except Exception as e:
+                return jsonify({"error": f"Invalid geofence at position {position}: {str(e)}"}), 400
+
+        results = count_within_geofences(
+            polygons, include_ids=data.get("include_ids"))
+        for position, (geofence, result) in enumerate(zip(geofences, results)):
+            result["id"] = geofence_id(geofence, position)
+        return jsonify({"geofences": results})
+
+    except Exception as e:
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
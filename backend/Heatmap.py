@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+from Cache import LRUCache
+from Clustering import lon_to_x, lat_to_y, x_to_lon, y_to_lat
+from DatasetStore import coordinate_arrays
+
+# Density cells per tile side
+HEATMAP_BINS = 32
+# Maximum tiles aggregated per request; larger viewports are aggregated at a lower zoom
+HEATMAP_MAX_TILES = 16
+# Highest zoom level aggregated
+HEATMAP_MAX_ZOOM = 18
+
+# Density grids keyed by dataset, version, weight property and tile
+heatmap_tile_cache = LRUCache(max_entries=4096)
+
+
+def covering_tiles(bbox, zoom):
+    """
+    Returns the (x, y) tiles at a zoom level covering a (west, south, east, north) box.
+    Boxes crossing the antimeridian (west > east) are supported.
+    """
+    west, south, east, north = bbox
+    tiles_per_axis = 2 ** zoom
+
+    def tile_range(low, high):
+        return range(int(np.clip(np.floor(low * tiles_per_axis), 0, tiles_per_axis - 1)),
+                     int(np.clip(np.floor(high * tiles_per_axis), 0, tiles_per_axis - 1)) + 1)
+
+    x_ranges = [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+    y_range = tile_range(float(lat_to_y(north)), float(lat_to_y(south)))
+    return [(x, y) for low, high in x_ranges
+            for x in tile_range(float(lon_to_x(low)), float(lon_to_x(high))) for y in y_range]
+
+
+class HeatmapIndex:
+    """Web Mercator coordinates of a dataset, used to bin its points into per tile density grids."""
+
+    def __init__(self, table):
+        """
+        Args:
+            table (pa.Table): The dataset table (see DatasetStore).
+        """
+        self.table = table
+        lon, lat = coordinate_arrays(table)
+        self.x = lon_to_x(lon)
+        self.y = lat_to_y(lat)
+        self._weights = {}
+
+    def weights(self, weight_property):
+        """Returns the numeric values of a property (missing or non-numeric values count as 0)."""
+        if weight_property not in self._weights:
+            if weight_property not in self.table.column_names:
+                raise ValueError(f"Unknown weight property: {weight_property}")
+            values = pd.to_numeric(pd.Series(self.table.column(
+                weight_property).to_pylist(), dtype=object), errors='coerce')
+            self._weights[weight_property] = values.fillna(0).to_numpy(dtype=np.float64)
+        return self._weights[weight_property]
+
+    def tile_density(self, zoom, tile_x, tile_y, weight_property=None):
+        """
+        Bins the points of one tile into a HEATMAP_BINS x HEATMAP_BINS grid.
+
+        Returns:
+            np.ndarray: The (x, y) density grid (point counts, or summed weights).
+        """
+        tile_size = 1.0 / 2 ** zoom
+        x0, y0 = tile_x * tile_size, tile_y * tile_size
+        mask = (self.x >= x0) & (self.x < x0 + tile_size) & (
+            self.y >= y0) & (self.y < y0 + tile_size)
+        weights = self.weights(weight_property)[
+            mask] if weight_property else None
+        grid, _, _ = np.histogram2d(self.x[mask], self.y[mask], bins=HEATMAP_BINS,
+                                    range=[[x0, x0 + tile_size], [y0, y0 + tile_size]], weights=weights)
+        return grid
+
+
+def get_heatmap(heatmap_index, dataset, version, bbox, zoom, weight_property=None):
+    """
+    Aggregates the density of a dataset over the tiles covering a viewport.
+
+    The response size only depends on the number of tiles and bins, never on the number
+    of points. Each tile's grid is cached per dataset version, zoom and weight property.
+
+    Args:
+        heatmap_index (HeatmapIndex): The dataset's heatmap index.
+        dataset (str): The dataset name (part of the cache key).
+        version (int): The dataset version (part of the cache key).
+        bbox (tuple): (west, south, east, north) in degrees.
+        zoom (float): The map zoom level.
+        weight_property (str): Optional numeric property summed instead of counting points.
+
+    Returns:
+        dict: 'zoom', 'cell_size' (in degrees of longitude), 'max' and 'cells' ([lon, lat, value] of every non-empty cell).
+    """
+    zoom = int(np.clip(np.floor(zoom), 0, HEATMAP_MAX_ZOOM))
+    tiles = covering_tiles(bbox, zoom)
+    while len(tiles) > HEATMAP_MAX_TILES and zoom > 0:
+        zoom -= 1
+        tiles = covering_tiles(bbox, zoom)
+
+    cells = []
+    cell_size = 1.0 / 2 ** zoom / HEATMAP_BINS
+    for tile_x, tile_y in tiles:
+        key = (dataset, version, weight_property, zoom, tile_x, tile_y)
+        grid = heatmap_tile_cache.get(key)
+        if grid is None:
+            grid = heatmap_index.tile_density(
+                zoom, tile_x, tile_y, weight_property)
+            heatmap_tile_cache.set(key, grid)
+
+        bin_x, bin_y = np.nonzero(grid)
+        lon = x_to_lon(tile_x / 2 ** zoom + (bin_x + 0.5) * cell_size)
+        lat = y_to_lat(tile_y / 2 ** zoom + (bin_y + 0.5) * cell_size)
+        cells.extend(zip(np.round(lon, 6).tolist(), np.round(
+            lat, 6).tolist(), grid[bin_x, bin_y].tolist()))
+
+    return {
+        "zoom": zoom,
+        "cell_size": cell_size * 360.0,
+        "max": max((cell[2] for cell in cells), default=0),
+        "cells": cells
+    }
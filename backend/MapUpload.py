@@ -1,28 +1,83 @@
 import pandas as pd
 import numpy as np
-from flask import request, jsonify, Blueprint
+from flask import request, jsonify, Blueprint, send_file, Response
 import traceback
 import io
 import json
-import time
+import gzip
+import hashlib
 import os
-from io import StringIO
+import tempfile
 from CSVToGeoJSON import convert_csv_to_geojson_customers, convert_csv_to_geojson_technicians
-from FileUtil import load_geojson_from_file, parse_csv_data, process_rows, save_file_copy, save_to_csv, load_old_data, append_to_csv
-from Config import CURR_TECHNICIANS_DATA_FILE_GEOJSON, CURR_CUSTOMERS_DATA_FILE_GEOJSON, PREVIOUS_CUSTOMERS_DATA_CSV, CURR_CUSTOMERS_DATA_FILE_CSV, PREVIOUS_TECHNICIANS_DATA_CSV, CURR_TECHNICIANS_DATA_FILE_CSV
+from Geocode import geocode_cache
+from TomTomClient import tomtom_client
+from FeatureStore import feature_store, empty_geojson, CUSTOMERS, TECHNICIANS, DATASET_ID_FIELDS
+from Clustering import ClusterIndex
+from Heatmap import HeatmapIndex, get_heatmap
+from FeatureQuery import query_features, build_sort_ranks, DEFAULT_PAGE_SIZE
+from VectorTile import VectorTileIndex, TileDiskCache, fields_key, property_fields, MAX_TILE_ZOOM
+from Cache import LRUCache
+from DatasetStore import table_to_geojson, LON_COLUMN, LAT_COLUMN
+from FileUtil import append_rows_to_csv, append_csv_file, count_csv_rows
+from UploadJobs import UploadJobManager
+from Config import CURR_CUSTOMERS_DATA_FILE_CSV, CURR_TECHNICIANS_DATA_FILE_CSV, TILE_CACHE_DIR, TILE_CACHE_MAX_ENTRIES, UPLOAD_JOB_MAX_WORKERS, UPLOAD_JOB_HISTORY, CSV_CHUNK_ROWS
 
 
 map_bp = Blueprint('map', __name__)
 
-# Common function to load and return GeoJSON data
+# Encoded vector tiles, keyed by layer, dataset fingerprint, properties and tile
+tile_cache = LRUCache(max_entries=TILE_CACHE_MAX_ENTRIES)
+tile_disk_cache = TileDiskCache(
+    TILE_CACHE_DIR, retained_fingerprints=feature_store.get_retained_fingerprints)
 
+# Background pool running the CSV uploads
+upload_jobs = UploadJobManager(UPLOAD_JOB_MAX_WORKERS, UPLOAD_JOB_HISTORY)
 
-def get_geojson_data(file_path):
+# Common function to build the cached GeoJSON payload of a dataset
+
+
+def get_geojson_payload(dataset):
+    """
+    Returns the compact and gzipped GeoJSON payload of a dataset with its ETag.
+    The payload is built once per dataset version.
+
+    Returns:
+        dict: 'body' (compact JSON bytes), 'gzip_body' (gzipped body) and 'etag' (hash of the body).
+    """
+    def build_payload(table):
+        body = json.dumps(table_to_geojson(table), separators=(',', ':')).encode('utf-8')
+        return {
+            'body': body,
+            'gzip_body': gzip.compress(body, compresslevel=6),
+            'etag': hashlib.sha1(body).hexdigest(),
+        }
+
+    return feature_store.get_derived(dataset, 'geojson_payload', build_payload)
+
+# Common function to return GeoJSON data, answering conditional requests with 304 Not Modified
+
+
+def get_geojson_data(dataset):
     try:
-        geojson_data = load_geojson_from_file(file_path)
-        if 'error' in geojson_data:
-            return jsonify(geojson_data), 500
-        return jsonify(geojson_data), 200
+        payload = get_geojson_payload(dataset)
+        # Quality-aware, so that 'gzip;q=0' refuses gzip
+        use_gzip = request.accept_encodings['gzip'] > 0
+        # Each encoding is a different representation and gets its own strong ETag
+        etag = f"{payload['etag']}-gzip" if use_gzip else payload['etag']
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        elif use_gzip:
+            response = Response(payload['gzip_body'], mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(payload['body'], mimetype='application/json')
+
+        response.set_etag(etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        # Let clients cache the payload but revalidate it on every use
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -31,14 +86,284 @@ def get_geojson_data(file_path):
 
 @map_bp.route('/get-customers-geojson', methods=['GET'])
 def get_customers_geojson():
-    return get_geojson_data(CURR_CUSTOMERS_DATA_FILE_GEOJSON)
+    return get_geojson_data(CUSTOMERS)
 
 # Route for fetching technician GeoJSON data
 
 
 @map_bp.route('/get-technicians-geojson', methods=['GET'])
 def get_technicians_geojson():
-    return get_geojson_data(CURR_TECHNICIANS_DATA_FILE_GEOJSON)
+    return get_geojson_data(TECHNICIANS)
+
+
+def parse_bbox(bbox):
+    """
+    Parses a 'west,south,east,north' bounding box query parameter.
+
+    Returns:
+        tuple: (west, south, east, north) as floats.
+
+    Raises:
+        ValueError: If the bounding box is missing or malformed.
+    """
+    if not bbox:
+        raise ValueError("bbox is required (west,south,east,north)")
+    values = [float(value) for value in bbox.split(',')]
+    if len(values) != 4 or values[1] > values[3]:
+        raise ValueError("bbox must be west,south,east,north")
+    return tuple(values)
+
+
+def get_dataset_param(default=CUSTOMERS):
+    """Returns the 'dataset' query parameter, raising ValueError for unknown datasets."""
+    dataset = request.args.get('dataset', default)
+    if dataset not in feature_store.paths:
+        raise ValueError(f"Unknown dataset: {dataset}")
+    return dataset
+
+
+def get_cluster_index(dataset):
+    """Returns the cluster hierarchy of a dataset, built once per dataset version."""
+    return feature_store.get_derived(dataset, 'cluster_index', ClusterIndex)
+
+# Route for fetching the clusters and points visible in a viewport
+
+
+@map_bp.route('/clusters', methods=['GET'])
+def get_clusters():
+    try:
+        dataset = get_dataset_param()
+        bbox = parse_bbox(request.args.get('bbox'))
+        zoom = float(request.args.get('zoom', 0))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        features = get_cluster_index(dataset).get_clusters(bbox, zoom)
+        return jsonify({
+            'type': 'FeatureCollection',
+            'version': feature_store.get_version(dataset),
+            'features': features
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Route for expanding a cluster into its children
+
+
+@map_bp.route('/clusters/<int:cluster_id>/children', methods=['GET'])
+def get_cluster_children(cluster_id):
+    try:
+        dataset = get_dataset_param()
+        children = get_cluster_index(dataset).get_children(cluster_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({
+        'type': 'FeatureCollection',
+        'cluster_id': cluster_id,
+        'expansion_zoom': children['expansion_zoom'],
+        'features': children['features']
+    }), 200
+
+# Route for querying one page of the features in a viewport, with only the requested properties
+
+
+@map_bp.route('/features', methods=['GET'])
+def get_features():
+    try:
+        dataset = get_dataset_param()
+        bbox = request.args.get('bbox')
+        fields = request.args.get('fields')
+        fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
+        sort = request.args.get('sort', 'id')
+        if sort not in ('id', 'name'):
+            raise ValueError("sort must be 'id' or 'name'")
+        sort_field = DATASET_ID_FIELDS[dataset] if sort == 'id' else 'name'
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+
+        table = feature_store.get_table(dataset)
+        version = feature_store.get_version(dataset)
+        point_index = feature_store.get_point_index(dataset)
+        positions = point_index.within_bbox(parse_bbox(bbox)) if bbox else np.arange(len(point_index))
+        ranks = feature_store.get_derived(dataset, f'sort_ranks:{sort_field}', build_sort_ranks(sort_field))
+        page = query_features(table, positions, ranks, version, sort_field, fields, limit,
+                              request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({
+        'type': 'FeatureCollection',
+        'version': version,
+        'total': page['total'],
+        'next_cursor': page['next_cursor'],
+        'features': page['features']
+    }), 200
+
+# Route for fetching a binned density grid of the points in a viewport
+
+
+@map_bp.route('/heatmap', methods=['GET'])
+def get_heatmap_grid():
+    try:
+        dataset = get_dataset_param()
+        bbox = parse_bbox(request.args.get('bbox'))
+        zoom = float(request.args.get('zoom', 0))
+        heatmap = get_heatmap(feature_store.get_derived(dataset, 'heatmap_index', HeatmapIndex), dataset,
+                              feature_store.get_version(dataset), bbox, zoom, request.args.get('weight'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    heatmap['version'] = feature_store.get_version(dataset)
+    return jsonify(heatmap), 200
+
+# Route for fetching a Mapbox Vector Tile of the customers or technicians layer
+
+
+@map_bp.route('/tiles/<layer>/<int:z>/<int:x>/<int:y>.mvt', methods=['GET'])
+def get_vector_tile(layer, z, x, y):
+    if layer not in feature_store.paths:
+        return jsonify({'error': f'Unknown layer: {layer}'}), 404
+    if z > MAX_TILE_ZOOM or x >= 2 ** z or y >= 2 ** z:
+        return jsonify({'error': f'Invalid tile: {z}/{x}/{y}'}), 404
+
+    try:
+        fields = request.args.get('fields')
+        fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else [
+            DATASET_ID_FIELDS[layer], 'name']
+        table = feature_store.get_table(layer)
+        unknown = [field for field in fields if field not in property_fields(table)]
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+
+        fingerprint = feature_store.get_fingerprint(layer)
+        etag = f"{fingerprint}-{fields_key(fields)}"
+        if request.if_none_match.contains(etag):
+            tile = None
+        else:
+            # Memory first, then disk, then encode the tile from the dataset
+            key = (layer, fingerprint, tuple(fields), z, x, y)
+            tile = tile_cache.get(key)
+            if tile is None:
+                tile = tile_disk_cache.get(layer, fingerprint, fields, z, x, y)
+                if tile is None:
+                    tile = feature_store.get_derived(layer, 'vector_tile_index', VectorTileIndex).encode_tile(
+                        layer, z, x, y, fields)
+                    tile_disk_cache.set(layer, fingerprint, fields, z, x, y, tile)
+                tile_cache.set(key, tile)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    response = Response(status=304) if tile is None else Response(
+        tile, mimetype='application/vnd.mapbox-vector-tile')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Route for inspecting the vector tile caches
+
+
+@map_bp.route('/tile-cache-stats', methods=['GET'])
+def get_tile_cache_stats():
+    try:
+        return jsonify({'memory': tile_cache.stats(), 'disk': tile_disk_cache.stats()}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Route for listing the retained versions of a dataset
+
+
+@map_bp.route('/datasets/<dataset>/versions', methods=['GET'])
+def get_dataset_versions(dataset):
+    if dataset not in feature_store.paths:
+        return jsonify({'error': f'Unknown dataset: {dataset}'}), 404
+    try:
+        return jsonify({
+            'dataset': dataset,
+            'version': feature_store.get_version(dataset),
+            'versions': feature_store.versions(dataset)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Route for rolling a dataset back to a retained version
+
+
+@map_bp.route('/datasets/<dataset>/rollback', methods=['POST'])
+def rollback_dataset(dataset):
+    if dataset not in feature_store.paths:
+        return jsonify({'error': f'Unknown dataset: {dataset}'}), 404
+    try:
+        version = int((request.get_json(silent=True) or {}).get('version'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'version is required'}), 400
+
+    # Never move the dataset under a running upload
+    dataset_lock = upload_jobs.dataset_lock(dataset)
+    if not dataset_lock.acquire(blocking=False):
+        return jsonify({'error': f'An upload to {dataset} is running'}), 409
+    try:
+        feature_store.rollback(dataset, version)
+        get_geojson_payload(dataset)
+        return jsonify({'dataset': dataset, 'version': feature_store.get_version(dataset)}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        dataset_lock.release()
+
+# Route for exporting a dataset as a GeoJSON file (generated on demand from the columnar dataset)
+
+
+@map_bp.route('/export-geojson/<dataset>', methods=['GET'])
+def export_geojson(dataset):
+    try:
+        if dataset not in feature_store.legacy_paths:
+            return jsonify({'error': f'Unknown dataset: {dataset}'}), 404
+        # Served from the payload cached for the current version, the tracked data files are never rewritten
+        body = get_geojson_payload(dataset)['body']
+        return send_file(io.BytesIO(body), mimetype='application/geo+json', as_attachment=True,
+                         download_name=os.path.basename(feature_store.legacy_paths[dataset][-1]))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Route for inspecting the shared TomTom client (requests, retries, daily quota and circuit breakers)
+
+
+@map_bp.route('/tomtom-client-stats', methods=['GET'])
+def get_tomtom_client_stats():
+    try:
+        return jsonify(tomtom_client.stats()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Route for inspecting the persistent geocode cache
+
+
+@map_bp.route('/geocode-cache-stats', methods=['GET'])
+def get_geocode_cache_stats():
+    try:
+        return jsonify(geocode_cache.stats()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Route for inspecting the shared feature store
+
+
+@map_bp.route('/feature-store-stats', methods=['GET'])
+def get_feature_store_stats():
+    try:
+        return jsonify(feature_store.stats()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 
 @map_bp.route('/get-csv-column-headers', methods=['POST'])
@@ -53,8 +378,8 @@ def get_csv_column_headers():
 
     if file:
         try:
-            csv_data = pd.read_csv(io.StringIO(
-                file.stream.read().decode("utf-8")))
+            # Only parse the header, pandas stops reading the stream after the first block
+            csv_data = pd.read_csv(file.stream, nrows=0, encoding='utf-8')
             column_headers = csv_data.columns.tolist()
             return jsonify({"columns": column_headers})
         except Exception as e:
@@ -64,25 +389,19 @@ def get_csv_column_headers():
     return jsonify({"error": "Unexpected error"}), 500
 
 
-def replace_headers(csv_data, header_mappings):
+def replace_headers(original_df, header_mappings):
     """
     Replace headers in CSV data according to mappings
 
     Args:
-        csv_data (str): CSV data as a string
+        original_df (pandas.DataFrame): Rows of the uploaded CSV, with its original headers
         header_mappings (dict): Mapping from expected headers to original headers
 
     Returns:
         pandas.DataFrame: DataFrame with replaced headers
     """
-    # Create a DataFrame from the original CSV data
-    original_df = pd.read_csv(StringIO(csv_data))
-
-    # Get headers from the original CSV
-    headers = original_df.columns.tolist()
-
     # Create a new DataFrame with mapped column names
-    new_df = pd.DataFrame()
+    new_df = pd.DataFrame(index=original_df.index)
 
     # Map each header from the original CSV to the corresponding expected header
     for expected_header in header_mappings:
@@ -100,93 +419,203 @@ def replace_headers(csv_data, header_mappings):
     return new_df
 
 
-# Common function to handle CSV imports
-def replace_csv_data(csv_file, header_mappings, prev_csv_path, curr_csv_path, prev_geojson_path, curr_geojson_path, convert_geojson_func):
-    try:
-        if not csv_file:
-            return jsonify({"error": "No file uploaded"}), 400
+def iter_mapped_csv_chunks(csv_path, header_mappings, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    Reads an uploaded CSV file in fixed-size chunks, keeping only the mapped columns of
+    each chunk. Chunks are yielded one at a time, so memory use is bounded by the chunk
+    size instead of the whole file. Row indexes continue across chunks.
 
-        # Read the CSV file content
-        csv_data = csv_file.read().decode('utf-8')
+    Args:
+        csv_path (str): Path of the uploaded CSV file
+        header_mappings (dict): Mapping from expected headers to original headers
+        chunk_rows (int): Number of rows parsed at a time
 
-        new_df = replace_headers(csv_data, header_mappings)
+    Yields:
+        pandas.DataFrame: The rows of each chunk, with replaced headers
 
-        # Backup the current CSV file to the previous CSV file path
-        save_file_copy(curr_csv_path, prev_csv_path)
+    Raises:
+        ValueError: If a mapped column is missing from the CSV.
+    """
+    used_columns = {original for original in header_mappings.values() if original != 'N/A'}
+    with pd.read_csv(csv_path, encoding='utf-8', chunksize=chunk_rows,
+                     usecols=lambda column: column in used_columns) as reader:
+        for chunk in reader:
+            missing = used_columns.difference(chunk.columns)
+            if missing:
+                raise ValueError(f"Missing columns in CSV: {', '.join(sorted(missing))}")
+            yield replace_headers(chunk, header_mappings)
 
-        # Save the updated DataFrame to CSV
-        new_df.to_csv(curr_csv_path, index=False)
-        output_file = curr_csv_path
 
-        # Ensure the file exists before proceeding
-        while not os.path.exists(output_file):
-            print("Waiting for file to be saved...")
-            time.sleep(0.5)  # Wait for 0.5 seconds before checking again
+def spool_chunks(chunks, csv_path):
+    """Writes the rows of every chunk to a CSV file as the chunk passes through."""
+    for chunk in chunks:
+        append_rows_to_csv(csv_path, chunk)
+        yield chunk
 
-        # Load the old data for comparison
-        old_data = load_old_data(prev_csv_path)
 
-        # Load the old GeoJSON for reference
-        old_geojson = load_geojson_from_file(prev_geojson_path)
+def remove_file(file_path):
+    """Removes a file if it exists."""
+    if os.path.exists(file_path):
+        os.remove(file_path)
 
-        # Convert the new DataFrame to GeoJSON
-        geojson = convert_geojson_func(new_df, old_data, old_geojson)
 
-        # Save the updated GeoJSON
-        with open(curr_geojson_path, 'w') as geojson_file:
-            json.dump(geojson, geojson_file, indent=4)
+# Common function to handle CSV imports, run as a background upload job
+# (geocode_mode selects the geocoding backend, 'single' or 'batch', defaulting to Config.GEOCODE_MODE)
+def replace_csv_data(dataset, csv_path, header_mappings, curr_csv_path, convert_geojson_func, geocode_mode=None, progress=None):
+    """
+    Replaces a dataset with the rows of an uploaded CSV file.
 
-        return jsonify({
-            'status': 'success',
-            'message': 'CSV data imported successfully and saved to file',
-            'file_path': output_file,
-            'geojson_file_path': curr_geojson_path
-        }), 200
+    The upload is processed chunk by chunk: each chunk is compared by id with the current
+    version of the dataset (indexed once), geocoded where needed and written to a
+    temporary CSV, then released, so only one chunk of the upload is held at a time
+    besides the features built. Nothing is visible until the new dataset has been fully
+    built, so a failed or cancelled upload leaves the current CSV and dataset untouched;
+    the dataset is then committed as a new version and the CSV replaced.
 
-    except Exception as e:
-        # Capture and return detailed error information
-        error_msg = f"Error importing CSV data: {str(e)}"
-        print(error_msg)
-        traceback.print_exc()
-        return jsonify({"error": error_msg}), 500
+    Args:
+        dataset (str): The dataset name.
+        csv_path (str): Path of the spooled upload.
+        header_mappings (dict): Mapping from expected headers to original headers.
+        curr_csv_path (str): Where the uploaded rows are saved as CSV.
+        convert_geojson_func (callable): Converts the rows (chunks) to GeoJSON.
+        geocode_mode (str): The geocoding backend.
+        progress (UploadJob): Receives progress reports and cancellation checks.
 
-# Common function to handle CSV imports
+    Returns:
+        dict: The import result.
+    """
+    # Load the current version of the dataset for comparison
+    old_data = feature_store.get_table(dataset).drop_columns(
+        [LON_COLUMN, LAT_COLUMN]).to_pandas()
 
+    # Load the old GeoJSON for reference
+    old_geojson = feature_store.get(dataset)
 
-def append_csv_data(csv_file, header_mappings, prev_csv_path, curr_csv_path, prev_geojson_path, curr_geojson_path, convert_geojson_func):
+    temp_csv_path = f"{curr_csv_path}.tmp"
+    remove_file(temp_csv_path)
     try:
-        if not csv_file:
-            return jsonify({"error": "No file uploaded"}), 400
-
-        # Read the CSV file content
-        csv_data = csv_file.read().decode('utf-8')
+        # Convert the upload to GeoJSON chunk by chunk, saving its rows as they are read
+        chunks = spool_chunks(iter_mapped_csv_chunks(csv_path, header_mappings), temp_csv_path)
+        geojson = convert_geojson_func(
+            chunks, old_data, old_geojson, geocode_mode, progress, count_csv_rows(csv_path))
+        if not os.path.exists(temp_csv_path):
+            # No rows, the CSV only has the header
+            pd.DataFrame(columns=list(header_mappings)).to_csv(temp_csv_path, index=False)
+
+        # Past this point the upload is committed and can no longer be cancelled
+        if progress:
+            progress.begin_commit()
+
+        # Commit the updated dataset as a new version, readers pick it up atomically
+        dataset_path = feature_store.save(dataset, geojson)
+
+        # Save the uploaded rows to CSV once the dataset is committed (previous versions are
+        # kept by the dataset store), so a failed commit never leaves the CSV ahead of it
+        os.replace(temp_csv_path, curr_csv_path)
+        output_file = curr_csv_path
+    finally:
+        remove_file(temp_csv_path)
+    # Pre-build the compressed GeoJSON payload so the next map load is served from memory
+    get_geojson_payload(dataset)
 
-        new_df = replace_headers(csv_data, header_mappings)
+    return {
+        'message': 'CSV data imported successfully and saved to file',
+        'file_path': output_file,
+        'dataset_file_path': dataset_path,
+        'dataset_version': feature_store.get_version(dataset)
+    }
 
-        # Backup the current CSV file to the previous CSV file path
-        save_file_copy(curr_csv_path, prev_csv_path)
+# Common function to handle CSV appends, run as a background upload job
 
-        new_df = append_to_csv(curr_csv_path, new_df)
 
-        # Load the old data for comparison
-        old_data = load_old_data(prev_csv_path)
+def append_csv_data(dataset, csv_path, header_mappings, curr_csv_path, convert_geojson_func, geocode_mode=None, progress=None):
+    """
+    Appends the rows of an uploaded CSV file to a dataset.
 
-        # Load the old GeoJSON for reference
-        old_geojson = load_geojson_from_file(prev_geojson_path)
+    Only the uploaded rows are processed, chunk by chunk: rows whose id already exists in
+    the dataset or earlier in the upload are skipped (existing ids win, like the first
+    occurrence of an id within an upload), the others are geocoded, written to a temporary
+    CSV and their features appended to the existing ones. The existing features are never
+    converted or geocoded again. Like replace_csv_data, nothing is visible until the new
+    features have been fully built.
 
-        # Convert the new DataFrame to GeoJSON
-        geojson = convert_geojson_func(new_df, old_data, old_geojson)
+    Returns:
+        dict: The import result.
+    """
+    rows_total = count_csv_rows(csv_path)
+    if rows_total == 0:
+        raise ValueError("No data provided to append.")
+
+    id_field = DATASET_ID_FIELDS[dataset]
+    existing_ids = feature_store.get_ids(dataset)
+    seen_ids = set()
+
+    def incoming_chunks():
+        for chunk in iter_mapped_csv_chunks(csv_path, header_mappings):
+            if id_field in chunk.columns:
+                # Skip the rows whose id is already in the dataset or earlier in the upload
+                keys = chunk[id_field].map(lambda id_value: str(id_value) if pd.notna(id_value) else None)
+                existing = keys.map(lambda key: key is not None and key in existing_ids).astype(bool)
+                for index in chunk.index[existing]:
+                    print(f"Skipping row {index} because id_field already exists")
+                repeated = ~existing & (chunk[id_field].duplicated(keep='first') | chunk[id_field].isin(seen_ids))
+                for index in chunk.index[repeated]:
+                    print(f"Skipping row {index} because id_field is duplicate")
+                chunk = chunk[~(existing | repeated)]
+                seen_ids.update(chunk[id_field])
+            yield chunk
+
+    temp_csv_path = f"{curr_csv_path}.tmp"
+    remove_file(temp_csv_path)
+    try:
+        # Convert the incoming rows to GeoJSON, they are all new to the dataset
+        geojson = convert_geojson_func(
+            spool_chunks(incoming_chunks(), temp_csv_path), None, empty_geojson(), geocode_mode, progress,
+            rows_total)
+
+        # Past this point the upload is committed and can no longer be cancelled
+        if progress:
+            progress.begin_commit()
+
+        # Commit a new version with the new features appended, only they are stored
+        dataset_path = feature_store.append(dataset, geojson)
+
+        # Record the new rows in the CSV once the dataset is committed
+        if os.path.exists(temp_csv_path):
+            append_csv_file(curr_csv_path, temp_csv_path)
+    finally:
+        remove_file(temp_csv_path)
+    # Pre-build the compressed GeoJSON payload so the next map load is served from memory
+    get_geojson_payload(dataset)
+
+    return {
+        'message': 'CSV data imported successfully and saved to file',
+        'file_path': curr_csv_path,
+        'dataset_file_path': dataset_path,
+        'dataset_version': feature_store.get_version(dataset),
+        'appended_features': len(geojson['features'])
+    }
+
+# Common function to start an upload job, returning its id right away
+
+
+def submit_upload_job(dataset, kind, pipeline, csv_file, *args):
+    try:
+        if not csv_file:
+            return jsonify({"error": "No file uploaded"}), 400
 
-        # Save the updated GeoJSON
-        with open(curr_geojson_path, 'w') as geojson_file:
-            json.dump(geojson, geojson_file, indent=4)
+        # Spool the upload to disk, the request's file stream is closed once the response is sent
+        fd, csv_path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        csv_file.save(csv_path)
 
+        job = upload_jobs.submit(
+            dataset, kind, pipeline, dataset, csv_path, *args, cleanup=lambda: os.remove(csv_path))
         return jsonify({
-            'status': 'success',
-            'message': 'CSV data imported successfully and saved to file',
-            'file_path': curr_csv_path,
-            'geojson_file_path': curr_geojson_path
-        }), 200
+            'status': 'accepted',
+            'job_id': job.id,
+            'status_url': f'/map/jobs/{job.id}'
+        }), 202
 
     except Exception as e:
         # Capture and return detailed error information
@@ -200,14 +629,15 @@ def append_csv_data(csv_file, header_mappings, prev_csv_path, curr_csv_path, pre
 
 @map_bp.route('/replace-customers-csv-data', methods=['POST'])
 def replace_customer_csv_data():
-    return replace_csv_data(
+    return submit_upload_job(
+        CUSTOMERS,
+        'replace',
+        replace_csv_data,
         request.files.get('csvFile'),
         getDictionaryFromJSONString(request.form.get('headerMappings')),
-        PREVIOUS_CUSTOMERS_DATA_CSV,
         CURR_CUSTOMERS_DATA_FILE_CSV,
-        CURR_CUSTOMERS_DATA_FILE_GEOJSON,
-        CURR_CUSTOMERS_DATA_FILE_GEOJSON,
-        convert_csv_to_geojson_customers
+        convert_csv_to_geojson_customers,
+        request.form.get('geocodeMode')
     )
 
 # Route for replacing technician CSV data
@@ -215,46 +645,79 @@ def replace_customer_csv_data():
 
 @map_bp.route('/replace-technicians-csv-data', methods=['POST'])
 def replace_technician_csv_data():
-    return replace_csv_data(
+    return submit_upload_job(
+        TECHNICIANS,
+        'replace',
+        replace_csv_data,
         request.files.get('csvFile'),
         getDictionaryFromJSONString(request.form.get('headerMappings')),
-        PREVIOUS_TECHNICIANS_DATA_CSV,
         CURR_TECHNICIANS_DATA_FILE_CSV,
-        CURR_TECHNICIANS_DATA_FILE_GEOJSON,
-        CURR_TECHNICIANS_DATA_FILE_GEOJSON,
-        convert_csv_to_geojson_technicians
+        convert_csv_to_geojson_technicians,
+        request.form.get('geocodeMode')
     )
 
-# Route for replacing customer CSV data
+# Route for appending customer CSV data
 
 
 @map_bp.route('/append-customers-csv-data', methods=['POST'])
 def append_customer_csv_data():
-    return append_csv_data(
+    return submit_upload_job(
+        CUSTOMERS,
+        'append',
+        append_csv_data,
         request.files.get('csvFile'),
         getDictionaryFromJSONString(request.form.get('headerMappings')),
-        PREVIOUS_CUSTOMERS_DATA_CSV,
         CURR_CUSTOMERS_DATA_FILE_CSV,
-        CURR_CUSTOMERS_DATA_FILE_GEOJSON,
-        CURR_CUSTOMERS_DATA_FILE_GEOJSON,
-        convert_csv_to_geojson_customers
+        convert_csv_to_geojson_customers,
+        request.form.get('geocodeMode')
     )
 
-# Route for replacing technician CSV data
+# Route for appending technician CSV data
 
 
 @map_bp.route('/append-technicians-csv-data', methods=['POST'])
 def append_technician_csv_data():
-    return append_csv_data(
+    return submit_upload_job(
+        TECHNICIANS,
+        'append',
+        append_csv_data,
         request.files.get('csvFile'),
         getDictionaryFromJSONString(request.form.get('headerMappings')),
-        PREVIOUS_TECHNICIANS_DATA_CSV,
         CURR_TECHNICIANS_DATA_FILE_CSV,
-        CURR_TECHNICIANS_DATA_FILE_GEOJSON,
-        CURR_TECHNICIANS_DATA_FILE_GEOJSON,
-        convert_csv_to_geojson_technicians
+        convert_csv_to_geojson_technicians,
+        request.form.get('geocodeMode')
     )
 
+# Route for listing the recent upload jobs
+
+
+@map_bp.route('/jobs', methods=['GET'])
+def list_upload_jobs():
+    return jsonify({'jobs': [job.to_dict() for job in upload_jobs.list()]}), 200
+
+# Route for fetching the status and progress of an upload job
+
+
+@map_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_upload_job(job_id):
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    return jsonify(job.to_dict()), 200
+
+# Route for cancelling an upload job (it stops at its next checkpoint, refused once it started committing)
+
+
+@map_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_upload_job(job_id):
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    if not job.cancel():
+        error = 'Job is already committing' if job.committing else f'Job already {job.status}'
+        return jsonify({**job.to_dict(), 'error': error}), 409
+    return jsonify(job.to_dict()), 202
+
 
 class InvalidJSONError(Exception):
     """Custom exception for invalid JSON."""
@@ -0,0 +1,74 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from SpatialIndex import haversine_miles
+
+
+def unit_vectors(lat, lon):
+    """Returns the points as unit vectors from the Earth's center (one row per point)."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def k_nearest(origin_lat, origin_lon, target_lat, target_lon, k, chunk_rows=2048, max_workers=None):
+    """
+    Finds the k nearest targets of every origin by great-circle distance.
+
+    Points are compared as unit vectors: the dot product of two of them decreases with
+    their great-circle distance, so the nearest targets of a chunk of origins are found
+    with one matrix product and a partial sort (argpartition) per chunk. Chunks bound the
+    memory used and are processed on a thread pool (NumPy releases the GIL). Distances of
+    the selected targets are then computed with the haversine formula.
+
+    Args:
+        origin_lat (np.ndarray): Latitude of each origin.
+        origin_lon (np.ndarray): Longitude of each origin.
+        target_lat (np.ndarray): Latitude of each target.
+        target_lon (np.ndarray): Longitude of each target.
+        k (int): Number of targets found per origin (fewer if there are fewer targets).
+        chunk_rows (int): Origins processed at a time.
+        max_workers (int): Threads used, defaults to the number of CPUs.
+
+    Returns:
+        tuple: (positions, distances_in_miles), (origins x k) arrays of the nearest
+               targets' positions and distances, nearest first. Origins without valid
+               coordinates get -1 positions and NaN distances.
+    """
+    origin_lat = np.asarray(origin_lat, dtype=np.float64)
+    origin_lon = np.asarray(origin_lon, dtype=np.float64)
+    target_lat = np.asarray(target_lat, dtype=np.float64)
+    target_lon = np.asarray(target_lon, dtype=np.float64)
+    k = min(k, len(target_lat))
+    positions = np.full((len(origin_lat), k), -1, dtype=np.int64)
+    distances = np.full((len(origin_lat), k), np.nan)
+    if k == 0 or len(origin_lat) == 0:
+        return positions, distances
+
+    targets = unit_vectors(target_lat, target_lon).T
+    valid = np.isfinite(origin_lat) & np.isfinite(origin_lon)
+
+    def process(start):
+        rows = np.arange(start, min(start + chunk_rows, len(origin_lat)))
+        rows = rows[valid[rows]]
+        if len(rows) == 0:
+            return
+        similarity = unit_vectors(origin_lat[rows], origin_lon[rows]) @ targets
+        nearest = np.argpartition(-similarity, k - 1, axis=1)[:, :k] if k < similarity.shape[1] \
+            else np.broadcast_to(np.arange(k), (len(rows), k))
+        nearest_similarity = np.take_along_axis(similarity, nearest, axis=1)
+        order = np.argsort(-nearest_similarity, axis=1, kind='stable')
+        nearest = np.take_along_axis(nearest, order, axis=1)
+
+        positions[rows] = nearest
+        distances[rows] = haversine_miles(
+            origin_lat[rows, None], origin_lon[rows, None], target_lat[nearest], target_lon[nearest])
+
+    max_workers = max_workers or os.cpu_count() or 1
+    starts = range(0, len(origin_lat), chunk_rows)
+    if max_workers == 1 or len(starts) == 1:
+        for start in starts:
+            process(start)
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(starts))) as executor:
+            list(executor.map(process, starts))
+    return positions, distances
@@ -1,49 +1,32 @@
-from flask import Flask, request, jsonify, json, Blueprint
+from flask import Flask, request, jsonify, json, Blueprint, Response
 import requests
+import csv
+import io
 import os
+import numpy as np
+import time
 from datetime import datetime
-from geopy.distance import geodesic
-from Config import TOM_TOM_API_KEY
-from Config import CURR_TECHNICIANS_DATA_FILE_GEOJSON, CURR_CUSTOMERS_DATA_FILE_GEOJSON
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from Cache import LRUCache, PersistentCache
+from TomTomClient import tomtom_client, ROUTE, MATRIX
+from Config import ROUTING_MODE, ROUTING_MAX_WORKERS, ROUTING_MATRIX_BATCH_SIZE, ROUTING_WAVE_SIZE
+from Config import CACHE_DB_FILE, ROUTE_CACHE_GRID_DEGREES, ROUTE_CACHE_TIME_BUCKET_SECONDS, ROUTE_CACHE_TTL_SECONDS, ROUTE_CACHE_MAX_ENTRIES, ROUTE_CACHE_PERSIST
+from Config import NEAREST_BULK_MAX_K, NEAREST_BULK_CHUNK_ROWS, NEAREST_BULK_MAX_WORKERS
+from FeatureStore import feature_store, CUSTOMERS, TECHNICIANS
+from NearestAssignment import k_nearest
 
 technicians_bp = Blueprint('technicians', __name__)
 
+# Route summaries keyed by technician, quantized destination and departure time bucket
+route_cache = LRUCache(
+    ROUTE_CACHE_MAX_ENTRIES,
+    ROUTE_CACHE_TTL_SECONDS,
+    PersistentCache(CACHE_DB_FILE, 'route_summaries', ROUTE_CACHE_TTL_SECONDS,
+                    ROUTE_CACHE_MAX_ENTRIES) if ROUTE_CACHE_PERSIST else None
+)
 
-def load_geojson_data():
-    """
-    Load the latest GeoJSON data from files.
-    This ensures we always have the most up-to-date data.
-
-    Returns:
-        tuple: (technicians_geojson, customers_geojson)
-    """
-    try:
-        with open(CURR_TECHNICIANS_DATA_FILE_GEOJSON) as file:
-            technicians_geojson = json.load(file)
-
-        with open(CURR_CUSTOMERS_DATA_FILE_GEOJSON) as file:
-            customers_geojson = json.load(file)
-
-        return technicians_geojson, customers_geojson
-    except Exception as e:
-        print(f"Error loading GeoJSON data: {e}")
-        # Return empty GeoJSON structures if loading fails
-        empty_geojson = {"type": "FeatureCollection", "features": []}
-        return empty_geojson, empty_geojson
-
-
-def parse_technicians(data):
-    """Extracts technician details from the GeoJSON data."""
-    technicians = []
-    for feature in data.get("features", []):
-        name = feature["properties"].get("name")
-        coordinates = feature["geometry"].get("coordinates")
-        if name and coordinates:
-            technicians.append({
-                "name": name,
-                "location": (coordinates[1], coordinates[0])
-            })
-    return technicians
+# Bulk nearest technician assignments keyed by customers version, technicians version and k
+nearest_assignment_cache = LRUCache(max_entries=16)
 
 
 def getCustomerLocation(customer_name, customers_geojson):
@@ -60,106 +43,604 @@ def getCustomerLocation(customer_name, customers_geojson):
     return None
 
 
-def filter_technicians_within_radius(technicians, customer_location, max_radius_miles):
-    customer_coords = (customer_location["lat"], customer_location["lng"])
+def filter_technicians_within_radius(technician_index, customer_location, max_radius_miles):
+    """
+    Finds the technicians within a straight-line radius of the customer using the
+    technicians' spatial index.
+
+    Args:
+        technician_index (PointIndex): The technicians' point index.
+        customer_location (dict): The customer's { lat, lng }.
+        max_radius_miles (float): The search radius in miles.
+
+    Returns:
+        list: Technician details ('id', 'name', 'location' as (lat, lon) and
+              'straight_line_miles'), nearest first.
+    """
+    positions, distances = technician_index.within_radius(
+        customer_location["lat"], customer_location["lng"], max_radius_miles)
     return [
-        technician for technician in technicians
-        if geodesic(customer_coords, technician["location"]).miles <= max_radius_miles
+        {
+            "id": technician_index.ids[position],
+            "name": technician_index.names[position],
+            "location": (float(technician_index.lat[position]), float(technician_index.lon[position])),
+            "straight_line_miles": float(distance)
+        }
+        for position, distance in zip(positions, distances)
+        if technician_index.names[position]
     ]
 
 
+def calculate_route_summary(origin, destination):
+    """
+    Calls TomTom's calculateRoute API for a single origin/destination pair.
+
+    Args:
+        origin (tuple): (lat, lon) of the route's start.
+        destination (tuple): (lat, lon) of the route's end.
+
+    Returns:
+        dict: The route summary, or None if the request failed or found no route.
+    """
+    path = f"/routing/1/calculateRoute/{origin[0]},{origin[1]}:{destination[0]},{destination[1]}/json"
+
+    params = {
+        "traffic": "true",
+        "travelMode": "car",
+        "computeTravelTimeFor": "all"
+    }
+
+    try:
+        response = tomtom_client.get(ROUTE, path, params=params)
+    except requests.exceptions.RequestException as e:
+        print(f"Failed to fetch data from TomTom API: {e}")
+        return None
+
+    if response.status_code == 200:
+        route_data = response.json()
+        if route_data and route_data.get("routes"):
+            return route_data["routes"][0]["summary"]
+    else:
+        print(
+            f"Failed to fetch data from TomTom API: {response.status_code}, {response.text}")
+    return None
+
+
+def calculate_route_summaries(origins, destination, max_workers=ROUTING_MAX_WORKERS):
+    """
+    Calculates the routes from many origins to one destination with concurrent calculateRoute requests.
+
+    Returns:
+        list: The route summary (or None) for each origin, in input order.
+    """
+    if not origins:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(origins)))) as executor:
+        return list(executor.map(lambda origin: calculate_route_summary(origin, destination), origins))
+
+
+def calculate_matrix_summaries(origins, destination, batch_size=ROUTING_MATRIX_BATCH_SIZE):
+    """
+    Calculates the routes from many origins to one destination with TomTom's synchronous
+    Matrix Routing API, sending at most batch_size origins per request. Origins whose
+    matrix cell (or whole batch) failed are routed with concurrent calculateRoute requests.
+
+    The matrix route summaries only contain the live traffic travel time, so the
+    no-traffic/historic/incident travel times are missing from them.
+
+    Returns:
+        list: The route summary (or None) for each origin, in input order.
+    """
+    summaries = [None] * len(origins)
+    failed = []
+
+    for start in range(0, len(origins), batch_size):
+        batch = origins[start:start + batch_size]
+        body = {
+            "origins": [{"point": {"latitude": lat, "longitude": lon}} for lat, lon in batch],
+            "destinations": [{"point": {"latitude": destination[0], "longitude": destination[1]}}],
+            "options": {
+                "departAt": "now",
+                "routeType": "fastest",
+                "traffic": "live",
+                "travelMode": "car"
+            }
+        }
+
+        try:
+            # Every matrix cell counts as a transaction against the daily quota
+            response = tomtom_client.post(
+                MATRIX, "/routing/matrix/2", json=body, transactions=len(batch))
+            response.raise_for_status()
+            cells = response.json().get("data", [])
+        except requests.exceptions.RequestException as e:
+            print(f"Failed to fetch matrix from TomTom API, falling back to single routes: {e}")
+            cells = []
+
+        for cell in cells:
+            origin_index = cell.get("originIndex")
+            if cell.get("routeSummary") and origin_index is not None and 0 <= origin_index < len(batch):
+                summaries[start + origin_index] = cell["routeSummary"]
+        failed.extend(start + i for i in range(len(batch))
+                      if summaries[start + i] is None)
+
+    # Route every origin without a matrix result individually
+    for i, summary in zip(failed, calculate_route_summaries([origins[i] for i in failed], destination)):
+        summaries[i] = summary
+    return summaries
+
+
+def route_cache_key(technician, destination, departure_time=None, routing_mode=None):
+    """
+    Builds the route cache key of a technician's route to a destination.
+
+    The destination is rounded to ROUTE_CACHE_GRID_DEGREES and the departure time to a
+    ROUTE_CACHE_TIME_BUCKET_SECONDS bucket. The technician's location is part of the key
+    so that a technician who moved is routed again, and so is the routing mode: matrix
+    summaries lack the traffic breakdown of calculateRoute summaries and must not be
+    served to route mode requests.
+    """
+    departure_time = time.time() if departure_time is None else departure_time
+    time_bucket = int(departure_time // ROUTE_CACHE_TIME_BUCKET_SECONDS)
+    grid = ROUTE_CACHE_GRID_DEGREES
+    return "|".join([
+        routing_mode or ROUTING_MODE,
+        str(technician.get("id") or technician["name"]),
+        f"{technician['location'][0]:.5f},{technician['location'][1]:.5f}",
+        f"{round(destination[0] / grid) * grid:.6f},{round(destination[1] / grid) * grid:.6f}",
+        str(time_bucket),
+    ])
+
+
+def iter_technician_route_summaries(technicians, destination, routing_mode=None, max_workers=ROUTING_MAX_WORKERS):
+    """
+    Returns the route summary from each technician to the destination, only routing
+    the technicians without a cached summary. Summaries are yielded as soon as they are
+    known: cached ones first, then routed ones in completion order (a matrix request's
+    summaries arrive together).
+
+    Yields:
+        tuple: (index of the technician, route summary or None).
+    """
+    departure_time = time.time()
+    keys = [route_cache_key(technician, destination, departure_time, routing_mode)
+            for technician in technicians]
+
+    missing = []
+    for i, key in enumerate(keys):
+        summary = route_cache.get(key)
+        if summary is None:
+            missing.append(i)
+        else:
+            yield i, summary
+    if not missing:
+        return
+
+    if (routing_mode or ROUTING_MODE) == 'matrix':
+        for i, summary in zip(missing, calculate_matrix_summaries(
+                [technicians[i]["location"] for i in missing], destination)):
+            if summary is not None:
+                route_cache.set(keys[i], summary)
+            yield i, summary
+        return
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(missing))))
+    try:
+        futures = {executor.submit(calculate_route_summary, technicians[i]["location"], destination): i
+                   for i in missing}
+        for future in as_completed(futures):
+            i, summary = futures[future], future.result()
+            if summary is not None:
+                route_cache.set(keys[i], summary)
+            yield i, summary
+    finally:
+        # Do not wait for the remaining routes if the consumer stopped early
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def build_technician_result(technician, summary):
+    """Formats a technician's route summary for the nearest technicians response."""
+    travel_time = summary.get("travelTimeInSeconds", float("inf"))
+    no_traffic_time = summary.get(
+        "noTrafficTravelTimeInSeconds", 0)
+    historic_traffic_time = summary.get(
+        "historicTrafficTravelTimeInSeconds", 0)
+    live_traffic_incidents_time = summary.get(
+        "liveTrafficIncidentsTravelTimeInSeconds", 0)
+
+    return {
+        "id": technician.get("id"),
+        "name": technician["name"],
+        # Convert meters to miles
+        "driving_distance": f"{summary['lengthInMeters'] / 1609.34:.1f} miles",
+        "driving_distance_miles": summary['lengthInMeters'] / 1609.34,
+        "straight_line_distance_miles": technician.get("straight_line_miles"),
+        "travel_time_seconds": summary.get("travelTimeInSeconds"),
+        "traffic_delay_seconds": summary.get("trafficDelayInSeconds", 0),
+        # Convert seconds to minutes
+        "estimated_duration": f"{travel_time // 60} minutes",
+        # Convert seconds to minutes
+        "duration_in_traffic": f"{summary.get('trafficDelayInSeconds', 0) // 60} minutes",
+        # Convert seconds to minutes
+        "no_traffic_travel_time": f"{no_traffic_time // 60} minutes",
+        # Convert seconds to minutes
+        "historic_traffic_travel_time": f"{historic_traffic_time // 60} minutes",
+        # Convert seconds to minutes
+        "live_traffic_incidents_travel_time": f"{live_traffic_incidents_time // 60} minutes",
+        "location": technician["location"]
+    }
+
+
+def technician_result_key(result):
+    """Sort key of the nearest technicians: shortest driving distance first, ties broken so
+    the order does not depend on the order routes arrive in."""
+    return result["driving_distance_miles"], result["straight_line_distance_miles"], str(result["name"])
+
+
+def iter_nearest_technicians(candidates, destination, time_budget, bottleneck, routing_mode=None, limit=None,
+                             wave_size=ROUTING_WAVE_SIZE):
+    """
+    Routes candidate technicians to the destination, yielding each technician of the
+    result as soon as it is known to be part of it, then the final sorted results.
+
+    Without a limit every candidate is routed at once and each technician within the
+    budget is yielded as soon as its route is known. With a limit, candidates are routed
+    in waves of wave_size, nearest (straight-line) first, until `limit` technicians are
+    found and the next candidate's straight-line distance is at least the limit-th
+    shortest driving distance found: a driving distance is never shorter than the
+    straight-line distance, so no remaining candidate could make the result. The same
+    bound confirms technicians early: one is yielded once it ranks within the limit and
+    its driving distance is shorter than the straight-line distance of every candidate
+    whose route is not known yet. Technicians yielded are never evicted, and they are
+    yielded in their final order.
+
+    Args:
+        candidates (list): Technicians from filter_technicians_within_radius, nearest first.
+        destination (tuple): (lat, lon) of the customer.
+        time_budget (float): Largest travel time in seconds (only applied for the 'time' bottleneck).
+        bottleneck (str): 'time' or 'distance'.
+        routing_mode (str): 'matrix' or 'route', defaults to Config.ROUTING_MODE.
+        limit (int): Number of technicians wanted, or None for every technician within budget.
+        wave_size (int): Candidates routed per wave when a limit is set.
+
+    Yields:
+        tuple: ('technician', result) for each technician of the results (from
+               build_technician_result), then ('done', (results, routed)): the results
+               (at most limit, shortest driving distance first) and the number of
+               candidates routed.
+    """
+    results = []
+    routed = 0
+    confirmed = 0
+    step = len(candidates) if not limit else max(wave_size, 1)
+    while routed < len(candidates):
+        wave = candidates[routed:routed + step]
+        pending = set(range(len(wave)))
+        for i, summary in iter_technician_route_summaries(wave, destination, routing_mode):
+            pending.discard(i)
+            if summary is not None:
+                travel_time = summary.get("travelTimeInSeconds", float("inf"))
+                if bottleneck == 'distance' or travel_time <= time_budget:
+                    result = build_technician_result(wave[i], summary)
+                    results.append(result)
+                    if not limit:
+                        yield 'technician', result
+            if not limit:
+                continue
+
+            # Lower bound of the driving distance of every technician still to be routed
+            bound = min([wave[j]["straight_line_miles"] for j in pending] +
+                        [candidate["straight_line_miles"] for candidate in candidates[routed + len(wave):][:1]],
+                        default=float("inf"))
+            results.sort(key=technician_result_key)
+            while confirmed < min(limit, len(results)) and results[confirmed]["driving_distance_miles"] < bound:
+                yield 'technician', results[confirmed]
+                confirmed += 1
+        routed += len(wave)
+        results.sort(key=technician_result_key)
+
+        if limit and len(results) >= limit:
+            results = results[:limit]
+            if routed >= len(candidates) or \
+                    candidates[routed]["straight_line_miles"] >= results[-1]["driving_distance_miles"]:
+                break
+
+    # The rest of the results are final once routing stops
+    if limit:
+        for result in results[confirmed:]:
+            yield 'technician', result
+    yield 'done', (results, routed)
+
+
+def find_nearest_technicians(candidates, destination, time_budget, bottleneck, routing_mode=None, limit=None):
+    """
+    Routes candidate technicians to the destination and keeps those within the budget
+    (see iter_nearest_technicians).
+
+    Returns:
+        tuple: (results, routed), the results (at most limit, shortest driving distance
+               first) and the number of candidates routed.
+    """
+    for kind, value in iter_nearest_technicians(candidates, destination, time_budget, bottleneck,
+                                                routing_mode, limit):
+        if kind == 'done':
+            return value
+
+
+def get_nearest_assignments(k):
+    """
+    Finds the k nearest technicians (by straight-line distance) of every customer, computed
+    once per version of the customers and technicians datasets.
+
+    Returns:
+        dict: The datasets' 'customers_version' and 'technicians_version', the customers'
+              point index, the technicians' point index and 'positions' / 'distances',
+              (customers x k) arrays of technician positions and distances in miles
+              (-1 / NaN where a customer has fewer candidates).
+    """
+    customer_index = feature_store.get_point_index(CUSTOMERS)
+    technician_index = feature_store.get_point_index(TECHNICIANS)
+    key = (feature_store.get_version(CUSTOMERS),
+           feature_store.get_version(TECHNICIANS), k)
+    assignments = nearest_assignment_cache.get(key)
+    if assignments is None:
+        # Same candidates as the nearest technicians endpoint: named technicians with a location
+        candidates = np.flatnonzero(np.array([bool(name) for name in technician_index.names], dtype=bool) &
+                                    np.isfinite(technician_index.lat) & np.isfinite(technician_index.lon))
+        positions, distances = k_nearest(
+            customer_index.lat, customer_index.lon,
+            technician_index.lat[candidates], technician_index.lon[candidates], k,
+            chunk_rows=NEAREST_BULK_CHUNK_ROWS, max_workers=NEAREST_BULK_MAX_WORKERS or None)
+        assignments = {
+            "customers_version": key[0],
+            "technicians_version": key[1],
+            "customer_index": customer_index,
+            "technician_index": technician_index,
+            "positions": np.where(positions >= 0, candidates[np.maximum(positions, 0)], -1) if len(candidates) else positions,
+            "distances": distances,
+        }
+        nearest_assignment_cache.set(key, assignments)
+    return assignments
+
+
+def iter_nearest_assignment_rows(assignments):
+    """Yields (customer position, rank, technician position, distance) for every assignment."""
+    for customer, (positions, distances) in enumerate(zip(assignments["positions"], assignments["distances"])):
+        for rank, (position, distance) in enumerate(zip(positions, distances), start=1):
+            if position >= 0:
+                yield customer, rank, int(position), float(distance)
+
+
+def get_bulk_k_param():
+    """Reads the 'k' query parameter. Raises ValueError if it is out of range."""
+    k = request.args.get('k', default=3, type=int)
+    if k is None or k < 1 or k > NEAREST_BULK_MAX_K:
+        raise ValueError(f"k must be between 1 and {NEAREST_BULK_MAX_K}")
+    return k
+
+
+def parse_nearest_technicians_request(data):
+    """
+    Validates a nearest technicians request and finds its candidate technicians.
+
+    Returns:
+        dict: The request's 'customer_location', 'time_budget', 'bottleneck',
+              'routing_mode' and 'limit', the 'destination' as (lat, lon) and the
+              'candidates' from filter_technicians_within_radius.
+
+    Raises:
+        ValueError: If the request is missing or has invalid parameters.
+    """
+    data = data or {}
+    customer_location = data.get(
+        "customer_location")  # Expecting { lat, lng }
+    time_budget = data.get("time_budget")  # In seconds
+    max_miles = data.get("max_miles")
+    bottleneck = data.get("bottleneck")
+    routing_mode = data.get("routing_mode")  # Optional 'matrix' or 'route'
+    # Optional number of technicians wanted, candidates are then routed progressively
+    limit = data.get("limit")
+
+    if not customer_location:
+        raise ValueError("Customer location required")
+    if not isinstance(customer_location, dict) or not all(k in customer_location for k in ("lat", "lng")):
+        raise ValueError("Customer location must include 'lat' and 'lng'")
+    if time_budget is None:
+        raise ValueError("Time budget required")
+    if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit < 1):
+        raise ValueError("Limit must be a positive integer")
+
+    technician_index = feature_store.get_point_index(TECHNICIANS)
+
+    if bottleneck == 'time':
+        filtered_technicians = filter_technicians_within_radius(
+            technician_index, customer_location, time_budget / 60 * 2.5)  # !!!!!! ASSUMPTION that the max distance that can be traveled within the time budget for the chosen region is under (2.5 * time_budget_in_minutes) miles, this is soley for narrowing down amount of technicians to actually make api calls for
+    else:
+        filtered_technicians = filter_technicians_within_radius(
+            technician_index, customer_location, max_miles)
+
+    return {
+        "customer_location": customer_location,
+        "time_budget": time_budget,
+        "bottleneck": bottleneck,
+        "routing_mode": routing_mode,
+        "limit": limit,
+        "destination": (customer_location['lat'], customer_location['lng']),
+        "candidates": filtered_technicians,
+    }
+
+
+def nearest_technicians_summary(params, nearby_technicians, routed, include_technicians=True):
+    """
+    Builds the nearest technicians response.
+
+    Args:
+        params (dict): The parsed request (see parse_nearest_technicians_request).
+        nearby_technicians (list): The results, shortest driving distance first.
+        routed (int): Number of candidates routed.
+        include_technicians (bool): If false (the final record of a streamed response, whose
+            technicians were already sent), only the ids of the technicians are listed, in order.
+    """
+    summary = {
+        "customerLocation": params["customer_location"],
+        "timeBudget": params["time_budget"],
+        "limit": params["limit"],
+        "candidates": len(params["candidates"]),
+        "techniciansRouted": routed,
+        "techniciansFound": len(nearby_technicians),
+    }
+    if include_technicians:
+        summary["technicians"] = nearby_technicians
+    else:
+        summary["technicianIds"] = [technician["id"] for technician in nearby_technicians]
+    return summary
+
+
 @technicians_bp.route('/nearest-technicians', methods=['POST'])
 def get_technicians_within_time_budget():
     try:
-        # Load the latest GeoJSON data
-        technicians_geojson, customers_geojson = load_geojson_data()
+        params = parse_nearest_technicians_request(request.get_json())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    try:
+        # Route the candidate technicians to the customer (matrix or concurrent single routes),
+        # sorted by driving distance
+        nearby_technicians, routed = find_nearest_technicians(
+            params["candidates"], params["destination"], params["time_budget"], params["bottleneck"],
+            params["routing_mode"], params["limit"])
 
+        return jsonify(nearest_technicians_summary(params, nearby_technicians, routed))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@technicians_bp.route('/nearest-technicians/stream', methods=['POST'])
+def stream_technicians_within_time_budget():
+    """
+    Streaming variant of /nearest-technicians (same request body): each technician of the
+    result is sent as soon as it is known to be part of it (see iter_nearest_technicians),
+    followed by a summary record holding the same fields as the /nearest-technicians
+    response, except that 'technicians' is replaced by 'technicianIds', the ids of the
+    technicians sent in their final order.
+
+    Records are newline-delimited JSON ({"type": "technician", "technician": ...} then
+    {"type": "summary", ...}), or server-sent events ('technician' and 'summary' events)
+    if the request accepts text/event-stream or sets "format": "sse". An error while
+    routing ends the stream with an 'error' record.
+    """
+    try:
         data = request.get_json()
+        params = parse_nearest_technicians_request(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        customer_location = data.get(
-            "customer_location")  # Expecting { lat, lng }
-        time_budget = data.get("time_budget")  # In seconds
-        max_miles = data.get("max_miles")
-        bottleneck = data.get("bottleneck")
+    server_sent_events = (data or {}).get("format") == 'sse' or \
+        request.accept_mimetypes.best == 'text/event-stream'
 
-        if not customer_location:
-            return jsonify({"error": "Customer location required"}), 400
-        if not isinstance(customer_location, dict) or not all(k in customer_location for k in ("lat", "lng")):
-            return jsonify({"error": "Customer location must include 'lat' and 'lng'"}), 400
-        if time_budget is None:
-            return jsonify({"error": "Time budget required"}), 400
+    def encode(record_type, record):
+        if server_sent_events:
+            return f"event: {record_type}\ndata: {json.dumps(record)}\n\n"
+        return json.dumps({"type": record_type, **record}) + "\n"
 
-        technicians_data = parse_technicians(technicians_geojson)
+    def generate():
+        try:
+            for kind, value in iter_nearest_technicians(
+                    params["candidates"], params["destination"], params["time_budget"], params["bottleneck"],
+                    params["routing_mode"], params["limit"]):
+                if kind == 'technician':
+                    yield encode('technician', {"technician": value})
+                else:
+                    yield encode('summary', nearest_technicians_summary(params, *value, include_technicians=False))
+        except Exception as e:
+            print(f"Error streaming nearest technicians: {e}")
+            yield encode('error', {"error": str(e)})
 
-        if bottleneck == 'time':
-            filtered_technicians = filter_technicians_within_radius(
-                technicians_data, customer_location, time_budget / 60 * 2.5)  # !!!!!! ASSUMPTION that the max distance that can be traveled within the time budget for the chosen region is under (2.5 * time_budget_in_minutes) miles, this is soley for narrowing down amount of technicians to actually make api calls for
-        else:
-            filtered_technicians = filter_technicians_within_radius(
-                technicians_data, customer_location, max_miles)
-
-        nearby_technicians = []
-
-        for technician in filtered_technicians:
-            # Call TomTom API for route information
-            origin = f"{technician['location'][0]},{technician['location'][1]}"
-            destination = f"{customer_location['lat']},{customer_location['lng']}"
-            url = f"https://api.tomtom.com/routing/1/calculateRoute/{origin}:{destination}/json"
-
-            params = {
-                "key": TOM_TOM_API_KEY,
-                "traffic": "true",
-                "travelMode": "car",
-                "computeTravelTimeFor": "all"
-            }
+    return Response(generate(), mimetype='text/event-stream' if server_sent_events else 'application/x-ndjson',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@technicians_bp.route('/route-cache-stats', methods=['GET'])
+def get_route_cache_stats():
+    try:
+        return jsonify(route_cache.stats()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-            response = requests.get(url, params=params)
-            if response.status_code == 200:
-                route_data = response.json()
-                if route_data and route_data.get("routes"):
-                    route = route_data["routes"][0]
-                    summary = route["summary"]
-
-                    travel_time = summary.get(
-                        "travelTimeInSeconds", float("inf"))
-                    if bottleneck == 'distance' or travel_time <= time_budget:
-                        no_traffic_time = summary.get(
-                            "noTrafficTravelTimeInSeconds", 0)
-                        historic_traffic_time = summary.get(
-                            "historicTrafficTravelTimeInSeconds", 0)
-                        live_traffic_incidents_time = summary.get(
-                            "liveTrafficIncidentsTravelTimeInSeconds", 0)
-
-                        nearby_technicians.append({
-                            "name": technician["name"],
-                            # Convert meters to miles
-                            "driving_distance": f"{summary['lengthInMeters'] / 1609.34:.1f} miles",
-                            # Convert seconds to minutes
-                            "estimated_duration": f"{travel_time // 60} minutes",
-                            # Convert seconds to minutes
-                            "duration_in_traffic": f"{summary.get('trafficDelayInSeconds', 0) // 60} minutes",
-                            # Convert seconds to minutes
-                            "no_traffic_travel_time": f"{no_traffic_time // 60} minutes",
-                            # Convert seconds to minutes
-                            "historic_traffic_travel_time": f"{historic_traffic_time // 60} minutes",
-                            # Convert seconds to minutes
-                            "live_traffic_incidents_travel_time": f"{live_traffic_incidents_time // 60} minutes",
-                            "location": technician["location"]
-                        })
-            else:
-                print(
-                    f"Failed to fetch data from TomTom API: {response.status_code}, {response.text}")
-
-        # Sort technicians by driving distance
-        nearby_technicians.sort(key=lambda x: float(
-            x["driving_distance"].split()[0]))
+
+@technicians_bp.route('/bulk-nearest-technicians', methods=['GET'])
+def get_bulk_nearest_technicians():
+    """
+    Returns the k nearest technicians (by straight-line distance) of every customer.
+
+    Query parameters:
+    - 'k' (optional): Number of technicians per customer (default 3).
+    """
+    try:
+        assignments = get_nearest_assignments(get_bulk_k_param())
+        customer_index = assignments["customer_index"]
+        technician_index = assignments["technician_index"]
+
+        customers = [
+            {
+                "id": customer_index.ids[i],
+                "name": customer_index.names[i],
+                "location": (float(customer_index.lat[i]), float(customer_index.lon[i])),
+                "technicians": []
+            }
+            for i in range(len(customer_index))
+        ]
+        for customer, rank, position, distance in iter_nearest_assignment_rows(assignments):
+            customers[customer]["technicians"].append({
+                "rank": rank,
+                "id": technician_index.ids[position],
+                "name": technician_index.names[position],
+                "distance_miles": round(distance, 3)
+            })
 
         return jsonify({
-            "customerLocation": customer_location,
-            "timeBudget": time_budget,
-            "techniciansFound": len(nearby_technicians),
-            "technicians": nearby_technicians
+            "customersVersion": assignments["customers_version"],
+            "techniciansVersion": assignments["technicians_version"],
+            "customers": customers
         })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 
+@technicians_bp.route('/bulk-nearest-technicians/export-csv', methods=['GET'])
+def export_bulk_nearest_technicians():
+    """
+    Exports the k nearest technicians of every customer as a CSV file, one row per
+    customer and technician.
+
+    Query parameters:
+    - 'k' (optional): Number of technicians per customer (default 3).
+    """
+    try:
+        assignments = get_nearest_assignments(get_bulk_k_param())
+        customer_index = assignments["customer_index"]
+        technician_index = assignments["technician_index"]
+
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(["customer_id", "customer_name", "rank",
+                        "technician_id", "technician_name", "distance_miles"])
+        for customer, rank, position, distance in iter_nearest_assignment_rows(assignments):
+            writer.writerow([customer_index.ids[customer], customer_index.names[customer], rank,
+                             technician_index.ids[position], technician_index.names[position], f"{distance:.3f}"])
+
+        return Response(output.getvalue(), mimetype='text/csv', headers={
+            "Content-Disposition": "attachment; filename=nearest_technicians.csv"
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
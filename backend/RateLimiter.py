@@ -0,0 +1,70 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Tokens are added continuously at `rate` tokens per second up to `capacity`.
+    Each call to acquire() takes tokens from the bucket, blocking until enough
+    tokens are available.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate (float): Tokens added per second, i.e. the sustained requests per second (0 disables limiting).
+            capacity (float): Maximum burst size. Defaults to one second worth of tokens.
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(self.rate, 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated_at
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def acquire(self, tokens=1):
+        """
+        Blocks until `tokens` tokens are available and takes them from the bucket.
+
+        Args:
+            tokens (float): Number of tokens to take.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait_time = (tokens - self._tokens) / self.rate
+            time.sleep(wait_time)
+            waited += wait_time
+
+    def try_acquire(self, tokens=1):
+        """
+        Takes `tokens` tokens from the bucket without blocking.
+
+        Returns:
+            bool: True if the tokens were taken, False if not enough tokens were available.
+        """
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
@@ -0,0 +1,172 @@
+import numpy as np
+import shapely
+from geopy.distance import geodesic
+
+# Mean Earth radius used by the haversine distance
+EARTH_RADIUS_MILES = 3958.7613
+# Smallest number of miles per degree of latitude (at the equator), used to size bounding boxes
+MILES_PER_DEGREE_MIN = 68.7
+# Relative error band around a radius in which haversine distances are rechecked with exact geodesic
+# distances (haversine is within ~0.5% of the WGS-84 geodesic distance)
+HAVERSINE_TOLERANCE = 0.006
+
+
+def haversine_miles(lat, lon, lats, lons):
+    """
+    Vectorized great-circle distances in miles from one point to many points.
+
+    Args:
+        lat (float): Latitude of the origin.
+        lon (float): Longitude of the origin.
+        lats (np.ndarray): Latitudes of the destinations.
+        lons (np.ndarray): Longitudes of the destinations.
+
+    Returns:
+        np.ndarray: Distance in miles to each destination.
+    """
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * \
+        np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def radius_bounding_box(lat, lon, radius_miles):
+    """
+    Returns a lon/lat box (min_lon, min_lat, max_lon, max_lat) containing every point within radius_miles.
+    """
+    delta_lat = radius_miles / MILES_PER_DEGREE_MIN
+    min_lat, max_lat = max(lat - delta_lat, -90.0), min(lat + delta_lat, 90.0)
+
+    # Longitude degrees shrink with latitude, size the box for the latitude closest to a pole
+    cos_lat = np.cos(np.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat < 1e-6:
+        return -180.0, min_lat, 180.0, max_lat
+    delta_lon = radius_miles / (MILES_PER_DEGREE_MIN * cos_lat)
+    if delta_lon >= 180 or lon - delta_lon < -180 or lon + delta_lon > 180:
+        # The box wraps around the antimeridian, search every longitude
+        return -180.0, min_lat, 180.0, max_lat
+    return lon - delta_lon, min_lat, lon + delta_lon, max_lat
+
+
+class PointIndex:
+    """
+    Coordinates of a point dataset held as NumPy arrays behind an STRtree.
+
+    Positions returned by the query methods index into the arrays (lon, lat, ids and
+    names), which are in the same order as the dataset's features.
+    """
+
+    def __init__(self, lon, lat, ids, names, id_field):
+        """
+        Args:
+            lon (np.ndarray): Longitude of each point.
+            lat (np.ndarray): Latitude of each point.
+            ids (np.ndarray): Id of each point.
+            names (np.ndarray): Name of each point.
+            id_field (str): The property holding the ids.
+        """
+        self.id_field = id_field
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.ids = np.asarray(ids, dtype=object)
+        self.names = np.asarray(names, dtype=object)
+        self.tree = shapely.STRtree(shapely.points(self.lon, self.lat))
+
+    def __len__(self):
+        return len(self.lon)
+
+    def within_polygon(self, polygon):
+        """
+        Finds the points strictly inside a polygon (points on the boundary are excluded,
+        like Point.within).
+
+        Args:
+            polygon (shapely.Geometry): A Polygon or MultiPolygon in lon/lat coordinates.
+
+        Returns:
+            np.ndarray: Sorted positions of the matching points.
+        """
+        shapely.prepare(polygon)
+        # Bounding box candidates from the tree, then an exact vectorized test
+        candidates = self.tree.query(polygon)
+        mask = shapely.contains_xy(
+            polygon, self.lon[candidates], self.lat[candidates])
+        return np.sort(candidates[mask])
+
+    def within_polygons(self, polygons):
+        """
+        Finds the points strictly inside each of many polygons in a single pass: the
+        candidate (polygon, point) pairs of every polygon come from one tree query and are
+        tested together.
+
+        Args:
+            polygons (np.ndarray): Polygons and MultiPolygons in lon/lat coordinates.
+
+        Returns:
+            tuple: (polygon_indices, positions) of every matching pair, sorted by polygon then position.
+        """
+        polygons = np.asarray(polygons, dtype=object)
+        shapely.prepare(polygons)
+        polygon_indices, candidates = self.tree.query(polygons)
+        mask = shapely.contains_xy(
+            polygons[polygon_indices], self.lon[candidates], self.lat[candidates])
+        polygon_indices, candidates = polygon_indices[mask], candidates[mask]
+        order = np.lexsort((candidates, polygon_indices))
+        return polygon_indices[order], candidates[order]
+
+    def within_bbox(self, bbox):
+        """
+        Finds the points inside a (west, south, east, north) box, edges included.
+        Boxes crossing the antimeridian (west > east) are supported.
+
+        Returns:
+            np.ndarray: Sorted positions of the matching points.
+        """
+        west, south, east, north = bbox
+        boxes = [(west, south, east, north)] if west <= east else [
+            (west, south, 180.0, north), (-180.0, south, east, north)]
+        candidates = np.unique(np.concatenate(
+            [self.tree.query(shapely.box(*box)) for box in boxes]))
+        # The tree is queried with bounding boxes only, recheck the exact extent
+        lon, lat = self.lon[candidates], self.lat[candidates]
+        mask = (lat >= south) & (lat <= north)
+        mask &= ((lon >= west) & (lon <= east)) if west <= east else (
+            (lon >= west) | (lon <= east))
+        return candidates[mask]
+
+    def within_radius(self, lat, lon, radius_miles):
+        """
+        Finds the points within a geodesic distance of a location.
+
+        Candidates come from a bounding box query on the tree and are filtered with
+        vectorized haversine distances. Only candidates whose haversine distance is too
+        close to the radius to decide are checked with an exact geodesic distance.
+
+        Args:
+            lat (float): Latitude of the location.
+            lon (float): Longitude of the location.
+            radius_miles (float): The search radius in miles.
+
+        Returns:
+            tuple: (positions, distances_in_miles) of the matching points, sorted by distance.
+        """
+        if radius_miles is None or radius_miles < 0 or len(self) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        candidates = self.tree.query(
+            shapely.box(*radius_bounding_box(lat, lon, radius_miles)))
+        distances = haversine_miles(
+            lat, lon, self.lat[candidates], self.lon[candidates])
+
+        inside = distances <= radius_miles * (1 - HAVERSINE_TOLERANCE)
+        borderline = np.flatnonzero(
+            ~inside & (distances <= radius_miles * (1 + HAVERSINE_TOLERANCE)))
+        for i in borderline:
+            position = candidates[i]
+            distances[i] = geodesic(
+                (lat, lon), (self.lat[position], self.lon[position])).miles
+            inside[i] = distances[i] <= radius_miles
+
+        order = np.argsort(distances[inside], kind="stable")
+        return candidates[inside][order], distances[inside][order]
@@ -0,0 +1,297 @@
+import datetime
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from RateLimiter import TokenBucket
+from Config import TOM_TOM_API_KEY, TOM_TOM_API_BASE_URL, TOM_TOM_QPS, TOM_TOM_DAILY_QUOTA, TOM_TOM_POOL_SIZE
+from Config import TOM_TOM_MAX_RETRIES, TOM_TOM_BACKOFF_SECONDS, TOM_TOM_BACKOFF_MAX_SECONDS
+from Config import TOM_TOM_CONNECT_TIMEOUT_SECONDS, TOM_TOM_TIMEOUT_SECONDS, TOM_TOM_BATCH_TIMEOUT_SECONDS
+from Config import TOM_TOM_CIRCUIT_FAILURES, TOM_TOM_CIRCUIT_RESET_SECONDS
+
+# Endpoints of the TomTom APIs we call, with their (connect, read) timeouts in seconds
+GEOCODE = 'geocode'
+BATCH_SEARCH = 'batch_search'
+ROUTE = 'route'
+MATRIX = 'matrix'
+REACHABLE_RANGE = 'reachable_range'
+ENDPOINT_TIMEOUTS = {
+    GEOCODE: (TOM_TOM_CONNECT_TIMEOUT_SECONDS, TOM_TOM_TIMEOUT_SECONDS),
+    BATCH_SEARCH: (TOM_TOM_CONNECT_TIMEOUT_SECONDS, TOM_TOM_BATCH_TIMEOUT_SECONDS),
+    ROUTE: (TOM_TOM_CONNECT_TIMEOUT_SECONDS, TOM_TOM_TIMEOUT_SECONDS),
+    MATRIX: (TOM_TOM_CONNECT_TIMEOUT_SECONDS, TOM_TOM_BATCH_TIMEOUT_SECONDS),
+    REACHABLE_RANGE: (TOM_TOM_CONNECT_TIMEOUT_SECONDS, TOM_TOM_TIMEOUT_SECONDS),
+}
+
+# Responses retried with backoff (rate limited or server errors)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class TomTomQuotaExceeded(requests.exceptions.RequestException):
+    """Raised instead of sending a request once the daily quota is used up."""
+    pass
+
+
+class TomTomCircuitOpen(requests.exceptions.RequestException):
+    """Raised instead of sending a request while an endpoint's circuit breaker is open."""
+    pass
+
+
+class CircuitBreaker:
+    """
+    Stops calling an endpoint after consecutive failures.
+
+    After failure_threshold consecutive failures the circuit opens and requests fail
+    immediately for reset_seconds. A single trial request is then let through: the
+    circuit closes if it succeeds and opens again if it fails.
+    """
+
+    def __init__(self, failure_threshold, reset_seconds):
+        """
+        Args:
+            failure_threshold (int): Consecutive failures opening the circuit (0 disables the breaker).
+            reset_seconds (float): Time the circuit stays open before a trial request.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Returns True if a request may be sent."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_seconds and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def release_trial(self):
+        """Gives up a trial request that was never sent, so another request can take its place."""
+        with self._lock:
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or (self.opened_at is None and 0 < self.failure_threshold <= self.failures):
+                print(f"TomTom circuit opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            return 'half-open' if time.monotonic() - self.opened_at >= self.reset_seconds else 'open'
+
+
+class DailyQuota:
+    """Thread-safe count of the API transactions used today (UTC), against a daily budget."""
+
+    def __init__(self, limit):
+        """
+        Args:
+            limit (int): Transactions allowed per day (0 disables the quota).
+        """
+        self.limit = limit
+        self.day = None
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def consume(self, transactions=1):
+        """
+        Takes transactions from today's budget.
+
+        Raises:
+            TomTomQuotaExceeded: If the budget is used up.
+        """
+        with self._lock:
+            today = datetime.datetime.now(datetime.timezone.utc).date()
+            if today != self.day:
+                self.day, self.used = today, 0
+            if self.limit > 0 and self.used + transactions > self.limit:
+                raise TomTomQuotaExceeded(
+                    f"TomTom daily quota of {self.limit} transactions used up")
+            self.used += transactions
+
+    def stats(self):
+        with self._lock:
+            return {"day": str(self.day) if self.day else None, "used": self.used, "limit": self.limit}
+
+
+class TomTomClient:
+    """
+    Client shared by every TomTom API call.
+
+    Requests go through one pooled keep-alive session, so connections (and their TLS
+    handshakes) are reused across calls and threads. Every attempt waits for the global
+    rate limiter and takes from the daily quota (retries are requests TomTom receives and
+    counts, so they use up transactions too). Request errors, timeouts, 429 and 5xx
+    responses are retried with jittered exponential backoff (honouring Retry-After), and
+    a per-endpoint circuit breaker stops calling an endpoint that keeps failing.
+    """
+
+    def __init__(self, base_url, api_key, qps=0, daily_quota=0, pool_size=10, max_retries=3, backoff_seconds=0.5,
+                 backoff_max_seconds=8, failure_threshold=5, reset_seconds=30, timeouts=None):
+        """
+        Args:
+            base_url (str): Base URL of the TomTom APIs.
+            api_key (str): The TomTom API key, added to every request.
+            qps (float): Requests per second across all threads (0 disables limiting).
+            daily_quota (int): Transactions allowed per day (0 disables the quota).
+            pool_size (int): Connections kept open to the API.
+            max_retries (int): Retries of a failed request.
+            backoff_seconds (float): Backoff before the first retry, doubled for each retry.
+            backoff_max_seconds (float): Largest backoff.
+            failure_threshold (int): Consecutive failures opening an endpoint's circuit breaker.
+            reset_seconds (float): Time an endpoint's circuit stays open before a trial request.
+            timeouts (dict): Endpoint -> (connect, read) timeouts in seconds.
+        """
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.timeouts = timeouts or ENDPOINT_TIMEOUTS
+        self.rate_limiter = TokenBucket(qps)
+        self.quota = DailyQuota(daily_quota)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _breaker(self, endpoint):
+        with self._lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker(
+                    self.failure_threshold, self.reset_seconds)
+            return self._breakers[endpoint]
+
+    def _backoff(self, attempt, response=None):
+        """Seconds to wait before a retry: the Retry-After header if set, else full jitter backoff."""
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max_seconds)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max_seconds, self.backoff_seconds * 2 ** attempt))
+
+    def request(self, method, endpoint, path, params=None, json=None, transactions=1):
+        """
+        Sends a request to a TomTom API.
+
+        Args:
+            method (str): 'GET' or 'POST'.
+            endpoint (str): The endpoint called (GEOCODE, ROUTE, ...), used for timeouts and circuit breaking.
+            path (str): The path after the base URL (already URL encoded).
+            params (dict): Query parameters, the API key is added.
+            json (dict): JSON body.
+            transactions (int): Transactions the request counts for against the daily quota (e.g. batch items).
+
+        Returns:
+            requests.Response: The response (the last one if every retry failed with 429/5xx).
+
+        Raises:
+            TomTomCircuitOpen: If the endpoint's circuit breaker is open.
+            TomTomQuotaExceeded: If the daily quota is used up.
+            requests.exceptions.RequestException: If the last attempt failed without a response.
+        """
+        breaker = self._breaker(endpoint)
+        params = {**(params or {}), "key": self.api_key}
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow():
+                raise TomTomCircuitOpen(
+                    f"TomTom {endpoint} requests suspended after repeated failures")
+            try:
+                # Every attempt sent is a request TomTom counts, retries included
+                self.quota.consume(transactions)
+            except TomTomQuotaExceeded:
+                breaker.release_trial()
+                raise
+            self.rate_limiter.acquire()
+            with self._lock:
+                self.requests += 1
+                if attempt:
+                    self.retries += 1
+
+            response = None
+            try:
+                response = self.session.request(method, f"{self.base_url}{path}", params=params, json=json,
+                                                timeout=self.timeouts.get(endpoint, ENDPOINT_TIMEOUTS[ROUTE]))
+                if response.status_code not in RETRY_STATUS_CODES:
+                    breaker.record_success()
+                    return response
+                error = None
+            except requests.exceptions.RequestException as e:
+                # Connection errors, timeouts, broken responses, redirect loops, ...
+                error = e
+            except Exception:
+                # Not a failure of the endpoint (e.g. invalid arguments), never leave a trial pending
+                breaker.release_trial()
+                raise
+
+            breaker.record_failure()
+            with self._lock:
+                self.failures += 1
+            if attempt == self.max_retries:
+                if error is not None:
+                    raise error
+                return response
+            wait = self._backoff(attempt, response)
+            print(f"TomTom {endpoint} request failed ({error or response.status_code}), retrying in {wait:.2f}s")
+            time.sleep(wait)
+
+    def get(self, endpoint, path, params=None, transactions=1):
+        return self.request('GET', endpoint, path, params=params, transactions=transactions)
+
+    def post(self, endpoint, path, params=None, json=None, transactions=1):
+        return self.request('POST', endpoint, path, params=params, json=json, transactions=transactions)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Request, retry and failure counters, the daily quota usage and the state of each endpoint's circuit.
+        """
+        with self._lock:
+            breakers = dict(self._breakers)
+            counters = {"requests": self.requests,
+                        "retries": self.retries, "failures": self.failures}
+        return {
+            **counters,
+            "quota": self.quota.stats(),
+            "circuits": {endpoint: breaker.state() for endpoint, breaker in breakers.items()},
+        }
+
+
+# Client shared by the geocoding, routing and reachable range calls
+tomtom_client = TomTomClient(
+    TOM_TOM_API_BASE_URL, TOM_TOM_API_KEY,
+    qps=TOM_TOM_QPS,
+    daily_quota=TOM_TOM_DAILY_QUOTA,
+    pool_size=TOM_TOM_POOL_SIZE,
+    max_retries=TOM_TOM_MAX_RETRIES,
+    backoff_seconds=TOM_TOM_BACKOFF_SECONDS,
+    backoff_max_seconds=TOM_TOM_BACKOFF_MAX_SECONDS,
+    failure_threshold=TOM_TOM_CIRCUIT_FAILURES,
+    reset_seconds=TOM_TOM_CIRCUIT_RESET_SECONDS,
+)
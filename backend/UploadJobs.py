@@ -0,0 +1,254 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Job states
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+
+class UploadCancelled(Exception):
+    """Raised inside a job's pipeline when the job was cancelled."""
+    pass
+
+
+class UploadJob:
+    """
+    State and progress of one background upload.
+
+    The pipeline running the job reports progress with update() and calls
+    check_cancelled() between units of work, so a cancel request stops it at the next
+    checkpoint. Before writing anything it calls begin_commit(); from then on the job
+    can no longer be cancelled and always runs to its end.
+    """
+
+    def __init__(self, dataset, kind):
+        """
+        Args:
+            dataset (str): The dataset the upload writes to.
+            kind (str): The kind of upload ('replace' or 'append').
+        """
+        self.id = uuid.uuid4().hex
+        self.dataset = dataset
+        self.kind = kind
+        self.status = JOB_QUEUED
+        self.stage = JOB_QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.rows_total = 0
+        self.rows_processed = 0
+        self.reused = 0
+        self.geocoded = 0
+        self.failed = 0
+        self.result = None
+        self.error = None
+        self.committing = False
+        self._stage_started_at = None
+        self._stage_rows_start = 0
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def update(self, stage=None, **counts):
+        """
+        Records progress.
+
+        Args:
+            stage (str): The pipeline stage now running (e.g. 'geocoding'), if it changed.
+            **counts: New values of rows_total, rows_processed, reused, geocoded and failed.
+        """
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, value)
+            if stage and stage != self.stage:
+                self.stage = stage
+                self._stage_started_at = time.time()
+                self._stage_rows_start = self.rows_processed
+
+    def check_cancelled(self):
+        """Raises UploadCancelled if the job was cancelled."""
+        if self._cancel_event.is_set():
+            raise UploadCancelled(f"Upload job {self.id} was cancelled")
+
+    def begin_commit(self):
+        """
+        Marks the start of the commit, after which cancel requests are refused.
+
+        Raises:
+            UploadCancelled: If the job was cancelled before the commit started.
+        """
+        with self._lock:
+            self.check_cancelled()
+            self.committing = True
+            self.stage = 'committing'
+            self._stage_started_at = time.time()
+            self._stage_rows_start = self.rows_processed
+
+    def cancel(self):
+        """Requests the job to stop. Returns False if the job already finished or started committing."""
+        with self._lock:
+            if self.status in FINISHED_STATES or self.committing:
+                return False
+            self._cancel_event.set()
+            return True
+
+    def eta_seconds(self):
+        """Estimates the remaining time from the progress rate of the current stage, or None if unknown."""
+        if self.status != JOB_RUNNING or not self._stage_started_at:
+            return None
+        done = self.rows_processed - self._stage_rows_start
+        remaining = self.rows_total - self.rows_processed
+        if done <= 0 or remaining < 0:
+            return None
+        return (time.time() - self._stage_started_at) / done * remaining
+
+    def start(self):
+        with self._lock:
+            self.status = JOB_RUNNING
+            self.started_at = time.time()
+
+    def finish(self, status, result=None, error=None):
+        with self._lock:
+            self.status = status
+            self.stage = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: The job's state, progress counters, ETA and result or error.
+        """
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "dataset": self.dataset,
+                "kind": self.kind,
+                "status": self.status,
+                "stage": self.stage,
+                "cancel_requested": self._cancel_event.is_set(),
+                "committing": self.committing,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "rows_total": self.rows_total,
+                "rows_processed": self.rows_processed,
+                "reused": self.reused,
+                "geocoded": self.geocoded,
+                "failed": self.failed,
+                "eta_seconds": self.eta_seconds(),
+                "result": self.result,
+                "error": self.error,
+            }
+
+
+class UploadJobManager:
+    """
+    Runs uploads on a background thread pool.
+
+    Jobs writing to the same dataset are serialized: only one of them is handed to the
+    pool at a time and the others wait in a per-dataset queue (without holding a worker)
+    until it finishes, so concurrent uploads never interleave their reads and writes.
+    Jobs for different datasets run in parallel. A per-dataset lock is also held while
+    a job runs, so other writers (e.g. rollbacks) can detect it. Finished jobs are kept
+    for status queries up to a bounded history.
+    """
+
+    def __init__(self, max_workers, max_finished_jobs=100):
+        """
+        Args:
+            max_workers (int): Number of uploads processed concurrently.
+            max_finished_jobs (int): Number of finished jobs kept for status queries.
+        """
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='upload-job')
+        self._jobs = OrderedDict()
+        self._dataset_locks = {}
+        # Dataset -> jobs waiting for the dataset's running job, present while a job runs
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def dataset_lock(self, dataset):
+        """Returns the lock held while an upload to the dataset runs."""
+        with self._lock:
+            return self._dataset_locks.setdefault(dataset, threading.Lock())
+
+    def submit(self, dataset, kind, pipeline, *args, cleanup=None):
+        """
+        Queues an upload, started once the uploads already queued for its dataset finished.
+
+        Args:
+            dataset (str): The dataset the upload writes to.
+            kind (str): The kind of upload ('replace' or 'append').
+            pipeline (callable): Called with *args and progress=<the UploadJob>; its return value is the job's result.
+            cleanup (callable): Called once the job finished, whatever its outcome (e.g. to remove the spooled upload).
+
+        Returns:
+            UploadJob: The queued job.
+        """
+        job = UploadJob(dataset, kind)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+            if dataset in self._pending:
+                self._pending[dataset].append((job, pipeline, args, cleanup))
+                return job
+            self._pending[dataset] = deque()
+        self._executor.submit(self._run, job, pipeline, args, cleanup)
+        return job
+
+    def _start_next(self, dataset):
+        """Hands the next queued job of a dataset to the pool, once its previous job finished."""
+        with self._lock:
+            pending = self._pending[dataset]
+            if not pending:
+                del self._pending[dataset]
+                return
+            next_job = pending.popleft()
+        self._executor.submit(self._run, *next_job)
+
+    def _run(self, job, pipeline, args, cleanup):
+        try:
+            with self.dataset_lock(job.dataset):
+                job.check_cancelled()
+                job.start()
+                result = pipeline(*args, progress=job)
+            job.finish(JOB_SUCCEEDED, result=result)
+        except UploadCancelled:
+            print(f"Upload job {job.id} cancelled")
+            job.finish(JOB_CANCELLED)
+        except Exception as e:
+            print(f"Upload job {job.id} failed: {e}")
+            traceback.print_exc()
+            job.finish(JOB_FAILED, error=str(e))
+        finally:
+            try:
+                if cleanup:
+                    cleanup()
+            finally:
+                self._start_next(job.dataset)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job.status in FINISHED_STATES]
+        for job_id in finished[:max(len(finished) - self.max_finished_jobs, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """Returns a job, or None if it does not exist (or was pruned)."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        """Returns every known job, oldest first."""
+        with self._lock:
+            return list(self._jobs.values())
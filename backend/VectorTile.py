@@ -0,0 +1,238 @@
+import hashlib
+import os
+import shutil
+import struct
+import threading
+import numpy as np
+from Clustering import lon_to_x, lat_to_y
+from DatasetStore import coordinate_arrays, LON_COLUMN, LAT_COLUMN
+
+# Tile coordinates range from 0 to TILE_EXTENT on each axis
+TILE_EXTENT = 4096
+# Points this far outside a tile (in tile coordinates) are still included so symbols are not cut at tile edges
+TILE_BUFFER = 64
+# Highest zoom level served
+MAX_TILE_ZOOM = 22
+
+# Protocol buffer wire types
+WIRE_VARINT = 0
+WIRE_64BIT = 1
+WIRE_LENGTH_DELIMITED = 2
+# Vector tile geometry type and MoveTo command for a single point
+GEOMETRY_POINT = 1
+MOVE_TO_ONE_POINT = (1 & 0x7) | (1 << 3)
+
+
+def varint(value):
+    """Encodes a non-negative integer as a protocol buffer varint."""
+    encoded = bytearray()
+    while value > 0x7F:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def zigzag(value):
+    """Maps a signed integer to an unsigned one so small negative numbers stay small."""
+    return (value << 1) ^ (value >> 63)
+
+
+def field_key(field, wire_type):
+    return varint((field << 3) | wire_type)
+
+
+def length_delimited(field, payload):
+    return field_key(field, WIRE_LENGTH_DELIMITED) + varint(len(payload)) + payload
+
+
+def encode_value(value):
+    """Encodes a property value as a vector tile Value message."""
+    if isinstance(value, bool):
+        return field_key(7, WIRE_VARINT) + varint(int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return field_key(5, WIRE_VARINT) + varint(value)
+        return field_key(6, WIRE_VARINT) + varint(zigzag(value))
+    if isinstance(value, float):
+        return field_key(3, WIRE_64BIT) + struct.pack('<d', value)
+    return length_delimited(1, str(value).encode('utf-8'))
+
+
+def encode_layer(name, x, y, properties):
+    """
+    Encodes a layer of point features as a vector tile Layer message (version 2).
+
+    Args:
+        name (str): The layer name.
+        x (np.ndarray): Tile x coordinate of each point (integers).
+        y (np.ndarray): Tile y coordinate of each point (integers).
+        properties (list): Properties of each point (None values are omitted).
+
+    Returns:
+        bytes: The encoded layer.
+    """
+    keys, values, features = {}, {}, []
+    for point_x, point_y, point_properties in zip(x.tolist(), y.tolist(), properties):
+        tags = []
+        for key, value in point_properties.items():
+            if value is None:
+                continue
+            # Type is part of the value key so that 1, 1.0 and True stay distinct
+            value_key = (type(value).__name__, value)
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault(value_key, len(values)))
+
+        geometry = varint(MOVE_TO_ONE_POINT) + \
+            varint(zigzag(point_x)) + varint(zigzag(point_y))
+        features.append(length_delimited(2,
+                                         length_delimited(2, b''.join(varint(tag) for tag in tags)) +
+                                         field_key(3, WIRE_VARINT) + varint(GEOMETRY_POINT) +
+                                         length_delimited(4, geometry)))
+
+    return (field_key(15, WIRE_VARINT) + varint(2) +
+            length_delimited(1, name.encode('utf-8')) +
+            b''.join(features) +
+            b''.join(length_delimited(3, key.encode('utf-8')) for key in keys) +
+            b''.join(length_delimited(4, encode_value(value)) for _, value in values) +
+            field_key(5, WIRE_VARINT) + varint(TILE_EXTENT))
+
+
+class VectorTileIndex:
+    """
+    Web Mercator coordinates of a point dataset, sorted by x so the points of a tile are
+    found with a binary search followed by a vectorized test on the candidates.
+    """
+
+    def __init__(self, table):
+        """
+        Args:
+            table (pa.Table): The dataset table (see DatasetStore).
+        """
+        self.table = table
+        lon, lat = coordinate_arrays(table)
+        x, y = lon_to_x(lon), lat_to_y(lat)
+        self.order = np.argsort(x, kind='stable')
+        self.x = x[self.order]
+        self.y = y[self.order]
+
+    def encode_tile(self, layer, zoom, tile_x, tile_y, fields):
+        """
+        Encodes the points of a tile, clipped to the tile (plus TILE_BUFFER) and quantized to TILE_EXTENT.
+
+        Args:
+            layer (str): The layer name.
+            zoom (int): The tile zoom level.
+            tile_x (int): The tile column.
+            tile_y (int): The tile row.
+            fields (list): Properties included in the features.
+
+        Returns:
+            bytes: The Mapbox Vector Tile (empty if no points fall in the tile).
+        """
+        scale = 2 ** zoom * TILE_EXTENT
+        buffer = TILE_BUFFER / scale
+        x0, y0 = tile_x / 2 ** zoom, tile_y / 2 ** zoom
+        x1, y1 = (tile_x + 1) / 2 ** zoom, (tile_y + 1) / 2 ** zoom
+
+        start, end = np.searchsorted(self.x, [x0 - buffer, x1 + buffer])
+        candidates = np.arange(start, end)
+        candidates = candidates[(self.y[candidates] >= y0 - buffer) & (
+            self.y[candidates] < y1 + buffer)]
+        if len(candidates) == 0:
+            return b''
+
+        point_x = np.floor((self.x[candidates] - x0) * scale).astype(np.int64)
+        point_y = np.floor((self.y[candidates] - y0) * scale).astype(np.int64)
+        properties = self.table.take(self.order[candidates]).select(
+            fields).to_pylist()
+        return length_delimited(3, encode_layer(layer, point_x, point_y, properties))
+
+
+def fields_key(fields):
+    """Short identifier of a property selection, used in cache keys and paths."""
+    return hashlib.sha1(','.join(fields).encode('utf-8')).hexdigest()[:12]
+
+
+def property_fields(table):
+    """Returns the names of a dataset table's property columns."""
+    return [name for name in table.column_names if name not in (LON_COLUMN, LAT_COLUMN)]
+
+
+class TileDiskCache:
+    """
+    Encoded tiles stored on disk under <root>/<layer>/<fingerprint>/<fields>/<z>/<x>/<y>.mvt.
+
+    The fingerprint identifies the dataset contents, so tiles survive restarts and are
+    never served for another version of the dataset. The first time a tile of a new
+    fingerprint is written, the tiles of fingerprints that are no longer retained are
+    removed; tiles of retained versions are kept, so requests alternating between two
+    versions (e.g. around a rollback) never rebuild them.
+    """
+
+    def __init__(self, root, retained_fingerprints=None):
+        """
+        Args:
+            root (str): The cache directory.
+            retained_fingerprints (callable): Returns the fingerprints still retained for a
+                layer, whose tiles are kept (by default only the newest fingerprint is kept).
+        """
+        self.root = root
+        self.retained_fingerprints = retained_fingerprints
+        self.hits = 0
+        self.misses = 0
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def _path(self, layer, fingerprint, fields, zoom, tile_x, tile_y):
+        return os.path.join(self.root, layer, fingerprint, fields_key(fields), str(zoom), str(tile_x), f"{tile_y}.mvt")
+
+    def get(self, layer, fingerprint, fields, zoom, tile_x, tile_y):
+        """Returns a stored tile, or None if it is not cached."""
+        try:
+            with open(self._path(layer, fingerprint, fields, zoom, tile_x, tile_y), 'rb') as file:
+                tile = file.read()
+            self.hits += 1
+            return tile
+        except OSError:
+            self.misses += 1
+            return None
+
+    def set(self, layer, fingerprint, fields, zoom, tile_x, tile_y, tile):
+        """Atomically stores a tile."""
+        with self._lock:
+            seen = self._seen.setdefault(layer, set())
+            if fingerprint not in seen:
+                keep = {fingerprint}
+                if self.retained_fingerprints:
+                    keep |= set(self.retained_fingerprints(layer))
+                self._prune(layer, keep)
+                seen.add(fingerprint)
+
+        path = self._path(layer, fingerprint, fields, zoom, tile_x, tile_y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(tile)
+        os.replace(temp_path, path)
+
+    def _prune(self, layer, keep):
+        layer_dir = os.path.join(self.root, layer)
+        if not os.path.isdir(layer_dir):
+            return
+        for name in os.listdir(layer_dir):
+            if name not in keep:
+                print(f"Removing stale tiles {os.path.join(layer_dir, name)}")
+                shutil.rmtree(os.path.join(layer_dir, name), ignore_errors=True)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit/miss counters.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0,
+        }
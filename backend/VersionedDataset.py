@@ -0,0 +1,277 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from DatasetStore import read_table, write_table, concat_tables
+
+HEAD_FILE = 'HEAD'
+
+
+def manifest_name(version):
+    return f"manifest-{version:06d}.json"
+
+
+def segment_name(version):
+    return f"segment-{version:06d}.arrow"
+
+
+def row_keys(table):
+    """
+    Returns a key identifying the content of every row of a table (a hash of all of its
+    values, with an occurrence counter so identical rows get distinct keys).
+    """
+    if table.num_rows == 0:
+        return np.empty(0, dtype=object)
+    frame = pd.DataFrame({name: table.column(name).to_pylist()
+                         for name in sorted(table.column_names)}, dtype=object)
+    hashes = pd.util.hash_pandas_object(frame.astype(str), index=False)
+    occurrence = hashes.groupby(hashes).cumcount()
+    return (hashes.astype(str) + ':' + occurrence.astype(str)).to_numpy()
+
+
+class VersionedDataset:
+    """
+    A dataset stored as immutable, versioned snapshots in a directory.
+
+    Every commit writes the rows it adds as a new Arrow segment and a manifest listing the
+    segments of the version (and, per segment, the rows it no longer contains), then
+    atomically moves the HEAD pointer to the new version. Unchanged rows are shared with
+    the previous versions, so a replace only stores the rows that changed and an append
+    only the appended rows. Files of a committed version are never modified: readers keep
+    a consistent snapshot while a commit is in progress, and rolling back only rewrites
+    HEAD. Only the latest versions are retained, their unreferenced segments are removed.
+    """
+
+    def __init__(self, directory, retention=10, max_segments=8):
+        """
+        Args:
+            directory (str): The directory holding the dataset's segments and manifests.
+            retention (int): Number of versions kept for rollback.
+            max_segments (int): Versions made of more segments are compacted into a single segment.
+        """
+        self.directory = directory
+        self.retention = max(retention, 1)
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _write_json(self, name, data):
+        temp_path = self._path(f"{name}.tmp")
+        with open(temp_path, 'w') as file:
+            json.dump(data, file)
+        os.replace(temp_path, self._path(name))
+
+    def head(self):
+        """Returns the current version number, or None if nothing was committed yet."""
+        try:
+            with open(self._path(HEAD_FILE)) as file:
+                return int(file.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def manifest(self, version):
+        """Returns the manifest of a version (its segments, row count, kind and creation time)."""
+        with open(self._path(manifest_name(version))) as file:
+            return json.load(file)
+
+    def manifest_path(self, version):
+        return self._path(manifest_name(version))
+
+    def fingerprint(self, version):
+        """
+        Returns an identifier of a version's contents (a hash of its manifest, which lists its
+        segments and creation time). Unlike version numbers, it is never shared by two
+        versions, even if the directory is deleted and the numbering restarts.
+        """
+        with open(self.manifest_path(version), 'rb') as file:
+            return hashlib.sha1(file.read()).hexdigest()[:16]
+
+    def versions(self):
+        """Returns the retained version numbers, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(int(name[len('manifest-'):-len('.json')]) for name in os.listdir(self.directory)
+                      if name.startswith('manifest-') and name.endswith('.json'))
+
+    def read(self, version=None):
+        """
+        Reads a version (HEAD by default). Segments are memory mapped; only segments with
+        removed rows are copied when filtering them.
+
+        Returns:
+            pa.Table: The version's rows.
+        """
+        return self._read_segments(self.manifest(self.head() if version is None else version)["segments"])
+
+    def _read_segments(self, segments):
+        tables = []
+        for segment in segments:
+            table = read_table(self._path(segment["file"]))
+            if segment["deleted"]:
+                mask = np.ones(table.num_rows, dtype=bool)
+                mask[segment["deleted"]] = False
+                table = table.filter(pa.array(mask))
+            tables.append(table)
+        if not tables:
+            return None
+
+        table = tables[0]
+        for other in tables[1:]:
+            if other.schema.equals(table.schema):
+                table = pa.concat_tables([table, other])
+            else:
+                table = concat_tables(table, other)
+        return table
+
+    def _commit(self, kind, segments, new_rows):
+        """Writes the new rows' segment and the version's manifest, then moves HEAD to it."""
+        os.makedirs(self.directory, exist_ok=True)
+        existing = self.versions()
+        version = (existing[-1] if existing else 0) + 1
+        parent = self.head()
+
+        if segments and len(segments) + 1 > self.max_segments:
+            # Too many segments to read efficiently, store the version as a single segment
+            new_rows = self._compact(segments, new_rows)
+            segments = []
+        # Segments are never overwritten, readers may still have them memory mapped
+        if new_rows is not None and (new_rows.num_rows or not segments):
+            write_table(self._path(segment_name(version)), new_rows)
+            segments = segments + \
+                [{"file": segment_name(version), "deleted": []}]
+
+        rows = sum(self._segment_rows(segment) for segment in segments)
+        self._write_json(manifest_name(version), {
+            "version": version,
+            "parent": parent,
+            "kind": kind,
+            "created_at": time.time(),
+            "rows": rows,
+            "segments": segments,
+        })
+        self._write_json(HEAD_FILE, version)
+        self._prune()
+        return version
+
+    def _compact(self, segments, new_rows):
+        table = self._read_segments(segments)
+        if new_rows is None or not new_rows.num_rows:
+            return table
+        if new_rows.schema.equals(table.schema):
+            return pa.concat_tables([table, new_rows])
+        return concat_tables(table, new_rows)
+
+    def _segment_rows(self, segment):
+        with pa.memory_map(self._path(segment["file"]), 'r') as source:
+            rows = pa.ipc.open_file(source).read_all().num_rows
+        return rows - len(segment["deleted"])
+
+    def _head_segments(self):
+        head = self.head()
+        return self.manifest(head)["segments"] if head is not None else []
+
+    def commit_table(self, table, kind='import'):
+        """
+        Commits a full snapshot stored as a single segment.
+
+        Returns:
+            int: The new version number.
+        """
+        with self._lock:
+            return self._commit(kind, [], table)
+
+    def commit_append(self, table, kind='append'):
+        """
+        Commits the HEAD version plus the given rows, storing only the new rows. Appending
+        no rows commits nothing.
+
+        Returns:
+            int: The new version number (the HEAD version if no rows were given).
+        """
+        with self._lock:
+            head = self.head()
+            if head is not None and (table is None or table.num_rows == 0):
+                return head
+            return self._commit(kind, self._head_segments(), table)
+
+    def commit_replace(self, table, kind='replace'):
+        """
+        Commits a new content for the dataset, storing only the rows that are not already
+        part of the HEAD version. Rows of HEAD missing from the new content are recorded
+        as removed from their segment. Nothing is committed if the content is unchanged,
+        so re-uploading the same data keeps the rollback history (and every cache keyed by
+        the version) intact.
+
+        Returns:
+            int: The new version number (the HEAD version if the content is unchanged).
+        """
+        with self._lock:
+            segments = self._head_segments()
+            if not segments:
+                return self._commit(kind, [], table)
+
+            new_keys = row_keys(table)
+            new_key_set = set(new_keys)
+            kept_keys = set()
+            delta_segments = []
+            for segment in segments:
+                stored = read_table(self._path(segment["file"]))
+                deleted = set(segment["deleted"])
+                mask = np.ones(stored.num_rows, dtype=bool)
+                mask[segment["deleted"]] = False
+                visible = np.flatnonzero(mask)
+                keys = row_keys(stored.take(visible)) if len(
+                    visible) else np.empty(0, dtype=object)
+                removed = [int(row) for row, key in zip(visible, keys)
+                           if key not in new_key_set or key in kept_keys]
+                kept_keys.update(key for key in keys if key in new_key_set)
+                delta_segments.append({"file": segment["file"], "deleted": sorted(
+                    deleted.union(removed))})
+
+            added = np.array([key not in kept_keys for key in new_keys], dtype=bool)
+            if not added.any() and all(delta["deleted"] == sorted(segment["deleted"])
+                                       for delta, segment in zip(delta_segments, segments)):
+                return self.head()
+            kept_rows = len(new_keys) - int(added.sum())
+            if kept_rows < len(new_keys) / 2:
+                # Mostly new content, a full snapshot is smaller and faster to read
+                return self._commit(kind, [], table)
+            return self._commit(kind, [segment for segment in delta_segments
+                                       if self._segment_rows(segment) > 0], table.filter(pa.array(added)))
+
+    def rollback(self, version):
+        """
+        Makes a retained version the HEAD version again (only HEAD is rewritten).
+
+        Raises:
+            ValueError: If the version is not retained.
+        """
+        with self._lock:
+            if version not in self.versions():
+                raise ValueError(f"Unknown version: {version}")
+            self._write_json(HEAD_FILE, version)
+
+    def _prune(self):
+        """Removes the versions beyond the retention limit and the segments they alone referenced."""
+        versions = self.versions()
+        head = self.head()
+        retained = set(versions[-self.retention:]) | {head}
+        for version in versions:
+            if version not in retained:
+                os.remove(self._path(manifest_name(version)))
+
+        referenced = {segment["file"] for version in retained if version is not None
+                      for segment in self.manifest(version)["segments"]}
+        for name in os.listdir(self.directory):
+            if name.startswith('segment-') and name.endswith('.arrow') and name not in referenced:
+                try:
+                    os.remove(self._path(name))
+                except OSError as e:
+                    # Still memory mapped by a reader on some platforms, removed by a later commit
+                    print(f"Could not remove {name}: {e}")
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+from CSVToGeoJSON import classify_location_rows, ROW_UNCHANGED, ROW_MOVED, ROW_NEW
+
+
+def rows(*values):
+    return pd.DataFrame([{"id": id_value, "address_one": address, "city": "Town", "zipcode": zipcode}
+                         for id_value, address, zipcode in values])
+
+
+def test_rows_are_classified_against_the_previous_upload():
+    old_df = rows(("a", "1 Main St", "12345"), ("b", "2 Main St", "12345"), ("c", "3 Main St", "12345"))
+    new_df = rows(("a", "1 Main St", "12345"), ("b", "9 Side St", "12345"), ("d", "4 Main St", "12345"))
+    feature_index = {"a": {}, "b": {}, "c": {}}
+
+    assert classify_location_rows(new_df, old_df, feature_index, "id") == [ROW_UNCHANGED, ROW_MOVED, ROW_NEW]
+
+
+def test_unchanged_row_without_stored_feature_is_new():
+    old_df = rows(("a", "1 Main St", "12345"))
+    assert classify_location_rows(old_df.copy(), old_df, {}, "id") == [ROW_NEW]
+
+
+def test_missing_values_and_columns_compare_as_empty():
+    old_df = pd.DataFrame([{"id": "a", "address_one": "1 Main St", "address_two": None}])
+    new_df = pd.DataFrame([{"id": "a", "address_one": "1 Main St", "address_two": np.nan, "country": ""}])
+    assert classify_location_rows(new_df, old_df, {"a": {}}, "id") == [ROW_UNCHANGED]
+
+
+def test_integral_floats_match_their_integer_text():
+    # A zipcode column with missing values is read as float
+    old_df = rows(("a", "1 Main St", "12345"), ("b", "2 Main St", None))
+    new_df = rows(("a", "1 Main St", 12345.0), ("b", "2 Main St", np.nan))
+    assert classify_location_rows(new_df, old_df, {"a": {}, "b": {}}, "id") == [ROW_UNCHANGED, ROW_UNCHANGED]
+
+
+def test_first_stored_row_of_an_id_is_compared():
+    old_df = rows(("a", "1 Main St", "12345"), ("a", "9 Side St", "12345"))
+    new_df = rows(("a", "1 Main St", "12345"))
+    assert classify_location_rows(new_df, old_df, {"a": {}}, "id") == [ROW_UNCHANGED]
+
+
+def test_every_row_is_new_without_previous_upload():
+    new_df = rows(("a", "1 Main St", "12345"), ("b", "2 Main St", "12345"))
+    assert classify_location_rows(new_df, None, {}, "id") == [ROW_NEW, ROW_NEW]
@@ -0,0 +1,111 @@
+import pytest
+import Cache
+from Cache import PersistentCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(Cache.time, 'time', clock)
+    return clock
+
+
+def test_get_and_set_round_trip_json(tmp_path):
+    cache = PersistentCache(str(tmp_path / 'cache.sqlite3'), 'entries')
+    cache.set('key', {"lat": 1.5, "lon": [2, 3]})
+
+    assert cache.get('key') == {"lat": 1.5, "lon": [2, 3]}
+    assert cache.get('missing', 'default') == 'default'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    PersistentCache(path, 'entries').set('key', 1)
+    assert PersistentCache(path, 'entries').get('key') == 1
+    assert PersistentCache(path, 'other').get('key') is None
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = PersistentCache(str(tmp_path / 'cache.sqlite3'), 'entries', ttl_seconds=60)
+    cache.set('key', 'value')
+
+    clock.now += 60
+    assert cache.get('key') == 'value'
+    clock.now += 1
+    assert cache.get('key') is None
+    assert cache.evictions == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_purge_expired(tmp_path, clock):
+    cache = PersistentCache(str(tmp_path / 'cache.sqlite3'), 'entries', ttl_seconds=60)
+    cache.set('old', 1)
+    clock.now += 30
+    cache.set('new', 2)
+    clock.now += 31
+
+    assert cache.purge_expired() == 1
+    assert cache.get('new') == 2
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = PersistentCache(str(tmp_path / 'cache.sqlite3'), 'entries', max_entries=2)
+    cache.set('a', 1)
+    clock.now += 1
+    cache.set('b', 2)
+    clock.now += 1
+    # Reading 'a' makes 'b' the least recently used entry
+    assert cache.get('a') == 1
+    clock.now += 1
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()["entries"] == 2
+
+
+def accessed_at(cache, key):
+    return cache._connection().execute(
+        "SELECT accessed_at FROM entries WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_unbounded_cache_does_not_track_access_times(tmp_path, clock):
+    cache = PersistentCache(str(tmp_path / 'cache.sqlite3'), 'entries')
+    cache.set('key', 1)
+    clock.now += 10
+
+    assert cache.get('key') == 1
+    cache.flush()
+    assert accessed_at(cache, 'key') == 1000.0
+
+
+def test_access_times_are_written_in_batches(tmp_path, clock):
+    cache = PersistentCache(str(tmp_path / 'cache.sqlite3'), 'entries', max_entries=10,
+                            access_flush_interval=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    clock.now += 10
+
+    cache.get('a')
+    assert accessed_at(cache, 'a') == 1000.0
+    cache.get('b')
+    assert (accessed_at(cache, 'a'), accessed_at(cache, 'b')) == (1010.0, 1010.0)
+
+    clock.now += 10
+    cache.get('a')
+    cache.flush()
+    assert accessed_at(cache, 'a') == 1020.0
+
+
+def test_invalid_table_name(tmp_path):
+    with pytest.raises(ValueError):
+        PersistentCache(str(tmp_path / 'cache.sqlite3'), 'entries; DROP TABLE x')
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from Clustering import ClusterIndex, MAX_CLUSTER_ZOOM, bbox_mask, lat_to_y, lon_to_x, x_to_lon, y_to_lat
+from DatasetStore import geojson_to_table
+
+WORLD = (-180.0, -85.0, 180.0, 85.0)
+
+
+def points_table(coordinates):
+    return geojson_to_table({
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                "properties": {"id": str(i)}
+            }
+            for i, (lon, lat) in enumerate(coordinates)
+        ]
+    })
+
+
+def clusters(features):
+    return [feature for feature in features if feature["properties"].get("cluster")]
+
+
+@pytest.fixture
+def index():
+    # Two groups of points, around Philadelphia and around Denver
+    rng = np.random.default_rng(0)
+    philadelphia = np.column_stack([rng.uniform(-75.2, -75.1, 30), rng.uniform(39.9, 40.0, 30)])
+    denver = np.column_stack([rng.uniform(-105.0, -104.9, 20), rng.uniform(39.7, 39.8, 20)])
+    return ClusterIndex(points_table(np.vstack([philadelphia, denver]).tolist()))
+
+
+def test_projection_round_trips():
+    lon, lat = np.array([-75.16, 0.0, 179.0]), np.array([39.95, 0.0, -60.0])
+    assert np.allclose(x_to_lon(lon_to_x(lon)), lon)
+    assert np.allclose(y_to_lat(lat_to_y(lat)), lat)
+
+
+def test_bbox_mask_crossing_the_antimeridian():
+    lon, lat = np.array([179.5, -179.5, 0.0]), np.array([0.0, 0.0, 0.0])
+    assert bbox_mask(lon, lat, (179.0, -1.0, -179.0, 1.0)).tolist() == [True, True, False]
+
+
+def test_low_zoom_groups_points_into_clusters(index):
+    features = index.get_clusters(WORLD, 3)
+
+    assert sorted(feature["properties"]["point_count"] for feature in clusters(features)) == [20, 30]
+    assert len(features) == 2
+
+
+def test_clusters_are_limited_to_the_bbox(index):
+    features = index.get_clusters((-80.0, 35.0, -70.0, 45.0), 3)
+
+    assert [feature["properties"]["point_count"] for feature in features] == [30]
+
+
+def test_above_max_zoom_points_are_returned_individually(index):
+    features = index.get_clusters(WORLD, MAX_CLUSTER_ZOOM + 1)
+
+    assert len(features) == 50
+    assert not clusters(features)
+    assert {feature["properties"]["id"] for feature in features} == {str(i) for i in range(50)}
+
+
+def test_children_split_the_cluster_points(index):
+    cluster = clusters(index.get_clusters(WORLD, 3))[0]
+    cluster_id = cluster["properties"]["cluster_id"]
+
+    children = index.get_children(cluster_id)
+
+    counts = [feature["properties"].get("point_count", 1) for feature in children["features"]]
+    assert sum(counts) == cluster["properties"]["point_count"]
+    assert children["expansion_zoom"] == index.get_expansion_zoom(cluster_id)
+
+
+def test_expansion_zoom_is_the_first_zoom_with_several_children():
+    index = ClusterIndex(points_table([[-75.0, 40.0], [-75.001, 40.0]]))
+    cluster_id = clusters(index.get_clusters(WORLD, 0))[0]["properties"]["cluster_id"]
+
+    expansion_zoom = index.get_expansion_zoom(cluster_id)
+
+    assert len(clusters(index.get_clusters(WORLD, expansion_zoom - 1))) == 1
+    assert not clusters(index.get_clusters(WORLD, expansion_zoom))
+
+
+def test_last_level_clusters_expand_into_their_points():
+    index = ClusterIndex(points_table([[-75.0, 40.0], [-75.0, 40.0]]))
+    cluster_id = clusters(index.get_clusters(WORLD, MAX_CLUSTER_ZOOM))[0]["properties"]["cluster_id"]
+
+    children = index.get_children(cluster_id)
+
+    assert children["expansion_zoom"] == MAX_CLUSTER_ZOOM + 1
+    assert sorted(feature["properties"]["id"] for feature in children["features"]) == ["0", "1"]
+
+
+def test_unknown_cluster_id(index):
+    with pytest.raises(ValueError):
+        index.get_children(12345 * 32 + 3)
+
+
+def test_empty_dataset():
+    assert ClusterIndex(points_table([])).get_clusters(WORLD, 5) == []
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from DatasetStore import geojson_to_table
+from FeatureQuery import query_features, sort_ranks, encode_cursor, MAX_PAGE_SIZE
+
+
+@pytest.fixture
+def table():
+    names = ["delta", "Alpha", None, "charlie", "bravo", "alpha"]
+    return geojson_to_table({
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [-75.0 + i, 40.0]},
+                "properties": {"id": str(i), "name": name, "score": 10 - i}
+            }
+            for i, name in enumerate(names)
+        ]
+    })
+
+
+def names(page):
+    return [feature["properties"]["name"] for feature in page["features"]]
+
+
+def test_text_ranks_are_case_insensitive_with_missing_values_last():
+    ranks = sort_ranks(np.array(["b", None, "A", "a"], dtype=object))
+    # Ties keep the dataset order
+    assert ranks.tolist() == [2, 3, 0, 1]
+
+
+def test_numeric_ranks_are_numeric():
+    ranks = sort_ranks(np.array(["10", 9, None, "2.5"], dtype=object))
+    assert ranks.tolist() == [2, 1, 3, 0]
+
+
+def test_pages_cover_every_feature_in_order(table):
+    ranks = sort_ranks(np.array(table.column("name").to_pylist(), dtype=object))
+    positions = np.arange(table.num_rows)
+
+    pages, cursor = [], None
+    while True:
+        page = query_features(table, positions, ranks, 1, "name", limit=4, cursor=cursor)
+        pages.append(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [len(page["features"]) for page in pages] == [4, 2]
+    assert all(page["total"] == 6 for page in pages)
+    assert sum((names(page) for page in pages), []) == ["Alpha", "alpha", "bravo", "charlie", "delta", None]
+
+
+def test_only_the_given_positions_are_returned(table):
+    ranks = sort_ranks(np.array(table.column("score").to_pylist(), dtype=object))
+
+    page = query_features(table, np.array([0, 2, 4]), ranks, 1, "score")
+
+    assert page["total"] == 3
+    assert [feature["properties"]["id"] for feature in page["features"]] == ["4", "2", "0"]
+    assert page["features"][0]["geometry"]["coordinates"] == [-71.0, 40.0]
+    assert page["next_cursor"] is None
+
+
+def test_fields_are_projected(table):
+    ranks = sort_ranks(np.arange(table.num_rows))
+
+    page = query_features(table, np.arange(2), ranks, 1, "id", fields=["name"])
+
+    assert [feature["properties"] for feature in page["features"]] == [{"name": "delta"}, {"name": "Alpha"}]
+    with pytest.raises(ValueError):
+        query_features(table, np.arange(2), ranks, 1, "id", fields=["missing"])
+
+
+@pytest.mark.parametrize("limit", [0, MAX_PAGE_SIZE + 1])
+def test_invalid_limit(table, limit):
+    with pytest.raises(ValueError):
+        query_features(table, np.arange(2), sort_ranks(np.arange(table.num_rows)), 1, "id", limit=limit)
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", encode_cursor(2, "id", 1), encode_cursor(1, "name", 1)])
+def test_invalid_cursor(table, cursor):
+    # Malformed, issued for another version of the dataset, or for another sort order
+    with pytest.raises(ValueError):
+        query_features(table, np.arange(2), sort_ranks(np.arange(table.num_rows)), 1, "id", cursor=cursor)
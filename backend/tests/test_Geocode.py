@@ -0,0 +1,129 @@
+import random
+import threading
+import time
+import pytest
+import requests
+import Geocode
+from Cache import PersistentCache
+from Geocode import geocode_addresses, geocode_batch
+from TomTomClient import TomTomCircuitOpen, TomTomQuotaExceeded
+
+
+def stub_geocode(address):
+    """Geocodes 'address <n>' to (n, -n) after a random delay, so results complete out of order."""
+    time.sleep(random.uniform(0, 0.01))
+    number = int(address.split()[-1])
+    return number, -number
+
+
+def test_results_are_in_input_order():
+    addresses = [f"address {i}" for i in range(50)]
+    assert geocode_addresses(addresses, geocode_func=stub_geocode, max_workers=8) == \
+        [(i, -i) for i in range(50)]
+
+
+def test_failed_addresses_give_none_rows():
+    def geocode(address):
+        if address.endswith(('3', '7')):
+            raise RuntimeError("geocoding failed")
+        return stub_geocode(address)
+
+    locations = geocode_addresses([f"address {i}" for i in range(10)], geocode_func=geocode, max_workers=4)
+
+    assert [location is None for location in locations] == [i in (3, 7) for i in range(10)]
+    assert locations[5] == (5, -5)
+
+
+def test_single_worker_geocodes_sequentially():
+    threads = set()
+
+    def geocode(address):
+        threads.add(threading.get_ident())
+        return stub_geocode(address)
+
+    assert geocode_addresses(["a 1", "a 2", "a 3"], geocode_func=geocode, max_workers=1) == [(1, -1), (2, -2), (3, -3)]
+    assert threads == {threading.get_ident()}
+
+
+def test_empty_input():
+    assert geocode_addresses([], geocode_func=stub_geocode) == []
+
+
+@pytest.mark.parametrize("error", [TomTomCircuitOpen, TomTomQuotaExceeded])
+def test_unavailable_api_fails_the_run(error):
+    def geocode(address):
+        raise error("unavailable")
+
+    with pytest.raises(error):
+        geocode_addresses(["a 1", "a 2"], geocode_func=geocode, max_workers=2)
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+def batch_item(status_code, lat=None, lon=None):
+    results = [{"position": {"lat": lat, "lon": lon}}] if lat is not None else []
+    return {"statusCode": status_code, "response": {"results": results}}
+
+
+@pytest.fixture
+def batch_geocoder(monkeypatch, tmp_path):
+    """Replaces the cache, rate limiter and single address geocoder used by geocode_batch."""
+    single_requests = []
+
+    def geocode_address(address):
+        single_requests.append(address)
+        return stub_geocode(address)
+
+    monkeypatch.setattr(Geocode, 'geocode_cache', PersistentCache(str(tmp_path / 'cache.sqlite3'), 'geocode'))
+    monkeypatch.setattr(Geocode.geocode_rate_limiter, 'acquire', lambda *args, **kwargs: None)
+    monkeypatch.setattr(Geocode, 'geocode_address', geocode_address)
+    return single_requests
+
+
+def test_batch_results_are_cached(monkeypatch, batch_geocoder):
+    response = FakeResponse({"batchItems": [batch_item(200, 1.5, 2.5), batch_item(200)]})
+    monkeypatch.setattr(Geocode.tomtom_client, 'post', lambda *args, **kwargs: response)
+
+    assert geocode_batch(["1 Main St", "Nowhere 2"]) == [(1.5, 2.5), None]
+    assert batch_geocoder == []
+    assert Geocode.geocode_cache.get(Geocode.normalize_address("1 Main St")) == [1.5, 2.5]
+
+
+def test_failed_batch_items_fall_back_to_single_requests(monkeypatch, batch_geocoder):
+    # The third item is missing from the response
+    response = FakeResponse({"batchItems": [batch_item(200, 1.5, 2.5), batch_item(500)]})
+    monkeypatch.setattr(Geocode.tomtom_client, 'post', lambda *args, **kwargs: response)
+
+    assert geocode_batch(["a 1", "a 2", "a 3"]) == [(1.5, 2.5), (2, -2), (3, -3)]
+    assert batch_geocoder == ["a 2", "a 3"]
+
+
+@pytest.mark.parametrize("error", [requests.exceptions.ConnectionError, TomTomCircuitOpen])
+def test_failed_batch_request_falls_back_to_single_requests(monkeypatch, batch_geocoder, error):
+    def post(*args, **kwargs):
+        raise error("batch endpoint unavailable")
+
+    monkeypatch.setattr(Geocode.tomtom_client, 'post', post)
+
+    assert geocode_batch(["a 1", "a 2"]) == [(1, -1), (2, -2)]
+    assert batch_geocoder == ["a 1", "a 2"]
+
+
+def test_batch_quota_exceeded_is_raised(monkeypatch, batch_geocoder):
+    def post(*args, **kwargs):
+        raise TomTomQuotaExceeded("quota used up")
+
+    monkeypatch.setattr(Geocode.tomtom_client, 'post', post)
+
+    with pytest.raises(TomTomQuotaExceeded):
+        geocode_batch(["a 1"])
+    assert batch_geocoder == []
@@ -0,0 +1,85 @@
+import pytest
+import Heatmap
+from DatasetStore import geojson_to_table
+from Heatmap import HeatmapIndex, covering_tiles, get_heatmap, HEATMAP_MAX_TILES
+
+WORLD = (-180.0, -85.0, 180.0, 85.0)
+
+
+def points_table(points):
+    return geojson_to_table({
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                "properties": {"weight": weight}
+            }
+            for lon, lat, weight in points
+        ]
+    })
+
+
+@pytest.fixture(autouse=True)
+def empty_tile_cache():
+    Heatmap.heatmap_tile_cache.clear()
+
+
+@pytest.fixture
+def index():
+    return HeatmapIndex(points_table([
+        (-75.16, 39.95, 2), (-75.16, 39.95, "3"), (-104.99, 39.74, None), (151.2, -33.87, 1)]))
+
+
+def test_covering_tiles():
+    assert covering_tiles(WORLD, 0) == [(0, 0)]
+    assert sorted(covering_tiles((-10.0, -10.0, 10.0, 10.0), 1)) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+    # Crossing the antimeridian covers both edges of the map
+    assert sorted(covering_tiles((170.0, 10.0, -170.0, 20.0), 2)) == [(0, 1), (3, 1)]
+
+
+def test_tile_density_counts_points(index):
+    grid = index.tile_density(0, 0, 0)
+
+    assert grid.sum() == 4
+    assert grid.max() == 2
+    # Points outside the tile are not counted
+    assert index.tile_density(1, 1, 1).sum() == 1
+
+
+def test_weights_are_summed(index):
+    # Missing or non-numeric weights count as 0, numeric strings are parsed
+    assert index.tile_density(0, 0, 0, 'weight').sum() == 6
+
+
+def test_unknown_weight_property(index):
+    with pytest.raises(ValueError):
+        index.weights('missing')
+
+
+def test_heatmap_cells(index):
+    heatmap = get_heatmap(index, 'customers', 1, WORLD, 0)
+
+    assert heatmap["zoom"] == 0
+    assert heatmap["max"] == 2
+    assert sum(cell[2] for cell in heatmap["cells"]) == 4
+    assert heatmap["cell_size"] == pytest.approx(360.0 / 32)
+    # Cells are centered on the aggregated points
+    lon, lat, _ = max(heatmap["cells"], key=lambda cell: cell[2])
+    assert abs(lon - -75.16) <= heatmap["cell_size"] and abs(lat - 39.95) <= heatmap["cell_size"]
+
+
+def test_large_viewports_are_aggregated_at_a_lower_zoom(index):
+    heatmap = get_heatmap(index, 'customers', 1, WORLD, 10)
+
+    assert len(covering_tiles(WORLD, heatmap["zoom"])) <= HEATMAP_MAX_TILES
+    assert sum(cell[2] for cell in heatmap["cells"]) == 4
+
+
+def test_tiles_are_cached_per_version(index):
+    get_heatmap(index, 'customers', 1, WORLD, 0)
+    other_index = HeatmapIndex(points_table([(0.0, 0.0, 1)]))
+
+    # Same version: the cached grid is reused
+    assert sum(cell[2] for cell in get_heatmap(other_index, 'customers', 1, WORLD, 0)["cells"]) == 4
+    assert sum(cell[2] for cell in get_heatmap(other_index, 'customers', 2, WORLD, 0)["cells"]) == 1
@@ -0,0 +1,87 @@
+import gzip
+import json
+import pytest
+from flask import Flask
+import MapUpload
+from FeatureStore import FeatureStore, TECHNICIANS
+
+
+def technicians_geojson(count):
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [-75.0 + i * 0.01, 40.0 + i * 0.01]},
+                "properties": {"id": f"T{i}", "name": f"Technician {i}"}
+            }
+            for i in range(count)
+        ]
+    }
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    store = FeatureStore({TECHNICIANS: str(tmp_path / 'technicians')})
+    store.save(TECHNICIANS, technicians_geojson(3))
+    monkeypatch.setattr(MapUpload, 'feature_store', store)
+    return store
+
+
+@pytest.fixture
+def client(store):
+    app = Flask(__name__)
+    app.register_blueprint(MapUpload.map_bp, url_prefix='/map')
+    return app.test_client()
+
+
+def get_technicians(client, **headers):
+    return client.get('/map/get-technicians-geojson', headers=headers)
+
+
+def test_geojson_is_gzipped_when_accepted(client):
+    response = get_technicians(client, **{'Accept-Encoding': 'br, gzip'})
+
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert len(json.loads(gzip.decompress(response.data))["features"]) == 3
+
+
+@pytest.mark.parametrize("accept_encoding", ['', 'identity', 'gzip;q=0'])
+def test_geojson_is_not_gzipped_when_refused(client, accept_encoding):
+    response = get_technicians(client, **{'Accept-Encoding': accept_encoding})
+
+    assert 'Content-Encoding' not in response.headers
+    assert len(json.loads(response.data)["features"]) == 3
+
+
+def test_each_encoding_has_its_own_etag(client):
+    plain = get_technicians(client, **{'Accept-Encoding': 'identity'})
+    gzipped = get_technicians(client, **{'Accept-Encoding': 'gzip'})
+
+    assert plain.headers['ETag'] != gzipped.headers['ETag']
+    # A gzip ETag does not validate the identity representation
+    response = get_technicians(client, **{'Accept-Encoding': 'identity', 'If-None-Match': gzipped.headers['ETag']})
+    assert response.status_code == 200
+
+
+def test_matching_etag_gets_not_modified(client):
+    etag = get_technicians(client, **{'Accept-Encoding': 'gzip'}).headers['ETag']
+
+    response = get_technicians(client, **{'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_new_version_changes_the_etag(client, store):
+    etag = get_technicians(client).headers['ETag']
+    store.save(TECHNICIANS, technicians_geojson(4))
+
+    response = get_technicians(client, **{'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert len(json.loads(response.data)["features"]) == 4
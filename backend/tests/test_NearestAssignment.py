@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from NearestAssignment import k_nearest
+from SpatialIndex import haversine_miles
+
+
+@pytest.fixture(scope='module')
+def points():
+    rng = np.random.default_rng(1)
+    origins = rng.uniform([39, -77], [41, -74], (500, 2))
+    targets = rng.uniform([39, -77], [41, -74], (80, 2))
+    return origins, targets
+
+
+def brute_force(origins, targets, k):
+    distances = np.array([haversine_miles(lat, lon, targets[:, 0], targets[:, 1]) for lat, lon in origins])
+    positions = np.argsort(distances, axis=1, kind='stable')[:, :k]
+    return positions, np.take_along_axis(distances, positions, axis=1)
+
+
+@pytest.mark.parametrize("k,chunk_rows,max_workers", [(1, 2048, 1), (5, 64, 4), (80, 100, 2)])
+def test_matches_brute_force(points, k, chunk_rows, max_workers):
+    origins, targets = points
+    positions, distances = k_nearest(origins[:, 0], origins[:, 1], targets[:, 0], targets[:, 1], k,
+                                     chunk_rows=chunk_rows, max_workers=max_workers)
+    expected_positions, expected_distances = brute_force(origins, targets, k)
+
+    np.testing.assert_allclose(distances, expected_distances, atol=1e-6)
+    # Positions only differ where two targets are at the same distance
+    same = positions == expected_positions
+    assert same.mean() > 0.999
+    np.testing.assert_allclose(
+        haversine_miles(origins[:, 0, None], origins[:, 1, None], targets[positions, 0], targets[positions, 1]),
+        expected_distances, atol=1e-6)
+
+
+def test_k_larger_than_targets(points):
+    origins, targets = points
+    positions, distances = k_nearest(origins[:, 0], origins[:, 1], targets[:3, 0], targets[:3, 1], 10)
+    assert positions.shape == distances.shape == (len(origins), 3)
+    assert np.all(np.diff(distances, axis=1) >= 0)
+
+
+def test_invalid_origins(points):
+    origins, targets = points
+    lat = origins[:4, 0].copy()
+    lat[1] = np.nan
+    positions, distances = k_nearest(lat, origins[:4, 1], targets[:, 0], targets[:, 1], 2)
+
+    assert positions[1].tolist() == [-1, -1]
+    assert np.isnan(distances[1]).all()
+    assert (positions[[0, 2, 3]] >= 0).all()
+
+
+def test_no_targets(points):
+    origins, _ = points
+    positions, distances = k_nearest(origins[:, 0], origins[:, 1], np.empty(0), np.empty(0), 3)
+    assert positions.shape == (len(origins), 0)
@@ -0,0 +1,61 @@
+import random
+import pytest
+import NearestTechnicians
+from NearestTechnicians import iter_nearest_technicians, find_nearest_technicians
+
+METERS_PER_MILE = 1609.34
+
+
+@pytest.fixture
+def candidates():
+    rng = random.Random(2)
+    straight_line = sorted(rng.uniform(1, 50) for _ in range(40))
+    return [{"id": f"t{i}", "name": f"Technician {i}", "location": (40.0, -75.0), "straight_line_miles": miles,
+             # Driving is never shorter than the straight line
+             "driving_miles": miles * rng.uniform(1.0, 2.0)}
+            for i, miles in enumerate(straight_line)]
+
+
+@pytest.fixture
+def routed(monkeypatch):
+    """Replaces routing with summaries from each candidate's 'driving_miles', in reverse arrival order."""
+    routed = []
+
+    def route_summaries(technicians, destination, routing_mode=None):
+        routed.extend(technician["id"] for technician in technicians)
+        for i in reversed(range(len(technicians))):
+            miles = technicians[i]["driving_miles"]
+            yield i, {"lengthInMeters": miles * METERS_PER_MILE, "travelTimeInSeconds": miles * 60}
+
+    monkeypatch.setattr(NearestTechnicians, 'iter_technician_route_summaries', route_summaries)
+    return routed
+
+
+def expected_ids(candidates, limit=None, time_budget=float("inf")):
+    within = [candidate for candidate in candidates if candidate["driving_miles"] * 60 <= time_budget]
+    return [candidate["id"] for candidate in sorted(within, key=lambda candidate: candidate["driving_miles"])][:limit]
+
+
+@pytest.mark.parametrize("limit", [1, 3, 10])
+def test_limit_stops_early_with_the_exact_top_k(candidates, routed, limit):
+    results, routed_count = find_nearest_technicians(candidates, (40.0, -75.0), None, 'distance', limit=limit)
+
+    assert [result["id"] for result in results] == expected_ids(candidates, limit)
+    assert routed_count == len(routed) < len(candidates)
+    # Stopped once no remaining candidate could beat the limit-th driving distance
+    assert candidates[routed_count]["straight_line_miles"] >= results[-1]["driving_distance_miles"]
+
+
+def test_without_limit_every_candidate_is_routed(candidates, routed):
+    results, routed_count = find_nearest_technicians(candidates, (40.0, -75.0), 30 * 60, 'time')
+    assert routed_count == len(candidates)
+    assert [result["id"] for result in results] == expected_ids(candidates, time_budget=30 * 60)
+
+
+def test_streamed_technicians_are_the_final_results_in_order(candidates, routed):
+    records = list(iter_nearest_technicians(candidates, (40.0, -75.0), None, 'distance', limit=5, wave_size=2))
+    kind, (results, routed_count) = records[-1]
+
+    assert kind == 'done'
+    assert [value for kind, value in records[:-1]] == results
+    assert [result["id"] for result in results] == expected_ids(candidates, 5)
@@ -0,0 +1,31 @@
+import time
+from RateLimiter import TokenBucket
+
+
+def test_burst_up_to_capacity_then_empty():
+    bucket = TokenBucket(rate=1, capacity=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+
+def test_capacity_defaults_to_one_second_of_tokens():
+    assert TokenBucket(rate=20).capacity == 20
+    assert TokenBucket(rate=0.5).capacity == 1
+
+
+def test_acquire_waits_for_refill():
+    bucket = TokenBucket(rate=50, capacity=1)
+    bucket.acquire()
+
+    start = time.monotonic()
+    waited = sum(bucket.acquire() for _ in range(5))
+    elapsed = time.monotonic() - start
+
+    # 5 more tokens at 50 per second take about 0.1s
+    assert waited > 0
+    assert elapsed >= 0.09
+
+
+def test_zero_rate_disables_limiting():
+    bucket = TokenBucket(rate=0)
+    assert all(bucket.try_acquire() for _ in range(1000))
+    assert bucket.acquire(100) == 0.0
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+import shapely
+from geopy.distance import geodesic
+from shapely.geometry import Polygon, MultiPolygon
+from SpatialIndex import PointIndex
+
+
+@pytest.fixture(scope='module')
+def index():
+    rng = np.random.default_rng(0)
+    lon = rng.uniform(-76.5, -74.5, 2000)
+    lat = rng.uniform(39.0, 41.0, 2000)
+    ids = np.array([f"id{i}" for i in range(2000)], dtype=object)
+    return PointIndex(lon, lat, ids, ids, 'id')
+
+
+@pytest.mark.parametrize("radius_miles", [0, 5, 25, 60])
+def test_within_radius_matches_brute_force(index, radius_miles):
+    lat, lon = 40.0, -75.5
+    exact = np.array([geodesic((lat, lon), (index.lat[i], index.lon[i])).miles for i in range(len(index))])
+
+    positions, distances = index.within_radius(lat, lon, radius_miles)
+
+    assert set(positions.tolist()) == set(np.flatnonzero(exact <= radius_miles).tolist())
+    assert np.all(np.diff(distances) >= 0)
+    # Haversine distances are within 0.6% of geodesic distances
+    np.testing.assert_allclose(distances, exact[positions], rtol=0.006)
+
+
+def test_within_radius_without_radius(index):
+    positions, distances = index.within_radius(40.0, -75.5, None)
+    assert len(positions) == len(distances) == 0
+
+
+def test_within_polygons_matches_brute_force(index):
+    polygons = [
+        Polygon([(-76, 39.5), (-75, 39.5), (-75, 40.5), (-76, 40.5)]),
+        # A polygon with a hole
+        Polygon([(-76.2, 39.2), (-74.8, 39.2), (-74.8, 40.8), (-76.2, 40.8)],
+                [[(-75.8, 39.6), (-75.2, 39.6), (-75.2, 40.4), (-75.8, 40.4)]]),
+        MultiPolygon([Polygon([(-76.4, 39.1), (-76, 39.1), (-76, 39.4)]),
+                      Polygon([(-74.9, 40.6), (-74.6, 40.6), (-74.6, 40.9)])]),
+        # Outside every point
+        Polygon([(0, 0), (1, 0), (1, 1)]),
+    ]
+
+    polygon_indices, positions = index.within_polygons(polygons)
+
+    for i, polygon in enumerate(polygons):
+        expected = np.flatnonzero(shapely.contains_xy(polygon, index.lon, index.lat))
+        np.testing.assert_array_equal(positions[polygon_indices == i], expected)
+        np.testing.assert_array_equal(index.within_polygon(polygon), expected)
+    assert np.all(np.diff(polygon_indices) >= 0)
+
+
+@pytest.mark.parametrize("bbox", [(-76, 39.5, -75, 40.5), (-75.5, 40.9, -74, 42), (0, 0, 1, 1)])
+def test_within_bbox_matches_brute_force(index, bbox):
+    west, south, east, north = bbox
+    expected = np.flatnonzero((index.lon >= west) & (index.lon <= east) & (index.lat >= south) & (index.lat <= north))
+
+    np.testing.assert_array_equal(index.within_bbox(bbox), expected)
+
+
+def test_within_bbox_crossing_the_antimeridian():
+    lon = np.array([179.5, -179.5, 0.0, 178.0])
+    lat = np.zeros(4)
+    ids = np.array(["a", "b", "c", "d"], dtype=object)
+    index = PointIndex(lon, lat, ids, ids, 'id')
+
+    np.testing.assert_array_equal(index.within_bbox((179.0, -1.0, -179.0, 1.0)), [0, 1])
@@ -0,0 +1,193 @@
+import datetime
+import pytest
+import requests
+import TomTomClient as tomtom
+from TomTomClient import TomTomClient, CircuitBreaker, DailyQuota, TomTomCircuitOpen, TomTomQuotaExceeded, GEOCODE, ROUTE
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeSession:
+    """Answers each request with the next outcome: a status code, a response or an exception to raise."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome if isinstance(outcome, FakeResponse) else FakeResponse(outcome)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(tomtom.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(tomtom.time, 'sleep', sleeps.append)
+    return sleeps
+
+
+def make_client(outcomes, **kwargs):
+    client = TomTomClient('https://api.example.com', 'secret', backoff_seconds=0, **kwargs)
+    client.session = FakeSession(outcomes)
+    return client
+
+
+def test_requests_add_the_key_and_endpoint_timeout(sleeps):
+    client = make_client([200], timeouts={GEOCODE: (1, 2)})
+
+    response = client.get(GEOCODE, '/search/2/geocode/x.json', params={"limit": 1})
+
+    assert response.status_code == 200
+    method, url, kwargs = client.session.calls[0]
+    assert (method, url) == ('GET', 'https://api.example.com/search/2/geocode/x.json')
+    assert kwargs["params"] == {"limit": 1, "key": "secret"}
+    assert kwargs["timeout"] == (1, 2)
+    assert sleeps == []
+
+
+def test_errors_and_retryable_statuses_are_retried(sleeps):
+    client = make_client([503, requests.exceptions.ConnectionError("reset"), 429, 200], max_retries=3)
+
+    assert client.get(ROUTE, '/route').status_code == 200
+    assert client.stats()["requests"] == 4
+    assert (client.retries, client.failures) == (3, 3)
+    assert len(sleeps) == 3
+
+
+def test_other_client_errors_are_not_retried(sleeps):
+    client = make_client([404], max_retries=3)
+
+    assert client.get(ROUTE, '/route').status_code == 404
+    assert len(client.session.calls) == 1
+
+
+def test_last_response_or_error_is_returned_when_retries_run_out(sleeps):
+    assert make_client([500, 502], max_retries=1).get(ROUTE, '/route').status_code == 502
+
+    with pytest.raises(requests.exceptions.Timeout):
+        make_client([500, requests.exceptions.Timeout("slow")], max_retries=1).get(ROUTE, '/route')
+
+
+def test_retry_after_is_honoured(sleeps):
+    client = make_client([FakeResponse(429, {'Retry-After': '2'}), FakeResponse(429, {'Retry-After': '60'}), 200],
+                         max_retries=2, backoff_max_seconds=8)
+
+    client.get(ROUTE, '/route')
+
+    # Capped at backoff_max_seconds
+    assert sleeps == [2.0, 8]
+
+
+def test_backoff_is_bounded(sleeps):
+    client = make_client([500] * 5 + [200], max_retries=5, failure_threshold=0)
+    client.backoff_seconds, client.backoff_max_seconds = 1, 3
+
+    client.get(ROUTE, '/route')
+
+    assert all(0 <= wait <= min(3, 2 ** attempt) for attempt, wait in enumerate(sleeps))
+
+
+def test_circuit_opens_after_consecutive_failures(sleeps, clock):
+    client = make_client([500] * 3 + [200], max_retries=0, failure_threshold=3, reset_seconds=30)
+    for _ in range(3):
+        client.get(ROUTE, '/route')
+
+    with pytest.raises(TomTomCircuitOpen):
+        client.get(ROUTE, '/route')
+    # Other endpoints have their own circuit
+    assert client.stats()["circuits"] == {ROUTE: 'open'}
+
+    clock.now += 30
+    assert client.stats()["circuits"][ROUTE] == 'half-open'
+    assert client.get(ROUTE, '/route').status_code == 200
+    assert client.stats()["circuits"][ROUTE] == 'closed'
+    assert len(client.session.calls) == 4
+
+
+def test_failed_trial_reopens_the_circuit(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    clock.now += 10
+    assert breaker.allow()
+    # Only one trial request at a time
+    assert not breaker.allow()
+    breaker.record_failure()
+
+    assert breaker.state() == 'open'
+    assert not breaker.allow()
+
+
+def test_released_trial_lets_another_request_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+
+    breaker.release_trial()
+
+    assert breaker.allow()
+
+
+def test_disabled_circuit_breaker_never_opens():
+    breaker = CircuitBreaker(failure_threshold=0, reset_seconds=10)
+    for _ in range(100):
+        breaker.record_failure()
+    assert breaker.allow()
+
+
+def test_daily_quota_counts_transactions():
+    quota = DailyQuota(5)
+    quota.consume(3)
+    quota.consume()
+
+    with pytest.raises(TomTomQuotaExceeded):
+        quota.consume(2)
+    assert quota.stats()["used"] == 4
+    quota.consume()
+
+
+def test_daily_quota_resets_every_day():
+    quota = DailyQuota(2)
+    quota.consume(2)
+    quota.day -= datetime.timedelta(days=1)
+
+    quota.consume(2)
+
+    assert quota.stats() == {"day": str(datetime.datetime.now(datetime.timezone.utc).date()), "used": 2, "limit": 2}
+
+
+def test_retries_use_up_the_quota(sleeps):
+    client = make_client([500, 500, 200], max_retries=2, daily_quota=2)
+
+    with pytest.raises(TomTomQuotaExceeded):
+        client.post(GEOCODE, '/batch', json={}, transactions=1)
+    assert len(client.session.calls) == 2
+
+    with pytest.raises(TomTomQuotaExceeded):
+        make_client([200], daily_quota=2).post(GEOCODE, '/batch', json={}, transactions=3)
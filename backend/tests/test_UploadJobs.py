@@ -0,0 +1,143 @@
+import threading
+import time
+import pytest
+from UploadJobs import UploadJobManager, UploadJob, UploadCancelled, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED, FINISHED_STATES
+
+
+def wait_for(job, states=FINISHED_STATES, timeout=5):
+    deadline = time.time() + timeout
+    while job.status not in states:
+        assert time.time() < deadline, f"job still {job.status}"
+        time.sleep(0.005)
+    return job
+
+
+@pytest.fixture
+def manager():
+    return UploadJobManager(max_workers=4)
+
+
+def test_jobs_of_a_dataset_run_one_at_a_time_in_order(manager):
+    release = threading.Event()
+    events = []
+
+    def pipeline(name, progress=None):
+        events.append(f"start {name}")
+        if name == 1:
+            assert release.wait(5)
+        time.sleep(0.01)
+        events.append(f"end {name}")
+        return name
+
+    jobs = [manager.submit('customers', 'append', pipeline, i) for i in (1, 2, 3)]
+    wait_for(jobs[0], (JOB_RUNNING,))
+    time.sleep(0.05)
+    assert [job.status for job in jobs] == [JOB_RUNNING, JOB_QUEUED, JOB_QUEUED]
+
+    release.set()
+    for job in jobs:
+        wait_for(job)
+
+    assert [job.result for job in jobs] == [1, 2, 3]
+    assert events == ["start 1", "end 1", "start 2", "end 2", "start 3", "end 3"]
+
+
+def test_datasets_run_in_parallel(manager):
+    release = threading.Event()
+    customers = manager.submit('customers', 'replace', lambda progress=None: release.wait(5))
+    wait_for(customers, (JOB_RUNNING,))
+
+    technicians = wait_for(manager.submit('technicians', 'replace', lambda progress=None: 'done'))
+
+    assert (technicians.status, technicians.result) == (JOB_SUCCEEDED, 'done')
+    assert customers.status == JOB_RUNNING
+    assert manager.dataset_lock('customers').locked()
+    release.set()
+    wait_for(customers)
+    assert not manager.dataset_lock('customers').locked()
+
+
+def test_failed_job_does_not_block_the_queue(manager):
+    def fail(progress=None):
+        raise RuntimeError("geocoding failed")
+
+    failed = manager.submit('customers', 'replace', fail)
+    succeeded = wait_for(manager.submit('customers', 'replace', lambda progress=None: 'ok'))
+
+    assert (wait_for(failed).status, failed.error) == (JOB_FAILED, "geocoding failed")
+    assert succeeded.status == JOB_SUCCEEDED
+
+
+def test_cancelled_queued_job_never_runs(manager):
+    release = threading.Event()
+    calls, cleanups = [], []
+    running = manager.submit('customers', 'replace', lambda progress=None: release.wait(5))
+    queued = manager.submit('customers', 'replace', lambda progress=None: calls.append('run'),
+                            cleanup=lambda: cleanups.append('cleanup'))
+
+    assert queued.cancel()
+    release.set()
+
+    assert wait_for(queued).status == JOB_CANCELLED
+    assert wait_for(running).status == JOB_SUCCEEDED
+    assert calls == []
+    assert cleanups == ['cleanup']
+
+
+def test_running_job_stops_at_the_next_checkpoint(manager):
+    started = threading.Event()
+
+    def pipeline(progress=None):
+        started.set()
+        while True:
+            progress.check_cancelled()
+            time.sleep(0.005)
+
+    job = manager.submit('customers', 'replace', pipeline)
+    assert started.wait(5)
+    assert job.cancel()
+
+    assert wait_for(job).status == JOB_CANCELLED
+    assert job.to_dict()["cancel_requested"]
+    # Finished jobs can no longer be cancelled
+    assert not job.cancel()
+
+
+def test_jobs_cannot_be_cancelled_once_committing():
+    job = UploadJob('customers', 'replace')
+    job.begin_commit()
+
+    assert not job.cancel()
+    job.check_cancelled()
+    assert job.to_dict()["stage"] == 'committing'
+
+
+def test_cancel_before_commit_prevents_the_commit():
+    job = UploadJob('customers', 'replace')
+    assert job.cancel()
+
+    with pytest.raises(UploadCancelled):
+        job.begin_commit()
+    assert not job.committing
+
+
+def test_progress_and_eta():
+    job = UploadJob('customers', 'replace')
+    job.start()
+    job.update('geocoding', rows_total=100, rows_processed=0)
+    assert job.eta_seconds() is None
+
+    job.update(rows_processed=50, geocoded=50)
+
+    assert job.eta_seconds() >= 0
+    assert {key: job.to_dict()[key] for key in ('stage', 'rows_processed', 'geocoded')} == \
+        {'stage': 'geocoding', 'rows_processed': 50, 'geocoded': 50}
+
+
+def test_finished_jobs_history_is_bounded():
+    manager = UploadJobManager(max_workers=1, max_finished_jobs=2)
+    jobs = [wait_for(manager.submit('customers', 'replace', lambda progress=None: None)) for _ in range(4)]
+    manager.submit('customers', 'replace', lambda progress=None: None)
+
+    assert manager.get(jobs[0].id) is None
+    assert manager.get(jobs[3].id) is jobs[3]
@@ -0,0 +1,201 @@
+import struct
+import numpy as np
+import pytest
+from DatasetStore import geojson_to_table
+from VectorTile import encode_layer, VectorTileIndex, TileDiskCache, TILE_EXTENT, GEOMETRY_POINT
+
+
+def read_varint(data, position):
+    value, shift = 0, 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, position
+
+
+def parse_message(data):
+    """Decodes a protocol buffer message into a list of (field, value) pairs."""
+    fields, position = [], 0
+    while position < len(data):
+        key, position = read_varint(data, position)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, position = read_varint(data, position)
+        elif wire_type == 1:
+            value, position = data[position:position + 8], position + 8
+        elif wire_type == 2:
+            length, position = read_varint(data, position)
+            value, position = data[position:position + length], position + length
+        else:
+            raise AssertionError(f"Unexpected wire type {wire_type}")
+        fields.append((field, value))
+    return fields
+
+
+def packed_varints(data):
+    values, position = [], 0
+    while position < len(data):
+        value, position = read_varint(data, position)
+        values.append(value)
+    return values
+
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def decode_value(data):
+    (field, value), = parse_message(data)
+    if field == 1:
+        return value.decode('utf-8')
+    if field == 3:
+        return struct.unpack('<d', value)[0]
+    if field == 5:
+        return value
+    if field == 6:
+        return unzigzag(value)
+    if field == 7:
+        return bool(value)
+    raise AssertionError(f"Unexpected value field {field}")
+
+
+def decode_layer(data):
+    """Decodes a Layer message into its attributes and its features' points and properties."""
+    layer = {"keys": [], "values": [], "features": []}
+    for field, value in parse_message(data):
+        if field == 15:
+            layer["version"] = value
+        elif field == 1:
+            layer["name"] = value.decode('utf-8')
+        elif field == 5:
+            layer["extent"] = value
+        elif field == 3:
+            layer["keys"].append(value.decode('utf-8'))
+        elif field == 4:
+            layer["values"].append(decode_value(value))
+        elif field == 2:
+            layer["features"].append(dict(parse_message(value)))
+
+    features = []
+    for feature in layer.pop("features"):
+        tags = packed_varints(feature[2])
+        command, x, y = packed_varints(feature[4])
+        assert feature[3] == GEOMETRY_POINT
+        assert command == (1 << 3) | 1
+        features.append({
+            "point": (unzigzag(x), unzigzag(y)),
+            "properties": {layer["keys"][tags[i]]: layer["values"][tags[i + 1]] for i in range(0, len(tags), 2)}
+        })
+    layer["features"] = features
+    return layer
+
+
+def decode_tile(data):
+    return [decode_layer(value) for field, value in parse_message(data) if field == 3]
+
+
+def test_encode_layer_round_trips():
+    properties = [
+        {"name": "Alpha", "count": 3, "active": True},
+        {"name": "Bravo", "count": -2, "score": 1.5, "missing": None},
+        {"name": "Alpha", "count": 1, "active": 1},
+    ]
+
+    layer = decode_layer(encode_layer("customers", np.array([0, 4095, -10]), np.array([5, 300, 4200]), properties))
+
+    assert (layer["version"], layer["name"], layer["extent"]) == (2, "customers", TILE_EXTENT)
+    assert [feature["point"] for feature in layer["features"]] == [(0, 5), (4095, 300), (-10, 4200)]
+    assert [feature["properties"] for feature in layer["features"]] == [
+        {"name": "Alpha", "count": 3, "active": True},
+        {"name": "Bravo", "count": -2, "score": 1.5},
+        {"name": "Alpha", "count": 1, "active": 1},
+    ]
+    # Keys and values are shared between features, 1 and True stay distinct values
+    assert layer["keys"] == ["name", "count", "active", "score"]
+    assert layer["values"].count("Alpha") == 1
+    assert len(layer["values"]) == 7
+
+
+def points_table(coordinates):
+    return geojson_to_table({
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                "properties": {"id": str(i), "name": f"Point {i}"}
+            }
+            for i, (lon, lat) in enumerate(coordinates)
+        ]
+    })
+
+
+def test_encode_tile_clips_and_quantizes_points():
+    # The center of the map, a point in the south east tile and one in the north west tile
+    index = VectorTileIndex(points_table([(0.0, 0.0), (90.0, -45.0), (-90.0, 45.0)]))
+
+    layers = decode_tile(index.encode_tile("customers", 1, 1, 1, ["id"]))
+
+    assert [layer["name"] for layer in layers] == ["customers"]
+    features = sorted(layers[0]["features"], key=lambda feature: feature["properties"]["id"])
+    # The center of the map is the tile's corner, the only property encoded is 'id'
+    assert features[0] == {"point": (0, 0), "properties": {"id": "0"}}
+    assert features[1]["properties"] == {"id": "1"}
+    assert features[1]["point"][0] == TILE_EXTENT // 2
+    assert len(features) == 2
+
+
+def test_encode_tile_includes_the_buffer():
+    # Just west of the tile's west edge, within TILE_BUFFER
+    index = VectorTileIndex(points_table([(-0.001, -10.0)]))
+
+    features = decode_tile(index.encode_tile("customers", 1, 1, 1, ["id"]))[0]["features"]
+
+    assert -64 <= features[0]["point"][0] < 0
+
+
+def test_empty_tile():
+    index = VectorTileIndex(points_table([(0.0, 0.0)]))
+    assert index.encode_tile("customers", 4, 0, 0, ["id"]) == b''
+
+
+def test_disk_cache_round_trip(tmp_path):
+    cache = TileDiskCache(str(tmp_path))
+    assert cache.get("customers", "abc", ["id"], 1, 0, 0) is None
+
+    cache.set("customers", "abc", ["id"], 1, 0, 0, b"tile")
+
+    assert cache.get("customers", "abc", ["id"], 1, 0, 0) == b"tile"
+    assert cache.get("customers", "abc", ["id", "name"], 1, 0, 0) is None
+    assert TileDiskCache(str(tmp_path)).get("customers", "abc", ["id"], 1, 0, 0) == b"tile"
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_disk_cache_prunes_only_unretained_fingerprints(tmp_path):
+    retained = {"customers": {"v1", "v2"}}
+    cache = TileDiskCache(str(tmp_path), retained_fingerprints=lambda layer: retained[layer])
+    cache.set("customers", "v1", ["id"], 0, 0, 0, b"one")
+    cache.set("customers", "v2", ["id"], 0, 0, 0, b"two")
+    # Alternating between retained versions keeps both
+    cache.set("customers", "v1", ["id"], 1, 0, 0, b"one")
+    assert cache.get("customers", "v2", ["id"], 0, 0, 0) == b"two"
+
+    retained["customers"] = {"v2", "v3"}
+    cache.set("customers", "v3", ["id"], 0, 0, 0, b"three")
+
+    assert cache.get("customers", "v1", ["id"], 0, 0, 0) is None
+    assert cache.get("customers", "v2", ["id"], 0, 0, 0) == b"two"
+    assert sorted(p.name for p in (tmp_path / "customers").iterdir()) == ["v2", "v3"]
+
+
+def test_disk_cache_keeps_only_the_newest_fingerprint_by_default(tmp_path):
+    cache = TileDiskCache(str(tmp_path))
+    cache.set("customers", "v1", ["id"], 0, 0, 0, b"one")
+    cache.set("technicians", "v1", ["id"], 0, 0, 0, b"one")
+    cache.set("customers", "v2", ["id"], 0, 0, 0, b"two")
+
+    assert cache.get("customers", "v1", ["id"], 0, 0, 0) is None
+    assert cache.get("technicians", "v1", ["id"], 0, 0, 0) == b"one"
@@ -0,0 +1,95 @@
+import pyarrow as pa
+import pytest
+from VersionedDataset import VersionedDataset
+
+
+def table(*ids):
+    return pa.table({"id": list(ids), "name": [f"name {id_value}" for id_value in ids]})
+
+
+def ids(dataset, version=None):
+    return dataset.read(version).column("id").to_pylist()
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    return VersionedDataset(str(tmp_path / 'dataset'), retention=3, max_segments=8)
+
+
+def test_commits_create_versions(dataset):
+    assert dataset.head() is None
+    assert dataset.commit_table(table("a", "b")) == 1
+    assert dataset.commit_append(table("c")) == 2
+
+    assert dataset.head() == 2
+    assert ids(dataset) == ["a", "b", "c"]
+    assert ids(dataset, 1) == ["a", "b"]
+    assert dataset.manifest(2)["kind"] == "append"
+    assert dataset.manifest(2)["parent"] == 1
+
+
+def test_append_stores_only_new_rows(dataset):
+    dataset.commit_table(table("a", "b"))
+    dataset.commit_append(table("c"))
+
+    segments = dataset.manifest(2)["segments"]
+    assert [segment["file"] for segment in segments] == ["segment-000001.arrow", "segment-000002.arrow"]
+
+
+def test_replace_stores_only_changed_rows(dataset):
+    dataset.commit_table(table("a", "b", "c", "d"))
+    version = dataset.commit_replace(table("a", "b", "c", "e"))
+
+    assert sorted(ids(dataset)) == ["a", "b", "c", "e"]
+    segments = dataset.manifest(version)["segments"]
+    # "d" is marked as removed from the first segment, only "e" is written
+    assert segments[0]["deleted"] == [3]
+    assert dataset.manifest(version)["rows"] == 4
+
+
+def test_unchanged_content_commits_nothing(dataset):
+    dataset.commit_table(table("a", "b"))
+    assert dataset.commit_replace(table("b", "a")) == 1
+    assert dataset.commit_append(table()) == 1
+    assert dataset.versions() == [1]
+
+
+def test_rollback_moves_head_only(dataset):
+    dataset.commit_table(table("a"))
+    dataset.commit_append(table("b"))
+    dataset.rollback(1)
+
+    assert dataset.head() == 1
+    assert ids(dataset) == ["a"]
+    assert dataset.versions() == [1, 2]
+    # The next commit builds on the rolled back version
+    assert dataset.commit_append(table("c")) == 3
+    assert ids(dataset) == ["a", "c"]
+
+
+def test_rollback_to_unknown_version(dataset):
+    dataset.commit_table(table("a"))
+    with pytest.raises(ValueError):
+        dataset.rollback(5)
+
+
+def test_old_versions_and_their_segments_are_pruned(dataset, tmp_path):
+    for id_value in "abcde":
+        dataset.commit_table(table(id_value))
+
+    assert dataset.versions() == [3, 4, 5]
+    segments = sorted(path.name for path in (tmp_path / 'dataset').glob('segment-*.arrow'))
+    assert segments == ["segment-000003.arrow", "segment-000004.arrow", "segment-000005.arrow"]
+    with pytest.raises(OSError):
+        dataset.read(1)
+
+
+
+def test_many_segments_are_compacted(tmp_path):
+    dataset = VersionedDataset(str(tmp_path / 'dataset'), retention=10, max_segments=3)
+    dataset.commit_table(table("a"))
+    for id_value in "bcd":
+        version = dataset.commit_append(table(id_value))
+
+    assert len(dataset.manifest(version)["segments"]) <= 3
+    assert ids(dataset) == ["a", "b", "c", "d"]
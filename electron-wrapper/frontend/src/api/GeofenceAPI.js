@@ -37,4 +37,37 @@ export class GeofenceAPI {
       throw error;
     }
   }
+
+  /**
+   * Fetches geofence data for many geofences in a single request.
+   * 
+   * @param {Object} params - The parameters to send in the request.
+   * @param {Array} params.geofences - GeoJSON Polygons, MultiPolygons or Features (their ids are returned).
+   * @param {boolean} [params.includeIds=false] - Whether to return the ids of the customers and technicians in each geofence.
+   * @returns {Promise<Object>} - A promise that resolves with one entry per geofence, in request order.
+   * @throws {Error} - Throws an error if the fetch operation fails or if there is an issue with the server response.
+   */
+  async getBatchGeofenceData({geofences, includeIds = false}) {
+    try {
+      const response = await fetch(`${ConfigAPI.BASE_URL}/geofence/batch-geofence-data`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+          geofences: geofences,
+          include_ids: includeIds
+        }),
+      });
+
+      const data = await response.json();
+      if (!response.ok) {
+        throw new Error(data.error);
+      }
+      return data.geofences;
+    } catch (error) {
+      console.error('Error fetching the batch geofence data:', error);
+      throw error;
+    }
+  }
 }
@@ -115,8 +115,9 @@ export class MapUploadAPI {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      const data = await response.json();
-      return data;
+      // The upload is processed in the background, wait for its job to finish
+      const job = await response.json();
+      return await this.waitForUploadJob(job.job_id);
     } catch (err) {
       console.error("Failed to import and overwrite csv data:", err);
     }
@@ -151,8 +152,9 @@ export class MapUploadAPI {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      const data = await response.json();
-      return data;
+      // The upload is processed in the background, wait for its job to finish
+      const job = await response.json();
+      return await this.waitForUploadJob(job.job_id);
     } catch (err) {
       console.error("Failed to import and overwrite csv data:", err);
     }
@@ -177,8 +179,9 @@ export class MapUploadAPI {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      const data = await response.json();
-      return data;
+      // The upload is processed in the background, wait for its job to finish
+      const job = await response.json();
+      return await this.waitForUploadJob(job.job_id);
     } catch (err) {
       console.error("Failed to import and overwrite csv data:", err);
     }
@@ -203,10 +206,69 @@ export class MapUploadAPI {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      const data = await response.json();
-      return data;
+      // The upload is processed in the background, wait for its job to finish
+      const job = await response.json();
+      return await this.waitForUploadJob(job.job_id);
     } catch (err) {
       console.error("Failed to import and overwrite csv data:", err);
     }
   }
+
+  /**
+   * Fetches the status and progress of a background upload job.
+   *
+   * @param {string} jobId - The id returned when the upload was submitted.
+   * @returns {Promise<Object>} - A promise that resolves with the job's status, row counts and ETA.
+   * @throws {Error} - Throws an error if the fetch operation fails or if there is an issue with the server response.
+   */
+  async getUploadJob(jobId) {
+    const apiUrl = `${ConfigAPI.BASE_URL}/map/jobs/${jobId}`;
+    const response = await fetch(apiUrl);
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    return await response.json();
+  }
+
+  /**
+   * Cancels a background upload job. Nothing is committed by a cancelled upload.
+   *
+   * @param {string} jobId - The id returned when the upload was submitted.
+   * @returns {Promise<Object>} - A promise that resolves with the job's status.
+   */
+  async cancelUploadJob(jobId) {
+    try {
+      const apiUrl = `${ConfigAPI.BASE_URL}/map/jobs/${jobId}/cancel`;
+      const response = await fetch(apiUrl, { method: "POST" });
+      return await response.json();
+    } catch (err) {
+      console.error("Failed to cancel upload job:", err);
+    }
+  }
+
+  /**
+   * Polls a background upload job until it finishes.
+   *
+   * @param {string} jobId - The id returned when the upload was submitted.
+   * @param {number} intervalMs - Delay between two status requests.
+   * @returns {Promise<Object>} - A promise that resolves with the job once it succeeded.
+   * @throws {Error} - Throws an error if the job failed or was cancelled.
+   */
+  async waitForUploadJob(jobId, intervalMs = 1000) {
+    for (;;) {
+      const job = await this.getUploadJob(jobId);
+      if (job.status === "succeeded") {
+        return job;
+      }
+      if (job.status === "failed" || job.status === "cancelled") {
+        throw new Error(`Upload job ${job.status}: ${job.error || ""}`);
+      }
+      console.log(
+        `Upload ${job.stage}: ${job.rows_processed}/${job.rows_total} rows`
+      );
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+  }
 }
@@ -64,11 +64,11 @@ export class GeofenceDataOverlay extends MapOverlay {
 
 {/* <li>
 <strong>Customer Density (per 100 mi²):</strong> ${
-  data.customer_density_per_10_mile2?.toFixed(2) ?? "N/A"
+  data.customer_density_per_100_mile2?.toFixed(2) ?? "N/A"
 }
 </li>
 <li>
 <strong>Technician Density (per 100 mi²):</strong> ${
-  data.technician_density_per_10_mile2?.toFixed(2) ?? "N/A"
+  data.technician_density_per_100_mile2?.toFixed(2) ?? "N/A"
 }
 </li> */}
\ No newline at end of file